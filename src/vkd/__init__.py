@@ -6,9 +6,23 @@ Variant Knowledge Dashboard
 # std import
 from __future__ import annotations
 
+import importlib
+import typing
+
 # 3rd party import
 # project import
-from vkd import reader, writer
 from vkd._internal.cli import main
 
-__all__: list[str] = ["main", "reader", "writer"]
+if typing.TYPE_CHECKING:
+    # std import
+    import types
+
+__all__: list[str] = ["bgzf", "clinvar", "contig", "join", "main", "normalize", "reader", "writer"]
+
+
+def __getattr__(name: str) -> types.ModuleType:
+    """Import submodule on first access, polars isn't loaded before main configure its thread pool."""
+    if name in __all__:
+        return importlib.import_module(f"vkd.{name}")
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -15,21 +15,22 @@ from __future__ import annotations
 import argparse
 import importlib
 import inspect
-import logging
-import os
 import pathlib
+import re
 import subprocess
 import sys
 import tempfile
 import typing
 
 # 3rd party import
-import polars
+# project import
+from vkd._internal import debug, profile, resources
 
-from vkd import reader
+if typing.TYPE_CHECKING:
+    # project import
+    from vkd import reader
 
-# project import
-from vkd._internal import debug
+# polars, and module of vkd that import it, are imported only after resources configuration
 
 
 class _DebugInfo(argparse.Action):
@@ -37,10 +38,44 @@ class _DebugInfo(argparse.Action):
         super().__init__(nargs=nargs, **kwargs)
 
     def __call__(self, *args: typing.Any, **kwargs: typing.Any) -> None:  # noqa: ARG002
+        resources.configure(getattr(args[1], "threads", None))
         debug._print_debug_info()
         sys.exit(0)
 
 
+def _region(value: str) -> reader.Region:
+    """Parse a region string `chr` or `chr:begin-end` 1-based inclusive."""
+    name, _, interval = value.partition(":")
+    if not interval:
+        return (name, 1, sys.maxsize)
+
+    begin, _, end = interval.replace(",", "").partition("-")
+    try:
+        return (name, int(begin), int(end) if end else sys.maxsize)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(f"invalid region {value}") from error
+
+
+INFO_MODES: list[str] = ["tokenize", "regex"]
+"""Values of reader.InfoMode."""
+
+SAMPLE_LAYOUTS: list[str] = ["wide", "long"]
+"""Values of reader.SampleLayout."""
+
+COMPRESSIONS: list[str] = ["zstd", "lz4", "snappy", "gzip", "brotli", "uncompressed"]
+"""Values of writer.Compression."""
+
+MEMORY_UNITS: dict[str, int] = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def _memory_size(value: str) -> int:
+    """Parse a memory size, a number of bytes with an optional K, M, G or T suffix."""
+    if (search := re.fullmatch(r"(?P<number>[0-9]+(?:\.[0-9]+)?)(?P<unit>[KMGT]?)I?B?", value.strip().upper())) is None:
+        raise argparse.ArgumentTypeError(f"invalid memory size {value}")
+
+    return int(float(search["number"]) * MEMORY_UNITS[search["unit"]])
+
+
 def get_parser() -> argparse.ArgumentParser:
     """Return the CLI argument parser.
 
@@ -62,8 +97,16 @@ def get_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--threads",
         type=int,
-        help="Number of threads usable",
-        default=1,
+        help="Number of threads usable, shared by polars, BGZF decompression and --jobs process, default number of "
+        "available cpu",
+        default=None,
+    )
+
+    parser.add_argument(
+        "--trace",
+        type=pathlib.Path,
+        help="Write a Chrome trace event timeline of reader, merge stages and dashboard queries, open it in Perfetto",
+        required=False,
     )
 
     subparser = parser.add_subparsers()
@@ -100,6 +143,13 @@ def get_parser() -> argparse.ArgumentParser:
         help="Path to clinvar annotation",
         required=False,
     )
+    merge_parser.add_argument(
+        "--clinvar-field",
+        type=str,
+        help="Id of clinvar INFO field keep, default all",
+        required=False,
+        nargs="+",
+    )
     merge_parser.add_argument(
         "-s",
         "--snpeff-path",
@@ -117,14 +167,190 @@ def get_parser() -> argparse.ArgumentParser:
         nargs="+",
     )
     merge_parser.add_argument(
+        "--most-severe",
+        action="store_true",
+        help="Keep only most severe snpeff and vep annotation of each variant, instead of one row by annotation",
+    )
+    output_group = merge_parser.add_mutually_exclusive_group(required=True)
+    output_group.add_argument(
         "-o",
         "--output-path",
         type=pathlib.Path,
-        help="Path where to write result",
-        required=True,
+        help="Path where to write result, a directory with --partition",
+    )
+    output_group.add_argument(
+        "--append",
+        type=pathlib.Path,
+        help="Add dataset to a store write with --partition --partition-dataset, existing file aren't modified",
+    )
+    merge_parser.add_argument(
+        "--memory-limit",
+        type=_memory_size,
+        help="Maximal memory usage, e.g. 8G, merge run in a limited process with sorted join and streaming sink and "
+        "fail with a diagnostic if input isn't sorted, a stage can't stream or limit is reach",
+        required=False,
+    )
+    merge_parser.add_argument(
+        "--join",
+        type=str,
+        choices=["hash", "sorted"],
+        help="Join algorithm, sorted stream coordinate sorted vcf by batch, fall back to hash if an input isn't sorted",
+        default="hash",
+    )
+    merge_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="Number of process used to build dataset in parallel, --threads are shared between process",
+        default=1,
+    )
+    merge_parser.add_argument(
+        "--profile",
+        type=pathlib.Path,
+        help="Write in json wall time, cpu time, rows and peak memory of each stage, polars node timings of each sink "
+        "and polars plan of each dataset",
+        required=False,
+    )
+    merge_parser.add_argument(
+        "--partition",
+        action="store_true",
+        help="Write one `<chr>.parquet` by chromosome in output directory, sorted by position, chromosome are merged in parallel",
+    )
+    merge_parser.add_argument(
+        "--partition-dataset",
+        action="store_true",
+        help="With --partition, split each chromosome in `<chr>/<dataset>.parquet`",
+    )
+    merge_parser.add_argument(
+        "--info-mode",
+        type=str,
+        choices=INFO_MODES,
+        help="How INFO column are decoded, tokenize split each INFO string once, regex run one extraction by field",
+        default="regex",
+    )
+    merge_parser.add_argument(
+        "-r",
+        "--region",
+        type=_region,
+        help="Keep only variant in region, chr or chr:begin-end, indexed input are read only on region",
+        required=False,
+        nargs="+",
+    )
+    merge_parser.add_argument(
+        "--split-multiallelic",
+        action="store_true",
+        help="Split multi-allelic records of query, labeled query and annotation in one record by alternative allele",
+    )
+    merge_parser.add_argument(
+        "--reference",
+        type=pathlib.Path,
+        help="Uncompressed fasta with .fai index, indels are trimmed and left-aligned, imply --split-multiallelic",
+        required=False,
+    )
+    merge_parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Write a parquet cache of each vcf read and clinvar index, next read use it",
+    )
+    merge_parser.add_argument(
+        "--cache-dir",
+        type=pathlib.Path,
+        help="Directory where parquet cache are store, default VKD_CACHE_DIR environment variable or vcf directory",
+        required=False,
+    )
+    merge_parser.add_argument(
+        "--compression",
+        type=str,
+        choices=COMPRESSIONS,
+        help="Parquet codec of output",
+        default="zstd",
+    )
+    merge_parser.add_argument(
+        "--compression-level",
+        type=int,
+        help="Level of zstd, gzip or brotli codec, default 3 for zstd and codec default otherwise",
+        required=False,
+    )
+    merge_parser.add_argument(
+        "--row-group-size",
+        type=int,
+        help="Number of rows of output parquet row group",
+        default=262_144,
+    )
+    merge_parser.add_argument(
+        "--compact-dtypes",
+        action="store_true",
+        help="Write chr, dataset, format_bd, filter, format_gt and `*_effect` as Categorical and `*_impact` as Enum "
+        "sorted by severity, faster group by in memory but slower parquet read",
     )
     merge_parser.set_defaults(func=merge)
 
+    convert_parser = subparser.add_parser("convert", help=inspect.getdoc(convert))
+    convert_parser.add_argument(
+        "-i",
+        "--input-path",
+        type=pathlib.Path,
+        help="Path to vcf",
+        required=True,
+        nargs="+",
+    )
+    convert_parser.add_argument(
+        "--without-genotype",
+        action="store_true",
+        help="Didn't parse FORMAT and genotype column",
+    )
+    convert_parser.add_argument(
+        "--sample-layout",
+        type=str,
+        choices=SAMPLE_LAYOUTS,
+        help="How sample of multi-sample vcf are store",
+        default="wide",
+    )
+    convert_parser.add_argument(
+        "--info-mode",
+        type=str,
+        choices=INFO_MODES,
+        help="How INFO column are decoded, tokenize split each INFO string once, regex run one extraction by field",
+        default="regex",
+    )
+    convert_parser.add_argument(
+        "--cache-dir",
+        type=pathlib.Path,
+        help="Directory where parquet cache are store, default VKD_CACHE_DIR environment variable or vcf directory",
+        required=False,
+    )
+    convert_parser.set_defaults(func=convert)
+
+    index_clinvar_parser = subparser.add_parser("index-clinvar", help=inspect.getdoc(index_clinvar))
+    index_clinvar_parser.add_argument(
+        "-c",
+        "--clinvar-path",
+        type=pathlib.Path,
+        help="Path to clinvar annotation",
+        required=True,
+    )
+    index_clinvar_parser.add_argument(
+        "--clinvar-field",
+        type=str,
+        help="Id of clinvar INFO field keep, default all, merge reuse index only with same fields",
+        required=False,
+        nargs="+",
+    )
+    index_clinvar_parser.add_argument(
+        "--info-mode",
+        type=str,
+        choices=INFO_MODES,
+        help="How INFO column are decoded, tokenize split each INFO string once, regex run one extraction by field",
+        default="regex",
+    )
+    index_clinvar_parser.add_argument(
+        "--cache-dir",
+        type=pathlib.Path,
+        help="Directory where index are store, default VKD_CACHE_DIR environment variable or vcf directory",
+        required=False,
+    )
+    index_clinvar_parser.set_defaults(func=index_clinvar)
+
     serve_parser = subparser.add_parser(
         "serve",
         help="Start web server for data analysis",
@@ -162,96 +388,38 @@ def main(args: list[str] | None = None) -> int:
     parser = get_parser()
     opts = parser.parse_args(args=args)
 
-    os.environ["POLARS_MAX_THREADS"] = str(opts.threads)
-
     if "func" not in opts:
         parser.print_help(sys.stderr)
         return 0
 
+    opts.threads, jobs = resources.configure(opts.threads, getattr(opts, "jobs", 1))
+    if opts.trace is not None:
+        profile.init_trace(opts.trace)
+    if "jobs" in opts:
+        opts.jobs = jobs
+
     return opts.func(opts)
 
 
 def merge(opts: argparse.Namespace) -> int:
     """Perform a merge of pipeline output."""
-    logger = logging.getLogger("merge")
-    lfs = []
-
-    schema_global: dict[str, polars.DataType] | None = None
-
-    snpeffs = [None] * len(opts.name_dataset) if opts.snpeff_path is None else opts.snpeff_path
-    veps = [None] * len(opts.name_dataset) if opts.vep_path is None else opts.vep_path
-
-    for name, query, label, snpeff, vep in zip(
-        opts.name_dataset,
-        opts.query_path,
-        opts.query_path_labeled,
-        snpeffs,
-        veps,
-    ):
-        lf = reader.vcf2lazyframe(query)
-        if lf is None:
-            continue
-        lf = typing.cast("polars.LazyFrame", lf)
-
-        label_lf = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(label)).select(
-            ["chr", "position", "ref", "alt", "format_bd"],
-        )
-
-        lf = lf.join(label_lf, on=["chr", "position", "ref", "alt"], how="left")
-
-        if snpeff is not None:
-            annot_lf = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(snpeff)).select(
-                ["chr", "position", "ref", "alt", "info_ANN"],
-            )
-            annot_lf = reader.parse_info_ann(annot_lf, "snpeff")
-            lf = lf.join(annot_lf, on=["chr", "position", "ref", "alt"], how="left")
-
-        if vep is not None:
-            annot_lf = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(snpeff)).select(
-                ["chr", "position", "ref", "alt", "info_ANN"],
-            )
-            annot_lf = reader.parse_info_ann(annot_lf, "vep")
-            lf = lf.join(annot_lf, on=["chr", "position", "ref", "alt"], how="left")
+    from vkd._internal import commands  # noqa: PLC0415 polars is imported after resources configuration
 
-        lf = lf.with_columns(dataset=polars.lit(name))
+    return commands.merge(opts)
 
-        schema = lf.collect_schema()
-        if schema_global is None:
-            schema_global = dict(schema)
-        else:
-            for col, dtypes in schema.items():
-                if col in schema_global and schema_global[col] != dtypes:
-                    logger.info(
-                        f"drop {col} old dtypes {dtypes} new dtypes {schema_global[col]}",
-                    )
-                    del schema_global[col]
 
-        lfs.append(lf)
+def convert(opts: argparse.Namespace) -> int:
+    """Convert vcf in parquet cache, path of each cache is write in stdout."""
+    from vkd._internal import commands  # noqa: PLC0415 polars is imported after resources configuration
 
-    if not lfs:
-        with open(opts.output_path, "w"):
-            pass
+    return commands.convert(opts)
 
-        return 0
 
-    lf = polars.concat(lfs) if schema_global is None else polars.concat([lf.select(schema_global.keys()) for lf in lfs])
+def index_clinvar(opts: argparse.Namespace) -> int:
+    """Build index of clinvar vcf, path of index is write in stdout."""
+    from vkd._internal import commands  # noqa: PLC0415 polars is imported after resources configuration
 
-    if opts.clinvar_path is not None:
-        clinvar_lf = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(opts.clinvar_path, with_genotype=False))
-        clinvar_lf = clinvar_lf.with_columns(
-            chr=polars.col("chr").str.replace(r"^", "chr"),
-        )
-        clinvar_lf = clinvar_lf.rename(
-            {col: col.replace("info_", "clinvar_") for col in clinvar_lf.collect_schema()},
-        )
-
-        lf = lf.join(clinvar_lf, on=["chr", "position", "ref", "alt"], how="left")
-
-    lf.sink_parquet(
-        opts.output_path,
-    )
-
-    return 0
+    return commands.index_clinvar(opts)
 
 
 def serve(opts: argparse.Namespace) -> int:
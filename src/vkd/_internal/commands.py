@@ -0,0 +1,735 @@
+"""Implementation of vkd commands that process data with polars.
+
+This module is imported by cli only when a command run, after resources configuration of polars thread pool.
+"""
+
+# std import
+from __future__ import annotations
+
+import concurrent.futures
+import functools
+import glob
+import itertools
+import logging
+import multiprocessing
+import os
+import pathlib
+import re
+import resource
+import sys
+import tempfile
+import typing
+
+# 3rd party import
+import polars
+
+# project import
+from vkd import bgzf, clinvar, contig, join, reader, writer
+from vkd._internal import profile, resources
+
+if typing.TYPE_CHECKING:
+    # std import
+    import argparse
+    import collections.abc
+
+
+NORMALIZE_OPTIONS: tuple[str, ...] = ("split_multiallelic", "reference")
+"""Read options that normalize variants, clinvar is read without them."""
+
+
+class StreamingError(RuntimeError):
+    """A merge stage can't be run by polars streaming engine."""
+
+
+def merge(opts: argparse.Namespace) -> int:
+    """Perform a merge of pipeline output."""
+    if opts.memory_limit is None:
+        return _profiled_merge(opts)
+
+    # allocation failure could abort process, run merge in a child process to always report failure
+    process = multiprocessing.get_context("spawn").Process(target=_limited_merge, args=(opts,))
+    process.start()
+    process.join()
+
+    if process.exitcode is not None and process.exitcode < 0:
+        logging.getLogger("merge").error(
+            f"merge process killed by signal {-process.exitcode}, memory limit {opts.memory_limit} bytes is probably "
+            "reach, increase --memory-limit or reduce --jobs",
+        )
+        return 1
+
+    return process.exitcode or 0
+
+
+def _limited_merge(opts: argparse.Namespace) -> None:
+    """Run merge with a data segment limit, each process of pool get a part of limit, exit with merge exit code."""
+    logger = logging.getLogger("merge")
+
+    limit = opts.memory_limit // (opts.jobs + 1) if opts.jobs > 1 else opts.memory_limit
+    resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+
+    try:
+        code = _profiled_merge(opts)
+    except StreamingError as error:
+        logger.error(f"{error}, it can't be run under --memory-limit")  # noqa: TRY400 traceback is noise
+        code = 1
+    except (MemoryError, RuntimeError, polars.exceptions.ComputeError) as error:
+        if not isinstance(error, MemoryError) and not re.search("out of memory|can't start new thread", str(error)):
+            raise
+        logger.error(f"merge exceed memory limit of {limit} bytes by process: {error}")  # noqa: TRY400 traceback is noise
+        code = 1
+    except join.UnsortedError as error:
+        logger.error(f"{error}, --memory-limit require coordinate sorted input")  # noqa: TRY400 traceback is noise
+        code = 1
+
+    sys.exit(code)
+
+
+def _profiled_merge(opts: argparse.Namespace) -> int:
+    """Perform a merge in current process, with --profile resource usage of each stage is write in profile report."""
+    if opts.profile is not None:
+        profile.start()
+
+    try:
+        with profile.stage("merge"):
+            return _merge(opts)
+    finally:
+        if (report := profile.stop()) is not None:
+            profile.write(report, opts.profile)
+
+
+def _merge(opts: argparse.Namespace) -> int:
+    """Perform a merge of pipeline output, in current process."""
+    logger = logging.getLogger("merge")
+
+    read_options: dict[str, typing.Any] = {
+        "info_mode": opts.info_mode,
+        "threads": opts.threads,
+        "regions": None if opts.region is None else [(contig.normalize(name), *rest) for name, *rest in opts.region],
+        "cache": opts.cache,
+        "cache_dir": opts.cache_dir,
+        "split_multiallelic": opts.split_multiallelic,
+        "reference": opts.reference,
+    }
+
+    store_schema = None
+    if opts.append is not None:
+        if existing := [name for name in opts.name_dataset if any(opts.append.glob(f"*/{glob.escape(name)}.parquet"))]:
+            logger.error(f"dataset {', '.join(existing)} already in {opts.append}")
+            return 1
+
+        store_schema = _store_schema(opts.append)
+        opts.output_path = opts.append
+        opts.partition = opts.partition_dataset = True
+
+    if opts.partition:
+        opts.output_path.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(
+        prefix=".vkd_merge_",
+        dir=opts.output_path if opts.partition else opts.output_path.parent,
+    ) as tmp_dir:
+        datasets = None
+        with_clinvar = True
+        if opts.memory_limit is not None:
+            # join and explode are run by batch and spill to disk
+            datasets = _build_datasets(opts, read_options, pathlib.Path(tmp_dir), _write_sorted_dataset)
+            with_clinvar = False
+        elif opts.join == "sorted":
+            try:
+                datasets = _build_datasets(opts, read_options, pathlib.Path(tmp_dir), _write_sorted_dataset)
+                with_clinvar = False
+            except join.UnsortedError as error:
+                logger.warning(f"{error}, fall back to hash join")
+
+        if datasets is None and opts.jobs > 1:
+            datasets = _build_datasets(opts, read_options, pathlib.Path(tmp_dir), _write_dataset)
+
+        if not opts.partition:
+            with reader.spool_scope():
+                lf = _merge_lazyframe(opts, read_options, datasets, with_clinvar=with_clinvar)
+                if lf is None:
+                    with open(opts.output_path, "w"):
+                        pass
+                else:
+                    _sink_parquet(opts, writer.compact(lf) if opts.compact_dtypes else lf, opts.output_path)
+
+            return 0
+
+        # each chromosome read inputs on its region, inputs without index are read once for all chromosomes
+        if datasets is None and not all(
+            _indexed(path) for dataset in _datasets(opts) for path in dataset[1:] if path is not None
+        ):
+            datasets = _build_datasets(opts, read_options, pathlib.Path(tmp_dir), _write_dataset)
+
+        clinvar_cache_dir = (
+            _clinvar_cache_dir(opts, read_options, pathlib.Path(tmp_dir)) if with_clinvar else read_options["cache_dir"]
+        )
+
+        chromosomes = _chromosomes(opts.query_path, read_options, streaming=opts.memory_limit is not None)
+
+        # appended files are moved in store only when all chromosomes succeed, a failed append can be retried
+        output_path = opts.output_path if opts.append is None else pathlib.Path(tmp_dir) / "append"
+        output_path.mkdir(exist_ok=True)
+
+        # chromosome share polars thread pool, decompression threads are split between them
+        workers = max(1, min(opts.threads, len(chromosomes)))
+        chromosome_options = read_options | {"threads": resources.job_threads(opts.threads, workers)}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    _merge_chromosome,
+                    opts,
+                    chromosome_options,
+                    chromosome,
+                    datasets,
+                    with_clinvar=with_clinvar,
+                    store_schema=store_schema,
+                    clinvar_cache_dir=clinvar_cache_dir,
+                    output_path=output_path,
+                )
+                for chromosome in sorted(chromosomes)
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+
+        if opts.append is not None:
+            for path in sorted(output_path.glob("*/*.parquet")):
+                (opts.output_path / path.parent.name).mkdir(exist_ok=True)
+                os.replace(path, opts.output_path / path.relative_to(output_path))
+
+    with profile.stage("manifest", input_path=opts.output_path):
+        writer.write_manifest(opts.output_path)
+
+    return 0
+
+
+def _chromosomes(
+    paths: list[pathlib.Path],
+    read_options: dict[str, typing.Any],
+    *,
+    streaming: bool = False,
+) -> set[str]:
+    """Get name of chromosome with record in any vcf, read in index if possible, by batch if streaming."""
+    chromosomes = set()
+    for path in paths:
+        if bgzf.is_bgzf(path) and (index_path := bgzf.find_index(path)) is not None:
+            chromosomes.update(contig.normalize(name) for name in bgzf.read_index(index_path).names)
+        elif streaming:
+            for batch in reader.iter_vcf_batches(path, with_genotype=False, columns=["chr"]):
+                chromosomes.update(batch.get_column("chr").unique().to_list())
+        else:
+            with reader.spool_scope():
+                lf = reader.vcf2lazyframe(path, with_genotype=False, columns=["chr"], **read_options)
+                if lf is not None:
+                    chromosomes.update(lf.unique().collect().get_column("chr").to_list())
+
+    if read_options["regions"] is not None:
+        chromosomes &= {name for name, _, _ in read_options["regions"]}
+
+    return chromosomes
+
+
+def _clinvar_cache_dir(
+    opts: argparse.Namespace,
+    read_options: dict[str, typing.Any],
+    tmp_dir: pathlib.Path,
+) -> pathlib.Path | None:
+    """Get directory of clinvar index, a clinvar without tabix index or parquet index is parsed once in tmp_dir."""
+    cache_dir = read_options["cache_dir"]
+    if opts.clinvar_path is None or _indexed(opts.clinvar_path):
+        return cache_dir
+
+    if not clinvar.index_path(opts.clinvar_path, fields=opts.clinvar_field, cache_dir=cache_dir).is_file():
+        cache_dir = tmp_dir
+        clinvar.build_index(
+            opts.clinvar_path,
+            clinvar.index_path(opts.clinvar_path, fields=opts.clinvar_field, cache_dir=cache_dir),
+            fields=opts.clinvar_field,
+            info_mode=opts.info_mode,
+            threads=opts.threads,
+        )
+
+    return cache_dir
+
+
+def _indexed(path: pathlib.Path) -> bool:
+    """Check if a vcf has a tabix or csi index, a region read decompress only its blocks."""
+    return bgzf.is_bgzf(path) and bgzf.find_index(path) is not None
+
+
+@reader.spool_scope()
+def _merge_chromosome(
+    opts: argparse.Namespace,
+    read_options: dict[str, typing.Any],
+    chromosome: str,
+    datasets: list[polars.LazyFrame] | None,
+    *,
+    with_clinvar: bool,
+    store_schema: dict[str, polars.DataType] | None,
+    output_path: pathlib.Path,
+    clinvar_cache_dir: pathlib.Path | None = None,
+) -> None:
+    """Merge record of one chromosome, write `<chr>.parquet` or `<chr>/<dataset>.parquet` in output_path."""
+    regions = (
+        [(chromosome, 1, sys.maxsize)]
+        if read_options["regions"] is None
+        else [region for region in read_options["regions"] if region[0] == chromosome]
+    )
+
+    lf = _merge_lazyframe(
+        opts,
+        read_options | {"regions": regions},
+        datasets,
+        with_clinvar=with_clinvar,
+        clinvar_cache_dir=clinvar_cache_dir,
+    )
+    if lf is None:
+        return
+
+    if store_schema is not None:
+        # add missing column of store and cast column to supertype of store and new dataset
+        lf = polars.concat([polars.LazyFrame(schema=store_schema), lf], how="diagonal_relaxed")
+
+    # sorted partition let row group statistics skip rows outside of a position range
+    lf = lf.sort("position")
+    if opts.compact_dtypes:
+        lf = writer.compact(lf)
+
+    if not opts.partition_dataset:
+        _sink_parquet(opts, lf, output_path / f"{chromosome}.parquet")
+        return
+
+    (output_path / chromosome).mkdir(exist_ok=True)
+    if opts.memory_limit is None:
+        with profile.stage("sink", input_path=output_path / chromosome) as current:
+            merged = profile.collect(lf, current)
+            for (dataset,), df in merged.partition_by("dataset", as_dict=True).items():
+                df.write_parquet(output_path / chromosome / f"{dataset}.parquet", **_parquet_options(opts))
+            if current is not None:
+                current.rows_out = merged.height
+        return
+
+    _sink_parquet(opts, lf, output_path / chromosome, partition_by="dataset")
+
+
+def _sink_parquet(
+    opts: argparse.Namespace,
+    lf: polars.LazyFrame,
+    path: pathlib.Path,
+    partition_by: str | None = None,
+) -> None:
+    """Write lf in parquet, with --memory-limit check all nodes are run by streaming engine.
+
+    With partition_by, path is a directory and one `<value>.parquet` is write by value of column, in one run of plan.
+
+    Raises:
+        StreamingError: if a node of plan fall back to in-memory engine.
+    """
+    if opts.memory_limit is not None and (nodes := _in_memory_nodes(lf)):
+        raise StreamingError(f"write of {path.name} run {', '.join(nodes)} in memory")
+
+    target: pathlib.Path | polars.PartitionByKey = path
+    if partition_by is not None:
+        target = polars.PartitionByKey(
+            path,
+            by=partition_by,
+            file_path=lambda context: f"{context.keys[0].str_value}.parquet",
+        )
+
+    with profile.stage("sink", input_path=path) as current:
+        profile.collect(lf.sink_parquet(target, lazy=True, **_parquet_options(opts)), current, engine="streaming")
+        if current is not None:
+            current.rows_out = (
+                polars.scan_parquet(path if partition_by is None else path / "*.parquet")
+                .select(polars.len())
+                .collect()
+                .item()
+            )
+
+
+def _parquet_options(opts: argparse.Namespace) -> dict[str, typing.Any]:
+    """Get parquet options of merge output from --compression, --compression-level and --row-group-size."""
+    return writer.parquet_options(opts.compression, opts.compression_level, opts.row_group_size)
+
+
+IN_MEMORY_LEGEND_RE: typing.Pattern = re.compile(
+    r'<FONT COLOR="(?P<color>[^"]*)">[^<]*</FONT>\s*in-memory engine fallback',
+)
+"""Legend entry of in-memory engine fallback color in polars streaming physical plan graph."""
+
+GRAPH_NODE_RE: typing.Pattern = re.compile(r'\[label="((?:[^"\\]|\\.)*)"(?:,style=filled,fillcolor="([^"]*)")?\]')
+"""Node of polars streaming physical plan graph, label and fill color."""
+
+
+def _in_memory_nodes(lf: polars.LazyFrame) -> list[str]:
+    """Get name of physical plan nodes that polars streaming engine can't run.
+
+    Fallback color is read in graph legend, graph without legend or node isn't trusted.
+
+    Raises:
+        StreamingError: if polars graph format isn't recognized.
+    """
+    graph = lf.show_graph(engine="streaming", plan_stage="physical", raw_output=True)
+
+    legend = IN_MEMORY_LEGEND_RE.search(graph)
+    nodes = GRAPH_NODE_RE.findall(graph)
+    if legend is None or not nodes:
+        raise StreamingError(
+            f"polars {polars.__version__} streaming graph format isn't recognized, streaming of plan can't be checked",
+        )
+
+    return [
+        " ".join(re.split(r"(?:\\n|\n|\s)+", label.replace('\\"', '"'))).strip()
+        for label, color in nodes
+        if color == legend["color"]
+    ]
+
+
+def _store_schema(store: pathlib.Path) -> dict[str, polars.DataType] | None:
+    """Get schema of a partitioned store, union of schema of each parquet with supertype of column."""
+    schemas = [
+        polars.LazyFrame(schema=polars.read_parquet_schema(path))
+        for path in (*store.glob("*.parquet"), *store.glob("*/*.parquet"))
+        if not path.relative_to(store).parts[0].startswith(".") and path.stat().st_size != 0
+    ]
+    if not schemas:
+        return None
+
+    return dict(polars.concat(schemas, how="diagonal_relaxed").collect_schema())
+
+
+def _datasets(
+    opts: argparse.Namespace,
+) -> list[tuple[str, pathlib.Path, pathlib.Path, pathlib.Path | None, pathlib.Path | None]]:
+    """Group input of each dataset, name, query, labeled query, snpeff and vep annotation."""
+    snpeffs = [None] * len(opts.name_dataset) if opts.snpeff_path is None else opts.snpeff_path
+    veps = [None] * len(opts.name_dataset) if opts.vep_path is None else opts.vep_path
+
+    return list(zip(opts.name_dataset, opts.query_path, opts.query_path_labeled, snpeffs, veps))
+
+
+def _dataset_lazyframe(  # noqa: PLR0917 one argument by dataset input
+    opts: argparse.Namespace,
+    read_options: dict[str, typing.Any],
+    name: str,
+    query: pathlib.Path,
+    label: pathlib.Path,
+    snpeff: pathlib.Path | None,
+    vep: pathlib.Path | None,
+) -> polars.LazyFrame | None:
+    """Join query of a dataset with label and annotation, None if query contains no record."""
+    lf = reader.vcf2lazyframe(query, **read_options)
+    if lf is None:
+        return None
+    lf = lf.with_columns(join.variant_key())
+
+    label_lf = reader.vcf2lazyframe(label, columns=["chr", "position", "ref", "alt", "format_bd"], **read_options)
+    if label_lf is None:
+        # no labeled record in regions
+        lf = lf.with_columns(format_bd=polars.lit(None, polars.String))
+    else:
+        lf = lf.join(_keyed(label_lf), on=join.VARIANT_KEY_COLUMNS, how="left")
+
+    for annotator, annotation_path, info_id in (("snpeff", snpeff, "ANN"), ("vep", vep, "CSQ")):
+        if annotation_path is None:
+            continue
+
+        annot_lf = reader.vcf2lazyframe(
+            annotation_path,
+            columns=["chr", "position", "ref", "alt", f"info_{info_id}"],
+            **read_options,
+        )
+        if annot_lf is None:
+            continue
+
+        parse = functools.partial(
+            reader.parse_info_ann,
+            prefix=annotator,
+            fields=reader.annotation_fields(annotation_path, info_id),
+            column=f"info_{info_id}",
+            most_severe=opts.most_severe,
+        )
+        lf = lf.join(_keyed(parse(annot_lf)), on=join.VARIANT_KEY_COLUMNS, how="left")
+
+    lf = lf.with_columns(dataset=polars.lit(name))
+    profile.explain(lf, name)
+
+    return lf
+
+
+@reader.spool_scope()
+def _write_dataset(
+    opts: argparse.Namespace,
+    read_options: dict[str, typing.Any],
+    dataset: tuple[str, pathlib.Path, pathlib.Path, pathlib.Path | None, pathlib.Path | None],
+    output_path: pathlib.Path,
+) -> bool:
+    """Build a dataset and write it in parquet in output directory, False if query contains no record."""
+    if (lf := _dataset_lazyframe(opts, read_options, *dataset)) is None:
+        return False
+
+    output_path.mkdir(parents=True)
+    with profile.stage("sink", dataset=dataset[0]) as current:
+        profile.collect(lf.sink_parquet(output_path / "0.parquet", lazy=True), current)
+        if current is not None:
+            current.rows_out = polars.scan_parquet(output_path / "0.parquet").select(polars.len()).collect().item()
+
+    return True
+
+
+def _write_sorted_dataset(
+    opts: argparse.Namespace,
+    read_options: dict[str, typing.Any],
+    dataset: tuple[str, pathlib.Path, pathlib.Path, pathlib.Path | None, pathlib.Path | None],
+    output_path: pathlib.Path,
+) -> bool:
+    """Build a dataset, clinvar included, with sorted merge join of vcf batches, each batch is write in output directory.
+
+    Raises:
+        join.UnsortedError: if an input isn't sorted or if query didn't declare chromosome order.
+    """
+    name, query, label, snpeff, vep = dataset
+    regions = read_options["regions"]
+    batch_options = {"info_mode": read_options["info_mode"], "regions": regions}
+    normalize_options = {key: read_options[key] for key in NORMALIZE_OPTIONS}
+
+    if (order := join.chromosome_order(query)) is None:
+        raise join.UnsortedError(f"{query} has no index or contig header to define chromosome order")
+
+    batches = join.sorted_join(
+        (
+            batch.with_columns(join.variant_key())
+            for batch in reader.iter_vcf_batches(query, **batch_options, **normalize_options)
+        ),
+        _sorted_keyed(
+            reader.iter_vcf_batches(
+                label,
+                columns=["chr", "position", "ref", "alt", "format_bd"],
+                **batch_options,
+                **normalize_options,
+            ),
+        ),
+        order,
+        join.VARIANT_KEY_COLUMNS,
+    )
+    batches = (
+        batch if "format_bd" in batch.columns else batch.with_columns(format_bd=polars.lit(None, polars.String))
+        for batch in batches
+    )
+
+    for annotator, annotation_path, info_id in (("snpeff", snpeff, "ANN"), ("vep", vep, "CSQ")):
+        if annotation_path is None:
+            continue
+
+        annotations = _annotation_batches(
+            annotator,
+            annotation_path,
+            info_id,
+            most_severe=opts.most_severe,
+            **batch_options,
+            **normalize_options,
+        )
+        batches = join.sorted_join(batches, _sorted_keyed(annotations), order, join.VARIANT_KEY_COLUMNS)
+
+    batches = (batch.with_columns(dataset=polars.lit(name)) for batch in batches)
+
+    if opts.clinvar_path is not None:
+        clinvar_batches = clinvar.iter_batches(
+            opts.clinvar_path,
+            order,
+            fields=opts.clinvar_field,
+            cache_dir=read_options["cache_dir"],
+            **batch_options,
+        )
+        batches = join.sorted_join(batches, clinvar_batches, order, join.VARIANT_KEY_COLUMNS)
+
+    output_path.mkdir(parents=True)
+    written = False
+    # batches are generated by sorted join, read, join and write of all batches are in stage
+    with profile.stage("sorted join", dataset=name) as current:
+        rows = 0
+        for i, batch in enumerate(batches):
+            if not batch.is_empty():
+                batch.write_parquet(output_path / f"{i}.parquet")
+                written = True
+                rows += batch.height
+        if current is not None:
+            current.rows_out = rows
+
+    return written
+
+
+def _annotation_batches(
+    annotator: str,
+    path: pathlib.Path,
+    info_id: str,
+    *,
+    most_severe: bool,
+    **batch_options: typing.Any,
+) -> collections.abc.Iterator[polars.DataFrame]:
+    """Read annotation of a vcf by batch, annotation field of each batch are parsed in columns prefixed by annotator."""
+    fields = reader.annotation_fields(path, info_id)
+    columns = ["chr", "position", "ref", "alt", f"info_{info_id}"]
+    for batch in reader.iter_vcf_batches(path, columns=columns, **batch_options):
+        yield reader.parse_info_ann(
+            batch.lazy(),
+            annotator,
+            fields,
+            column=f"info_{info_id}",
+            most_severe=most_severe,
+        ).collect()
+
+
+def _sorted_keyed(batches: collections.abc.Iterable[polars.DataFrame]) -> collections.abc.Iterator[polars.DataFrame]:
+    """Replace ref and alt columns by variant key columns, chr and position are keep for sorted_join."""
+    for batch in batches:
+        yield batch.with_columns(join.variant_key()).drop("ref", "alt")
+
+
+def _build_datasets(
+    opts: argparse.Namespace,
+    read_options: dict[str, typing.Any],
+    directory: pathlib.Path,
+    writer: typing.Callable[
+        [argparse.Namespace, dict[str, typing.Any], tuple[typing.Any, ...], pathlib.Path],
+        bool,
+    ],
+) -> list[polars.LazyFrame]:
+    """Build each dataset with writer, in a pool of opts.jobs process if jobs > 1, dataset are write in directory."""
+    datasets = _datasets(opts)
+    paths = [directory / writer.__name__ / str(i) for i in range(len(datasets))]
+    arguments = (itertools.repeat(opts), itertools.repeat(read_options), datasets, paths)
+
+    if opts.jobs <= 1:
+        written = list(map(writer, *arguments))
+    else:
+        # polars thread pool isn't fork safe, threads are split between process
+        threads = resources.job_threads(opts.threads, opts.jobs)
+        arguments = (itertools.repeat(opts), itertools.repeat(read_options | {"threads": threads}), datasets, paths)
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=opts.jobs,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=resources.init_worker,
+            initargs=(threads,),
+        ) as executor:
+            written = []
+            for exist, worker_profile in executor.map(_profiled_writer, itertools.repeat(writer), *arguments):
+                written.append(exist)
+                if worker_profile is not None:
+                    profile.extend(worker_profile)
+
+    return [polars.scan_parquet(path / "*.parquet") for path, exist in zip(paths, written) if exist]
+
+
+def _profiled_writer(
+    writer: typing.Callable[
+        [argparse.Namespace, dict[str, typing.Any], tuple[typing.Any, ...], pathlib.Path],
+        bool,
+    ],
+    opts: argparse.Namespace,
+    *args: typing.Any,
+) -> tuple[bool, profile.Profile | None]:
+    """Run writer in a worker process, with --profile stages of worker are return to be add to merge profile."""
+    if opts.profile is None:
+        return writer(opts, *args), None
+
+    profile.start()
+    try:
+        exist = writer(opts, *args)
+    finally:
+        report = profile.stop()
+
+    return exist, report
+
+
+def _merge_lazyframe(
+    opts: argparse.Namespace,
+    read_options: dict[str, typing.Any],
+    datasets: list[polars.LazyFrame] | None = None,
+    *,
+    with_clinvar: bool = True,
+    clinvar_cache_dir: pathlib.Path | None = None,
+) -> polars.LazyFrame | None:
+    """Build merge of all dataset, None if no dataset contains record.
+
+    Args:
+        opts: merge arguments
+        read_options: Options of vcf2lazyframe
+        datasets: Dataset already build by _build_datasets, otherwise each dataset is build
+        with_clinvar: Join clinvar, false if datasets already contains it
+        clinvar_cache_dir: Directory of clinvar index, default cache_dir of read_options
+
+    Return:
+        Merge of dataset, None if no dataset contains record.
+    """
+    if datasets is None:
+        lfs = [
+            lf for dataset in _datasets(opts) if (lf := _dataset_lazyframe(opts, read_options, *dataset)) is not None
+        ]
+    elif read_options["regions"] is not None:
+        chromosomes = list({name for name, _, _ in read_options["regions"]})
+        lfs = [lf.filter(polars.col("chr").is_in(chromosomes)) for lf in datasets]
+    else:
+        lfs = datasets
+
+    if not lfs:
+        return None
+
+    # missing columns are fill by null and column with different type are cast to their supertype
+    lf = polars.concat(lfs, how="diagonal_relaxed")
+
+    if opts.clinvar_path is not None and with_clinvar:
+        # clinvar vcf is already normalized, index is build without normalization
+        clinvar_options = {key: value for key, value in read_options.items() if key not in NORMALIZE_OPTIONS}
+        if clinvar_cache_dir is not None:
+            clinvar_options["cache_dir"] = clinvar_cache_dir
+        clinvar_lf = clinvar.scan(opts.clinvar_path, fields=opts.clinvar_field, **clinvar_options)
+        if clinvar_lf is None:
+            return lf
+
+        lf = lf.join(clinvar_lf.drop("chr", "position"), on=join.VARIANT_KEY_COLUMNS, how="left")
+
+    return lf
+
+
+def _keyed(lf: polars.LazyFrame) -> polars.LazyFrame:
+    """Replace chr, position, ref and alt columns by variant key columns, to be join on VARIANT_KEY_COLUMNS."""
+    return lf.with_columns(join.variant_key()).drop(join.KEY_COLUMNS)
+
+
+def index_clinvar(opts: argparse.Namespace) -> int:
+    """Build index of clinvar vcf, path of index is write in stdout."""
+    index_path = clinvar.index_path(opts.clinvar_path, fields=opts.clinvar_field, cache_dir=opts.cache_dir)
+    if index_path.is_file() or clinvar.build_index(
+        opts.clinvar_path,
+        index_path,
+        fields=opts.clinvar_field,
+        info_mode=opts.info_mode,
+        threads=opts.threads,
+    ):
+        print(index_path)
+
+    return 0
+
+
+def convert(opts: argparse.Namespace) -> int:
+    """Convert vcf in parquet cache, path of each cache is write in stdout."""
+    for path in opts.input_path:
+        cache_path = reader.parquet_cache_path(
+            path,
+            with_genotype=not opts.without_genotype,
+            sample_layout=opts.sample_layout,
+            cache_dir=opts.cache_dir,
+        )
+        if cache_path.is_file() or reader.vcf2parquet(
+            path,
+            cache_path,
+            with_genotype=not opts.without_genotype,
+            info_mode=opts.info_mode,
+            threads=opts.threads,
+            sample_layout=opts.sample_layout,
+        ):
+            print(cache_path)
+
+    return 0
@@ -6,6 +6,8 @@ import sys
 from dataclasses import dataclass
 from importlib import metadata
 
+from vkd._internal import resources
+
 
 @dataclass
 class _Variable:
@@ -43,6 +45,8 @@ class _Environment:
     """Installed packages."""
     variables: list[_Variable]
     """Environment variables."""
+    resources: list[_Variable]
+    """Effective resource settings."""
 
 
 def _interpreter_name_version() -> tuple[str, str]:
@@ -87,6 +91,7 @@ def _get_debug_info() -> _Environment:
         platform=platform.platform(),
         variables=[_Variable(var, val) for var in variables if (val := os.getenv(var))],  # ty: ignore[invalid-argument-type]
         packages=[_Package(pkg, _get_version(pkg)) for pkg in packages],
+        resources=[_Variable(name, value) for name, value in resources.settings().items()],
     )
 
 
@@ -103,6 +108,9 @@ def _print_debug_info() -> None:
     print("- __Installed packages__:")
     for pkg in info.packages:
         print(f"  - `{pkg.name}` v{pkg.version}")
+    print("- __Resources__:")
+    for var in info.resources:
+        print(f"  - `{var.name}`: `{var.value}`")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,275 @@
+"""Stage level profiling and timeline trace of vkd commands.
+
+Profiling is enabled by `start`, without it `stage` record nothing and `collect` only collect its lazy frame.
+
+Trace is enabled by VKD_TRACE environment variable, spans are append to this file in Chrome trace event format, it
+could be open in Perfetto or chrome://tracing. Function decorated by `traced` are return unchanged if variable isn't
+set when module is imported.
+"""
+
+# std import
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import functools
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import threading
+import time
+import typing
+
+# 3rd party import
+# project import
+from vkd._internal import debug
+
+if typing.TYPE_CHECKING:
+    # std import
+    import collections.abc
+    import pathlib
+
+    # 3rd party import
+    import polars
+
+# polars is imported only when profiling, cli import this module before polars thread pool configuration
+
+TRACE_VARIABLE: str = "VKD_TRACE"
+"""Environment variable that contains path of trace file."""
+
+Function = typing.TypeVar("Function", bound=typing.Callable[..., typing.Any])
+
+
+@dataclasses.dataclass
+class Stage:
+    """Resource usage of one stage."""
+
+    name: str
+    """Stage name."""
+    dataset: str | None = None
+    """Name of dataset processed, None if stage isn't specific to a dataset."""
+    input_path: str | None = None
+    """Path of input read, None if stage didn't read an input."""
+    pid: int = 0
+    """Process that run stage."""
+    wall_time: float = 0.0
+    """Elapsed time in seconds."""
+    cpu_time: float = 0.0
+    """Cpu time of all threads of process in seconds, include concurrent stage of same process."""
+    rows_out: int | None = None
+    """Number of rows of stage output, None if unknown."""
+    peak_rss: int = 0
+    """Peak resident set size of process at end of stage in bytes."""
+    nodes: list[dict[str, typing.Any]] | None = None
+    """Polars node timings of plan run by stage, start and end in microseconds, None if stage didn't run a plan."""
+
+
+@dataclasses.dataclass
+class Profile:
+    """Stages and polars plans recorded during a command."""
+
+    stages: list[Stage] = dataclasses.field(default_factory=list)
+    """Stages in end order."""
+    plans: list[dict[str, str]] = dataclasses.field(default_factory=list)
+    """Optimized plan of each dataset branch."""
+
+
+_profile: Profile | None = None
+
+
+def start() -> Profile:
+    """Enable profiling in current process."""
+    global _profile  # noqa: PLW0603 profiling state is process wide
+    _profile = Profile()
+
+    return _profile
+
+
+def stop() -> Profile | None:
+    """Disable profiling in current process, return profile recorded."""
+    global _profile
+    profile, _profile = _profile, None
+
+    return profile
+
+
+@contextlib.contextmanager
+def stage(
+    name: str,
+    *,
+    dataset: str | None = None,
+    input_path: pathlib.Path | None = None,
+) -> collections.abc.Iterator[Stage | None]:
+    """Measure resource usage of code run in context, stage is None if profiling is disabled, stage is a trace span.
+
+    Args:
+        name: Stage name
+        dataset: Name of dataset processed
+        input_path: Path of input read
+
+    Return:
+        A context manager that yield stage, caller could set rows_out.
+    """
+    with span(name, dataset=dataset, input_path=input_path):
+        if (profile := _profile) is None:
+            yield None
+            return
+
+        current = Stage(name, dataset, None if input_path is None else str(input_path), os.getpid())
+        wall_begin, cpu_begin = time.perf_counter(), time.process_time()
+        try:
+            yield current
+        finally:
+            current.wall_time = time.perf_counter() - wall_begin
+            current.cpu_time = time.process_time() - cpu_begin
+            current.peak_rss = _peak_rss()
+            profile.stages.append(current)
+
+
+def collect(lf: polars.LazyFrame, current: Stage | None, **kwargs: typing.Any) -> polars.DataFrame:
+    """Collect lf, if profiling is enabled time of each node of plan is record in current stage.
+
+    Plan is run once, a lazy sink is profiled as it run without profiling.
+
+    Args:
+        lf: Lazy frame or lazy sink
+        current: Stage yield by `stage`
+        kwargs: Options of polars collect
+
+    Return:
+        Result of lf, an empty DataFrame for a sink.
+    """
+    if current is None:
+        return lf.collect(**kwargs)
+
+    df, timings = lf.profile(**kwargs)
+    current.nodes = timings.to_dicts()
+
+    return df
+
+
+def explain(lf: polars.LazyFrame, dataset: str) -> None:
+    """Record optimized plan of a dataset branch if profiling is enabled."""
+    if _profile is not None:
+        _profile.plans.append({"dataset": dataset, "plan": lf.explain()})
+
+
+def extend(other: Profile) -> None:
+    """Add stages and plans recorded by another process."""
+    if _profile is not None:
+        _profile.stages.extend(other.stages)
+        _profile.plans.extend(other.plans)
+
+
+def write(profile: Profile, path: pathlib.Path) -> None:
+    """Write profile in json with environment information."""
+    with open(path, "w") as fh:
+        json.dump(
+            {
+                "environment": dataclasses.asdict(debug._get_debug_info()),
+                "stages": [dataclasses.asdict(current) for current in profile.stages],
+                "plans": profile.plans,
+            },
+            fh,
+            indent=2,
+        )
+
+
+def _peak_rss() -> int:
+    """Get peak resident set size of current process in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # linux report kilobytes, macos bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+_trace_fd: int | None = None
+_trace_lock: threading.Lock = threading.Lock()
+
+
+def init_trace(path: pathlib.Path) -> None:
+    """Create an empty trace file and enable trace in current process and in module imported after."""
+    with open(path, "w") as fh:
+        # closing bracket is optional in Chrome trace format, spans are append as they end
+        print("[", file=fh)
+
+    os.environ[TRACE_VARIABLE] = str(path.resolve())
+
+
+def traced(function: Function) -> Function:
+    """Record a span for each call of function if trace is enabled when function is decorated."""
+    if TRACE_VARIABLE not in os.environ:
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        with span(function.__qualname__, module=function.__module__):
+            return function(*args, **kwargs)
+
+    return typing.cast("Function", wrapper)
+
+
+@contextlib.contextmanager
+def span(name: str, **args: typing.Any) -> collections.abc.Iterator[None]:
+    """Record a span of code run in context in trace file, do nothing if trace is disabled.
+
+    Args:
+        name: Span name
+        args: Information attach to span, None value are ignored
+
+    Return:
+        A context manager.
+    """
+    if (fd := _trace()) is None:
+        yield
+        return
+
+    begin = time.monotonic_ns()
+    try:
+        yield
+    finally:
+        end = time.monotonic_ns()
+        _write_event(
+            fd,
+            {
+                "name": name,
+                "cat": "vkd",
+                "ph": "X",
+                "ts": begin / 1_000,
+                "dur": (end - begin) / 1_000,
+                "pid": os.getpid(),
+                "tid": threading.get_native_id(),
+                "args": {key: str(value) for key, value in args.items() if value is not None},
+            },
+        )
+
+
+def _trace() -> int | None:
+    """Get file descriptor of trace file, open it on first call of process, None if trace is disabled."""
+    global _trace_fd  # noqa: PLW0603 trace file is process wide
+    if _trace_fd is not None or TRACE_VARIABLE not in os.environ:
+        return _trace_fd
+
+    with _trace_lock:
+        if _trace_fd is None:
+            # each event is write by one call to an append only file, process of pool could share it
+            fd = os.open(os.environ[TRACE_VARIABLE], os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+            _write_event(
+                fd,
+                {
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "args": {"name": f"vkd {multiprocessing.current_process().name}"},
+                },
+            )
+            _trace_fd = fd
+
+    return _trace_fd
+
+
+def _write_event(fd: int, event: dict[str, typing.Any]) -> None:
+    """Append an event to trace file."""
+    os.write(fd, f"{json.dumps(event)},\n".encode())
@@ -0,0 +1,81 @@
+"""Control of thread and process used by vkd.
+
+Polars read `POLARS_MAX_THREADS` when its thread pool start, this module didn't import polars, `configure` must be
+call before any polars usage. Other module of vkd import polars, they must be imported after `configure`.
+"""
+
+# std import
+from __future__ import annotations
+
+import logging
+import os
+import sys
+
+# 3rd party import
+# project import
+
+POLARS_THREADS_VARIABLE: str = "POLARS_MAX_THREADS"
+"""Environment variable read by polars to size its thread pool."""
+
+
+def available_cpus() -> int:
+    """Get number of cpu usable by process, cpu affinity and cgroup cpuset are respected."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1  # pragma: no cover
+
+
+def job_threads(threads: int, jobs: int) -> int:
+    """Get number of thread of each process when threads are shared by jobs process."""
+    return max(1, threads // max(1, jobs))
+
+
+def configure(threads: int | None, jobs: int = 1) -> tuple[int, int]:
+    """Configure polars thread pool of current process and size process pool, must be call before polars usage.
+
+    Total number of thread never exceed threads, jobs is reduce if there are more jobs than threads and each process of
+    pool get `threads // jobs` threads.
+
+    Args:
+        threads: Number of thread usable by vkd, default number of available cpu
+        jobs: Number of process requested for parallel stages
+
+    Return:
+        Effective number of threads and jobs.
+    """
+    logger = logging.getLogger("resources")
+
+    threads = available_cpus() if threads is None else max(1, threads)
+    if jobs > threads:
+        logger.warning(f"--jobs {jobs} is reduce to {threads}, each process use at least one of --threads {threads}")
+        jobs = threads
+    jobs = max(1, jobs)
+
+    os.environ[POLARS_THREADS_VARIABLE] = str(threads)
+
+    if "polars" in sys.modules and (pool_size := polars_pool_size()) != threads:
+        logger.warning(f"polars thread pool already start with {pool_size} threads, --threads {threads} is ignored")
+
+    return threads, jobs
+
+
+def init_worker(threads: int) -> None:
+    """Configure polars thread pool of a process pool worker, must be use as pool initializer."""
+    os.environ[POLARS_THREADS_VARIABLE] = str(threads)
+
+
+def polars_pool_size() -> int:
+    """Get size of polars thread pool, pool is start if it isn't."""
+    import polars  # noqa: PLC0415 polars is import only after configure
+
+    return polars.thread_pool_size()
+
+
+def settings() -> dict[str, str]:
+    """Get effective resource settings of current process."""
+    return {
+        "available cpus": str(available_cpus()),
+        POLARS_THREADS_VARIABLE: os.environ.get(POLARS_THREADS_VARIABLE, "unset"),
+        "polars thread pool": str(polars_pool_size()),
+    }
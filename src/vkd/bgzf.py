@@ -0,0 +1,422 @@
+"""vkd BGZF block reader."""
+
+# std import
+from __future__ import annotations
+
+import collections
+import collections.abc
+import concurrent.futures
+import dataclasses
+import mmap
+import struct
+import typing
+
+# 3rd party import
+try:
+    from isal import isal_zlib as zlib
+except ImportError:  # pragma: no cover
+    import zlib  # type: ignore[no-redef]
+
+# project import
+from vkd._internal import resources
+
+if typing.TYPE_CHECKING:
+    # std import
+    import pathlib
+
+
+BGZF_MAGIC: bytes = b"\x1f\x8b\x08\x04"
+"""Begin of each BGZF block, gzip member with extra field."""
+
+BLOCK_BY_TASK: int = 64
+"""Number of BGZF block decompress by one worker task, around 4 MiB of uncompressed data."""
+
+TASK_BY_THREAD: int = 2
+"""Number of task in flight by worker, only this window of compressed and uncompressed blocks is in memory."""
+
+
+def is_bgzf(path: pathlib.Path) -> bool:
+    """Check if file is compressed with BGZF.
+
+    Args:
+        path: Path to a file
+
+    Return:
+        True if first block of file is a BGZF block.
+    """
+    with open(path, "rb") as fh:
+        header = fh.read(16)
+
+    return len(header) == 16 and header.startswith(BGZF_MAGIC) and header[12:14] == b"BC"  # noqa: PLR2004 header size
+
+
+def block_offsets(path: pathlib.Path) -> list[int]:
+    """Get compressed offset of each BGZF block.
+
+    If a `.gzi` index exist next to file it's used, otherwise all block header are read.
+
+    Args:
+        path: Path to a BGZF file
+
+    Return:
+        Offset of each block in compressed file.
+    """
+    gzi_path = path.with_name(f"{path.name}.gzi")
+    if gzi_path.is_file():
+        return _read_gzi(gzi_path)
+
+    offsets = []
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        offset = 0
+        while offset < len(data):
+            offsets.append(offset)
+            offset += _block_size(data, offset)
+
+    return offsets
+
+
+def _read_gzi(path: pathlib.Path) -> list[int]:
+    """Read compressed offset of each block store in a gzi index."""
+    with open(path, "rb") as fh:
+        data = fh.read()
+
+    (nb_entry,) = struct.unpack_from("<Q", data)
+    entries = struct.unpack_from(f"<{2 * nb_entry}Q", data, 8)
+
+    return [0, *entries[::2]]
+
+
+def _block_size(data: bytes | mmap.mmap, offset: int) -> int:
+    """Get total size of BGZF block start at offset."""
+    if data[offset : offset + 4] != BGZF_MAGIC:
+        raise ValueError(f"Not a BGZF block at offset {offset}")
+
+    (xlen,) = struct.unpack_from("<H", data, offset + 10)
+    extra = offset + 12
+    while extra < offset + 12 + xlen:
+        subfield_id = data[extra : extra + 2]
+        (subfield_len,) = struct.unpack_from("<H", data, extra + 2)
+        if subfield_id == b"BC":
+            (bsize,) = struct.unpack_from("<H", data, extra + 4)
+            return bsize + 1
+        extra += 4 + subfield_len
+
+    raise ValueError(f"BGZF block at offset {offset} has no BC subfield")
+
+
+def _inflate_blocks(data: bytes) -> bytes:
+    """Decompress a run of consecutive BGZF block."""
+    uncompressed = []
+    offset = 0
+    while offset < len(data):
+        size = _block_size(data, offset)
+        (xlen,) = struct.unpack_from("<H", data, offset + 10)
+        uncompressed.append(zlib.decompress(data[offset + 12 + xlen : offset + size - 8], wbits=-15))
+        offset += size
+
+    return b"".join(uncompressed)
+
+
+def decompress(
+    path: pathlib.Path,
+    threads: int | None = None,
+    offsets: list[int] | None = None,
+) -> bytes:
+    """Decompress BGZF file in memory, use iter_decompress for large file.
+
+    Args:
+        path: Path to a BGZF file
+        threads: Number of worker, default number of cpu available to process
+        offsets: Offset of each block, default compute by block_offsets
+
+    Return:
+        Uncompressed content of file.
+    """
+    return b"".join(iter_decompress(path, threads, offsets))
+
+
+def iter_decompress(
+    path: pathlib.Path,
+    threads: int | None = None,
+    offsets: list[int] | None = None,
+) -> collections.abc.Iterator[bytes]:
+    """Decompress BGZF file by run of BLOCK_BY_TASK blocks, runs are decompressed in parallel and yield in order.
+
+    Args:
+        path: Path to a BGZF file
+        threads: Number of worker, default number of cpu available to process
+        offsets: Offset of each block, default compute by block_offsets
+
+    Return:
+        An iterator of uncompressed content, at most TASK_BY_THREAD runs by worker are in memory.
+    """
+    offsets = block_offsets(path) if offsets is None else offsets
+    threads = resources.available_cpus() if threads is None else threads
+
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        bounds = [*offsets[::BLOCK_BY_TASK], len(data)]
+        yield from _ordered_map(
+            _inflate_blocks,
+            (data[begin:end] for begin, end in zip(bounds, bounds[1:])),
+            threads,
+        )
+
+
+def _ordered_map(
+    function: typing.Callable[[typing.Any], bytes],
+    tasks: collections.abc.Iterable[typing.Any],
+    threads: int,
+) -> collections.abc.Iterator[bytes]:
+    """Map function on tasks in a thread pool, in order, tasks are consumed only when a window slot is free."""
+    if threads <= 1:
+        yield from map(function, tasks)
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        window: collections.deque[concurrent.futures.Future[bytes]] = collections.deque()
+        for task in tasks:
+            window.append(executor.submit(function, task))
+            if len(window) >= threads * TASK_BY_THREAD:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+TABIX_MIN_SHIFT: int = 14
+"""Number of bits of smallest bin in tabix index."""
+
+TABIX_DEPTH: int = 5
+"""Number of bin level in tabix index."""
+
+
+@dataclasses.dataclass
+class Index:
+    """Binning index of a BGZF file, read from a tabix or csi file."""
+
+    names: list[str]
+    """Name of each reference sequence."""
+    min_shift: int
+    """Number of bits of smallest bin."""
+    depth: int
+    """Number of bin level."""
+    bins: list[dict[int, list[tuple[int, int]]]]
+    """Chunks of virtual offset associate to each bin, by reference."""
+    linear: list[list[int]]
+    """Tabix linear index, minimal virtual offset of record overlapping each 16 kbp window, by reference."""
+    bin_offsets: list[dict[int, int]]
+    """Csi minimal virtual offset of record overlapping each bin, by reference."""
+
+    def chunks(self, name: str, begin: int, end: int) -> list[tuple[int, int]]:
+        """Get merged chunks of virtual offset that could contains record overlapping region.
+
+        Args:
+            name: Reference sequence name
+            begin: Region begin 0-based inclusive
+            end: Region end 0-based exclusive
+
+        Return:
+            Sorted and merged list of virtual offset chunks.
+        """
+        if name not in self.names:
+            return []
+
+        ref_id = self.names.index(name)
+        end = min(end, 1 << (self.min_shift + self.depth * 3))
+        begin = min(begin, end - 1)
+
+        bins = _reg2bins(begin, end, self.min_shift, self.depth)
+
+        if linear := self.linear[ref_id]:
+            min_offset = linear[min(begin >> self.min_shift, len(linear) - 1)]
+        else:
+            min_offset = min(
+                (self.bin_offsets[ref_id][bin_id] for bin_id in bins if bin_id in self.bin_offsets[ref_id]),
+                default=0,
+            )
+
+        return merge_chunks(
+            [chunk for bin_id in bins for chunk in self.bins[ref_id].get(bin_id, []) if chunk[1] > min_offset],
+        )
+
+
+def merge_chunks(chunks: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Sort and merge overlapping chunks of virtual offset."""
+    merged: list[tuple[int, int]] = []
+    for chunk_begin, chunk_end in sorted(chunks):
+        if merged and chunk_begin <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], chunk_end))
+        else:
+            merged.append((chunk_begin, chunk_end))
+
+    return merged
+
+
+def _reg2bins(begin: int, end: int, min_shift: int, depth: int) -> list[int]:
+    """Get all bins that could overlap region [begin, end)."""
+    bins = []
+    end -= 1
+    shift = min_shift + depth * 3
+    first_bin = 0
+    for level in range(depth + 1):
+        bins.extend(range(first_bin + (begin >> shift), first_bin + (end >> shift) + 1))
+        shift -= 3
+        first_bin += 1 << (level * 3)
+
+    return bins
+
+
+def find_index(path: pathlib.Path) -> pathlib.Path | None:
+    """Found tabix or csi index associate to a BGZF file."""
+    for suffix in (".tbi", ".csi"):
+        if (index_path := path.with_name(f"{path.name}{suffix}")).is_file():
+            return index_path
+
+    return None
+
+
+def read_index(path: pathlib.Path) -> Index:
+    """Read a tabix or csi index.
+
+    Args:
+        path: Path to a `.tbi` or `.csi` file
+
+    Return:
+        Binning index.
+    """
+    data = decompress(path, threads=1)
+    is_tabix = data[:4] == b"TBI\x01"
+
+    if is_tabix:
+        min_shift, depth = TABIX_MIN_SHIFT, TABIX_DEPTH
+        (n_ref,) = struct.unpack_from("<i", data, 4)
+        aux_offset = 8
+        offset = 0
+    elif data[:4] == b"CSI\x01":
+        min_shift, depth, l_aux = struct.unpack_from("<3i", data, 4)
+        aux_offset = 16
+        (n_ref,) = struct.unpack_from("<i", data, 16 + l_aux)
+        offset = 16 + l_aux + 4
+    else:
+        raise ValueError(f"{path} isn't a tabix or csi index")
+
+    # aux data: format, col_seq, col_beg, col_end, meta, skip, l_nm, names
+    (l_nm,) = struct.unpack_from("<i", data, aux_offset + 24)
+    names = [name.decode() for name in data[aux_offset + 28 : aux_offset + 28 + l_nm].split(b"\x00") if name]
+    if is_tabix:
+        offset = aux_offset + 28 + l_nm
+
+    pseudo_bin = ((1 << ((depth + 1) * 3)) - 1) // 7 + 1
+
+    index = Index(names=names, min_shift=min_shift, depth=depth, bins=[], linear=[], bin_offsets=[])
+    for _ in range(n_ref):
+        bins: dict[int, list[tuple[int, int]]] = {}
+        bin_offsets: dict[int, int] = {}
+        linear: list[int] = []
+
+        (n_bin,) = struct.unpack_from("<i", data, offset)
+        offset += 4
+        for _ in range(n_bin):
+            (bin_id,) = struct.unpack_from("<I", data, offset)
+            offset += 4
+            if not is_tabix:
+                (bin_offsets[bin_id],) = struct.unpack_from("<Q", data, offset)
+                offset += 8
+            (n_chunk,) = struct.unpack_from("<i", data, offset)
+            offset += 4
+            chunks = struct.unpack_from(f"<{2 * n_chunk}Q", data, offset)
+            offset += 16 * n_chunk
+            if bin_id != pseudo_bin:
+                bins[bin_id] = list(zip(chunks[::2], chunks[1::2]))
+
+        if is_tabix:
+            (n_intv,) = struct.unpack_from("<i", data, offset)
+            offset += 4
+            linear = list(struct.unpack_from(f"<{n_intv}Q", data, offset))
+            offset += 8 * n_intv
+
+        index.bins.append(bins)
+        index.linear.append(linear)
+        index.bin_offsets.append(bin_offsets)
+
+    return index
+
+
+def _inflate_chunk(task: tuple[bytes, int, int]) -> bytes:
+    """Decompress a run of BGZF block, skip begin of first block and keep only begin of last block."""
+    data, first_offset, last_offset = task
+
+    uncompressed = []
+    offset = 0
+    while offset < len(data):
+        size = _block_size(data, offset)
+        uncompressed.append(_inflate_blocks(data[offset : offset + size]))
+        offset += size
+
+    if last_offset:
+        uncompressed[-1] = uncompressed[-1][:last_offset]
+    uncompressed[0] = uncompressed[0][first_offset:]
+
+    return b"".join(uncompressed)
+
+
+def read_chunks(
+    path: pathlib.Path,
+    chunks: list[tuple[int, int]],
+    threads: int | None = None,
+) -> bytes:
+    """Decompress only part of BGZF file between virtual offset in memory, use iter_chunks for large part.
+
+    Args:
+        path: Path to a BGZF file
+        chunks: Sorted list of not overlapping virtual offset chunks [begin, end)
+        threads: Number of worker, default number of cpu available to process
+
+    Return:
+        Uncompressed content of chunks.
+    """
+    return b"".join(iter_chunks(path, chunks, threads))
+
+
+def iter_chunks(
+    path: pathlib.Path,
+    chunks: list[tuple[int, int]],
+    threads: int | None = None,
+) -> collections.abc.Iterator[bytes]:
+    """Decompress only part of BGZF file between virtual offset, by run of at most BLOCK_BY_TASK blocks.
+
+    Args:
+        path: Path to a BGZF file
+        chunks: Sorted list of not overlapping virtual offset chunks [begin, end)
+        threads: Number of worker, default number of cpu available to process
+
+    Return:
+        An iterator of uncompressed content of chunks, at most TASK_BY_THREAD runs by worker are in memory.
+    """
+    threads = resources.available_cpus() if threads is None else threads
+
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        yield from _ordered_map(_inflate_chunk, _chunk_tasks(data, chunks), threads)
+
+
+def _chunk_tasks(
+    data: mmap.mmap,
+    chunks: list[tuple[int, int]],
+) -> collections.abc.Iterator[tuple[bytes, int, int]]:
+    """Split chunks in runs of BLOCK_BY_TASK blocks, with uncompressed offset to skip in first and keep in last block."""
+    for chunk_begin, chunk_end in chunks:
+        offset = chunk_begin >> 16
+        block_end = chunk_end >> 16
+        if chunk_end & 0xFFFF:
+            block_end += _block_size(data, block_end)
+
+        first_offset = chunk_begin & 0xFFFF
+        while offset < block_end:
+            task_end = offset
+            for _ in range(BLOCK_BY_TASK):
+                if task_end >= block_end:
+                    break
+                task_end += _block_size(data, task_end)
+
+            yield data[offset:task_end], first_offset, chunk_end & 0xFFFF if task_end >= block_end else 0
+            first_offset = 0
+            offset = task_end
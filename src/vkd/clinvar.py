@@ -0,0 +1,219 @@
+"""vkd ClinVar index, a compact position sorted parquet of ClinVar variants ready to be join."""
+
+# std import
+from __future__ import annotations
+
+import os
+import pathlib
+import re
+import typing
+
+# 3rd party import
+import polars
+import xopen
+
+# project import
+from vkd import join, reader
+from vkd._internal import profile
+
+if typing.TYPE_CHECKING:
+    # std import
+    import collections.abc
+
+INDEX_FORMAT: int = 2
+"""Version of index content, increase it when layout change to invalidate previous index."""
+
+INDEX_ROW_GROUP_SIZE: int = 65_536
+"""Number of rows of index row group, statistics of sorted row group let a region read only few of them."""
+
+FILE_DATE_RE: typing.Pattern = re.compile(r"^##fileDate=(?P<date>\S+)")
+
+
+def version(path: pathlib.Path) -> str | None:
+    """Get ClinVar release of a vcf, from fileDate header line, None if header didn't contain it."""
+    with xopen.xopen(path) as fh:
+        for line in fh:
+            if not line.startswith("##"):
+                break
+            if search := FILE_DATE_RE.search(line):
+                return search["date"]
+
+    return None
+
+
+def index_path(
+    path: pathlib.Path,
+    *,
+    fields: list[str] | None = None,
+    cache_dir: pathlib.Path | None = None,
+) -> pathlib.Path:
+    """Get path of index of a ClinVar vcf.
+
+    Name of index depend on ClinVar release, vcf digest, see `vkd.reader.file_digest`, index format and fields.
+
+    Args:
+        path: Path to ClinVar vcf
+        fields: Id of INFO field keep in index, default all
+        cache_dir: Directory where index are store, default VKD_CACHE_DIR environment variable or vcf directory
+
+    Return:
+        Path of index, file may not exist.
+    """
+    if cache_dir is None:
+        cache_dir = pathlib.Path(os.environ["VKD_CACHE_DIR"]) if "VKD_CACHE_DIR" in os.environ else path.parent
+
+    digest = reader.file_digest(path, [INDEX_FORMAT, None if fields is None else sorted(fields)])
+
+    return cache_dir / f"{path.name}.{version(path) or 'unknown'}.{digest}.index.parquet"
+
+
+@profile.traced
+def build_index(
+    path: pathlib.Path,
+    output_path: pathlib.Path,
+    *,
+    fields: list[str] | None = None,
+    info_mode: reader.InfoMode = "regex",
+    threads: int | None = None,
+) -> bool:
+    """Parse a ClinVar vcf and write its index, sorted by contig and position.
+
+    Index contains normalized contig name, position, ref, variant key columns and INFO fields renamed `clinvar_*`.
+
+    Args:
+        path: Path to ClinVar vcf
+        output_path: Path where index is write
+        fields: Id of INFO field keep in index, default all
+        info_mode: How INFO column is decoded
+        threads: Number of thread used to decompress BGZF file, default polars thread pool size
+
+    Return:
+        False if vcf contains no record, and index isn't write.
+    """
+    with reader.spool_scope():
+        lf = reader.vcf2lazyframe(path, with_genotype=False, info_mode=info_mode, threads=threads, info_fields=fields)
+        if lf is None:
+            return False
+
+        # write in a temporary file to never expose a partial index
+        tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
+        try:
+            with profile.stage("clinvar index", input_path=path):
+                _layout(lf).sort("chr", "position").sink_parquet(
+                    tmp_path,
+                    statistics=True,
+                    row_group_size=INDEX_ROW_GROUP_SIZE,
+                )
+            tmp_path.replace(output_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    return True
+
+
+def scan(
+    path: pathlib.Path,
+    *,
+    fields: list[str] | None = None,
+    regions: list[reader.Region] | None = None,
+    cache: bool = False,
+    cache_dir: pathlib.Path | None = None,
+    info_mode: reader.InfoMode = "regex",
+    threads: int | None = None,
+) -> polars.LazyFrame | None:
+    """Read ClinVar variants in index layout, from index if it exist, from vcf otherwise.
+
+    Args:
+        path: Path to ClinVar vcf
+        fields: Id of INFO field read, default all
+        regions: Keep only record overlapping regions (name, begin, end) 1-based inclusive
+        cache: If index didn't exist, build it
+        cache_dir: Directory where index are store, default VKD_CACHE_DIR environment variable or vcf directory
+        info_mode: How INFO column is decoded
+        threads: Number of thread used to decompress BGZF file, default polars thread pool size
+
+    Return:
+        A polars.LazyFrame with chr, position, variant key and `clinvar_*` columns, None if vcf, or regions, contains
+        no record.
+    """
+    index = index_path(path, fields=fields, cache_dir=cache_dir)
+
+    if not index.is_file() and not (
+        cache and build_index(path, index, fields=fields, info_mode=info_mode, threads=threads)
+    ):
+        lf = reader.vcf2lazyframe(
+            path,
+            with_genotype=False,
+            info_mode=info_mode,
+            threads=threads,
+            regions=regions,
+            info_fields=fields,
+        )
+        return None if lf is None else _layout(lf).drop("ref")
+
+    lf = polars.scan_parquet(index)
+    if regions is not None:
+        lf = lf.filter(reader.region_filter(regions))
+
+    return lf.drop("ref")
+
+
+def iter_batches(
+    path: pathlib.Path,
+    order: list[str],
+    *,
+    fields: list[str] | None = None,
+    regions: list[reader.Region] | None = None,
+    cache_dir: pathlib.Path | None = None,
+    info_mode: reader.InfoMode = "regex",
+) -> collections.abc.Iterator[polars.DataFrame]:
+    """Read ClinVar variants in index layout by batch, memory usage is bounded by batch size.
+
+    With an index, batches follow order, each contig is read from few row groups, without index batches follow vcf
+    order.
+
+    Args:
+        path: Path to ClinVar vcf
+        order: Order of contig, normalized name
+        fields: Id of INFO field read, default all
+        regions: Keep only record overlapping regions (name, begin, end) 1-based inclusive, batch could be empty
+        cache_dir: Directory where index are store, default VKD_CACHE_DIR environment variable or vcf directory
+        info_mode: How INFO column is decoded
+
+    Return:
+        An iterator of polars.DataFrame with chr, position, variant key and `clinvar_*` columns.
+    """
+    index = index_path(path, fields=fields, cache_dir=cache_dir)
+
+    if not index.is_file():
+        for batch in reader.iter_vcf_batches(
+            path,
+            with_genotype=False,
+            info_mode=info_mode,
+            regions=regions,
+            info_fields=fields,
+        ):
+            yield _layout(batch.lazy()).drop("ref").collect()
+        return
+
+    lf = polars.scan_parquet(index)
+    if regions is not None:
+        lf = lf.filter(reader.region_filter(regions))
+
+    for name in order:
+        yield from lf.filter(polars.col("chr") == name).drop("ref").collect_batches()
+
+
+def _layout(lf: polars.LazyFrame) -> polars.LazyFrame:
+    """Keep coordinate, variant key and INFO columns of ClinVar variants, INFO columns are renamed `clinvar_*`."""
+    return lf.with_columns(join.variant_key()).select(
+        "chr",
+        "position",
+        "ref",
+        *join.VARIANT_KEY_COLUMNS,
+        *(
+            polars.col(column).alias(column.replace("info_", "clinvar_", 1))
+            for column in lf.collect_schema().names()
+            if column.startswith("info_")
+        ),
+    )
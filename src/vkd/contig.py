@@ -0,0 +1,85 @@
+"""vkd contig name normalization."""
+
+# std import
+from __future__ import annotations
+
+import re
+import typing
+
+# 3rd party import
+import polars
+import xopen
+
+# project import
+from vkd import bgzf
+
+if typing.TYPE_CHECKING:
+    # std import
+    import pathlib
+
+
+CONTIG_ALIASES: dict[str, str] = {
+    **{str(i): f"chr{i}" for i in range(1, 23)},
+    "X": "chrX",
+    "Y": "chrY",
+    "M": "chrM",
+    "MT": "chrM",
+    "chrMT": "chrM",
+}
+"""Name of each contig alias, contig of all input are rename in this name, contig without alias keep their name."""
+
+CONTIG_RE: typing.Pattern = re.compile(r"^##contig=<.*?ID=(?P<id>[^,>]+)")
+
+
+def normalize(name: str) -> str:
+    """Get normalized name of a contig."""
+    return CONTIG_ALIASES.get(name, name)
+
+
+def declared(path: pathlib.Path) -> list[str] | None:
+    """Get name of contig declared by a vcf, in tabix or csi index or in contig header lines.
+
+    Args:
+        path: Path to vcf file
+
+    Return:
+        Name of contig, as write in file, in file order, None if file didn't declare contig.
+    """
+    if bgzf.is_bgzf(path) and (index_path := bgzf.find_index(path)) is not None:
+        return bgzf.read_index(index_path).names
+
+    names = []
+    with xopen.xopen(path) as fh:
+        for line in fh:
+            if not line.startswith("##"):
+                break
+            if search := CONTIG_RE.search(line):
+                names.append(search["id"])
+
+    return names or None
+
+
+def rename_expr(column: str, names: list[str] | None) -> polars.Expr | None:
+    """Build an expression that replace contig alias by normalized name.
+
+    Alias that only miss `chr` prefix are rename with one vectorized concatenation, other alias are compared one by one.
+
+    Args:
+        column: Name of contig column
+        names: Contig present in column, None if unknown
+
+    Return:
+        Expression of normalized contig, None if no contig of names has an alias.
+    """
+    aliases = {alias: name for alias, name in CONTIG_ALIASES.items() if names is None or alias in names}
+    if not aliases:
+        return None
+
+    contig = polars.col(column)
+    prefixed = [alias for alias, name in aliases.items() if name == f"chr{alias}"]
+    expr = polars.when(contig.is_in(prefixed)).then(polars.concat_str(polars.lit("chr"), contig))
+    for alias, name in aliases.items():
+        if alias not in prefixed:
+            expr = expr.when(contig == alias).then(polars.lit(name))
+
+    return expr.otherwise(contig).alias(column)
@@ -0,0 +1,235 @@
+"""vkd sorted merge join of coordinate sorted variants."""
+
+# std import
+from __future__ import annotations
+
+import hashlib
+import typing
+
+# 3rd party import
+import polars
+
+# project import
+from vkd import contig
+
+if typing.TYPE_CHECKING:
+    # std import
+    import collections.abc
+    import pathlib
+
+
+KEY_COLUMNS: list[str] = ["chr", "position", "ref", "alt"]
+"""Columns that identify a variant."""
+
+VARIANT_KEY_COLUMNS: list[str] = ["variant_key", "variant_alleles"]
+"""Compact variant identifier, generated by variant_key."""
+
+CHROMOSOME_INDEX: dict[str, int] = {**{str(i): i for i in range(1, 23)}, "X": 23, "Y": 24, "M": 25, "MT": 25}
+"""Index of chromosome in variant key, name without chr prefix, other contig get 0."""
+
+POSITION_BITS: int = 28
+"""Number of bits of position in variant key."""
+
+ALLELE_BITS: int = 28
+"""Number of bits of ref and alt code in variant key."""
+
+MAX_ALLELE_LENGTH: int = 11
+"""Maximal sum of ref and alt length that can be encoded, 5^(11 + 1) < 2^ALLELE_BITS."""
+
+
+class UnsortedError(ValueError):
+    """Input isn't sorted by chromosome and position."""
+
+
+def variant_key() -> list[polars.Expr]:
+    """Build a compact 64 bits key of variant from chr, position, ref and alt columns.
+
+    Key contains, from most significant bit, a hashed flag (1 bit), chromosome index (7 bits), position (28 bits) and
+    ref and alt code (28 bits). Alleles are write in base 5, A, C, G, T are digit 1 to 4 and 0 separate ref and alt,
+    this code is exact and key are sorted like coordinate. If chromosome isn't in CHROMOSOME_INDEX, position is too
+    large or alleles too long or not only ACGT, flag is set and alleles bits store a hash of variant.
+
+    Hash is a blake2b digest of variant, it didn't depend on polars version and keys of a store stay valid. Hashed key
+    could collide, contigs without index share chromosome 0 and position wrap, `variant_alleles` contains
+    `chr:position:ref>alt` for hashed key and an empty string otherwise, join and deduplicate must use both
+    VARIANT_KEY_COLUMNS.
+
+    Return:
+        Expressions of `variant_key` (UInt64) and `variant_alleles` (String) columns.
+    """
+    ref = polars.col("ref")
+    alt = polars.col("alt")
+
+    chromosome = (
+        polars.col("chr")
+        .str.strip_prefix("chr")
+        .replace_strict(CHROMOSOME_INDEX, default=0, return_dtype=polars.UInt64)
+    )
+    position = polars.col("position").cast(polars.UInt64)
+
+    exact = (
+        (chromosome > 0)
+        & (position < (1 << POSITION_BITS))
+        & ref.str.contains("^[ACGT]+$")
+        & alt.str.contains("^[ACGT]+$")
+        & (ref.str.len_bytes() + alt.str.len_bytes() <= MAX_ALLELE_LENGTH)
+    ).fill_null(value=False)
+
+    bases = ["A", "C", "G", "T"]
+    digits = ["1", "2", "3", "4"]
+    alleles = polars.concat_str(
+        ref.str.replace_many(bases, digits),
+        polars.lit("0"),
+        alt.str.replace_many(bases, digits),
+    ).str.to_integer(base=5, dtype=polars.UInt64, strict=False)
+    identity = polars.concat_str(
+        polars.col("chr"),
+        polars.lit(":"),
+        polars.col("position"),
+        polars.lit(":"),
+        ref,
+        polars.lit(">"),
+        alt,
+        ignore_nulls=True,
+    )
+    hashed = (
+        polars.when(exact)
+        .then(polars.lit(None, polars.String))
+        .otherwise(identity)
+        .map_batches(_stable_hash, return_dtype=polars.UInt64, is_elementwise=True)
+    )
+
+    coordinate = chromosome * (1 << (POSITION_BITS + ALLELE_BITS)) + (position % (1 << POSITION_BITS)) * (
+        1 << ALLELE_BITS
+    )
+
+    return [
+        polars.when(exact)
+        .then(coordinate + alleles)
+        .otherwise(polars.lit(1 << 63, dtype=polars.UInt64) + coordinate + hashed)
+        .alias("variant_key"),
+        polars.when(exact).then(polars.lit("")).otherwise(identity).alias("variant_alleles"),
+    ]
+
+
+def _stable_hash(identity: polars.Series) -> polars.Series:
+    """Hash each variant identity in ALLELE_BITS bits with blake2b, null identity get a null hash.
+
+    Identity of exact key are null, only not null identity are hashed in python and scatter back in batch.
+    """
+    hashed = identity.is_not_null().arg_true()
+    hashes = polars.Series([_hash_identity(value) for value in identity.gather(hashed).to_list()], dtype=polars.UInt64)
+
+    return polars.repeat(None, identity.len(), dtype=polars.UInt64, eager=True).scatter(hashed, hashes)
+
+
+def _hash_identity(value: str) -> int:
+    """Hash a variant identity in ALLELE_BITS bits with blake2b."""
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest()) % (1 << ALLELE_BITS)
+
+
+def chromosome_order(path: pathlib.Path) -> list[str] | None:
+    """Get order of chromosome in a vcf, from tabix or csi index or from contig header lines.
+
+    Args:
+        path: Path to vcf file
+
+    Return:
+        Normalized name of chromosome in file order, None if order isn't declared.
+    """
+    if (names := contig.declared(path)) is None:
+        return None
+
+    return [contig.normalize(name) for name in names]
+
+
+def sorted_join(
+    left: collections.abc.Iterable[polars.DataFrame],
+    right: collections.abc.Iterable[polars.DataFrame],
+    order: list[str],
+    on: list[str] = KEY_COLUMNS,
+) -> collections.abc.Iterator[polars.DataFrame]:
+    """Left join of two stream of batch sorted by chromosome and position.
+
+    Only right rows with position between previous and current left batch last position are keep in memory, each left
+    batch is join with this window. Order is checked on each batch, a cheap vectorized comparison with previous row.
+
+    Args:
+        left: Batches sorted by chromosome, in order, and position
+        right: Batches sorted by chromosome, in order, and position, rows on chromosome absent of order are ignored
+        order: Order of chromosome
+        on: Columns used to join, right chr and position are only used to order if they aren't in on
+
+    Return:
+        An iterator of joined batches, same row order as left.
+
+    Raises:
+        UnsortedError: if left or right isn't sorted, or if left contains chromosome absent of order.
+    """
+    ranks = {name: rank for rank, name in enumerate(order)}
+    right_batches = iter(right)
+    right_exhausted = False
+    right_last: int | None = None
+    left_last: int | None = None
+    window: polars.DataFrame | None = None
+
+    for left_batch in left:
+        if left_batch.is_empty():
+            continue
+
+        batch = _with_key(left_batch, ranks)
+        if batch.get_column("_key").null_count():
+            raise UnsortedError(f"left chromosome {_unknown_chromosome(batch)} isn't in chromosome order")
+        left_last = _check_sorted(batch, left_last, "left")
+
+        # read right until a row is after last left row
+        while not right_exhausted and (window is None or window.is_empty() or window["_key"][-1] <= left_last):
+            try:
+                right_batch = _with_key(next(right_batches), ranks).filter(polars.col("_key").is_not_null())
+            except StopIteration:
+                right_exhausted = True
+                break
+            right_last = _check_sorted(right_batch, right_last, "right")
+            window = right_batch if window is None else polars.concat([window, right_batch])
+
+        if window is None:
+            yield left_batch
+            continue
+
+        yield batch.join(
+            window.filter(polars.col("_key") <= left_last).drop(
+                "_key",
+                *(column for column in ("chr", "position") if column not in on),
+            ),
+            on=on,
+            how="left",
+            maintain_order="left",
+        ).drop("_key")
+
+        # next left rows are equal or after left_last
+        window = window.filter(polars.col("_key") >= left_last)
+
+
+def _with_key(df: polars.DataFrame, ranks: dict[str, int]) -> polars.DataFrame:
+    """Add a sortable `_key` column, chromosome rank in 32 upper bits and position in lower bits."""
+    return df.with_columns(
+        _key=polars.col("chr").replace_strict(ranks, default=None, return_dtype=polars.Int64) * (1 << 32)
+        + polars.col("position"),
+    )
+
+
+def _check_sorted(df: polars.DataFrame, previous: int | None, side: str) -> int | None:
+    """Check `_key` is not decreasing from previous batch last key, return last key."""
+    if df.is_empty():
+        return previous
+
+    key = df.get_column("_key")
+    if (previous is not None and key[0] < previous) or (key.diff() < 0).any():
+        raise UnsortedError(f"{side} input isn't sorted by chromosome and position")
+
+    return key[-1]
+
+
+def _unknown_chromosome(df: polars.DataFrame) -> str:
+    """Get first chromosome without rank."""
+    return df.filter(polars.col("_key").is_null()).get_column("chr")[0]
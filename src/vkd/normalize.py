@@ -0,0 +1,393 @@
+"""vkd variant normalization, multi-allelic split and indel left-alignment against a reference genome.
+
+Normalization follow `bcftools norm -m -any -f`, same variant write differently by two callers get same chr, position,
+ref and alt, and could be join.
+"""
+
+# std import
+from __future__ import annotations
+
+import functools
+import mmap
+import typing
+
+# 3rd party import
+import polars
+
+# project import
+from vkd import contig
+
+if typing.TYPE_CHECKING:
+    # std import
+    import pathlib
+
+
+ALIGN_WINDOW: int = 64
+"""Number of reference bases read before an indel at once, indel that shift further read next window."""
+
+NUCLEOTIDES_RE: str = "^[ACGTNacgtn]+$"
+"""Allele that could be trim and align, symbolic, breakend and missing allele keep their representation."""
+
+
+class Reference:
+    """Reference genome in an uncompressed fasta indexed by `samtools faidx`, sequences are read in a memory map."""
+
+    def __init__(self, path: pathlib.Path) -> None:
+        """Read fasta index and map fasta in memory.
+
+        Args:
+            path: Path to fasta, index is search in `{path}.fai`
+
+        Raises:
+            ValueError: if fasta is compressed.
+            FileNotFoundError: if fasta index didn't exist.
+        """
+        with open(path, "rb") as fh:
+            if fh.read(2) == b"\x1f\x8b":
+                raise ValueError(f"{path} is compressed, reference must be an uncompressed fasta")
+
+        index_path = path.with_name(f"{path.name}.fai")
+        if not index_path.is_file():
+            raise FileNotFoundError(f"{index_path} not found, index reference with `samtools faidx {path}`")
+
+        self.contigs: dict[str, tuple[int, int, int, int]] = {}
+        """Length, offset of first base, bases by line and bytes by line of each contig, by normalized name."""
+        with open(index_path) as fh:
+            for line in fh:
+                name, length, offset, line_bases, line_width, *_ = line.rstrip("\n").split("\t")
+                self.contigs[contig.normalize(name)] = (int(length), int(offset), int(line_bases), int(line_width))
+
+        with open(path, "rb") as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def sequences(self, chromosome: polars.Series, begin: polars.Series, end: polars.Series) -> polars.Series:
+        """Get reference sequence of intervals, file offsets are compute on whole columns, each interval is one slice.
+
+        Args:
+            chromosome: Normalized contig name
+            begin: First base, 0-based, clamp to contig
+            end: Base after last base, 0-based, clamp to contig
+
+        Return:
+            Upper case sequences, null if contig isn't in reference.
+        """
+        fields = ["length", "offset", "line_bases", "line_width"]
+        df = polars.DataFrame({"chr": chromosome, "begin": begin, "end": end}).with_columns(
+            polars.col("chr")
+            .replace_strict(
+                {name: values[i] for name, values in self.contigs.items()},
+                default=None,
+                return_dtype=polars.Int64,
+            )
+            .alias(field)
+            for i, field in enumerate(fields)
+        )
+
+        length = polars.col("length")
+        begin_expr = polars.col("begin").clip(0, length)
+        end_expr = polars.max_horizontal(begin_expr, polars.col("end").clip(upper_bound=length))
+
+        # bases are store in line of line_bases bases follow by line_width - line_bases end of line bytes
+        def file_offset(position: polars.Expr) -> polars.Expr:
+            line_bases = polars.col("line_bases")
+            return polars.col("offset") + position // line_bases * polars.col("line_width") + position % line_bases
+
+        offsets = df.select(file_offset(begin_expr).alias("begin"), file_offset(end_expr).alias("end"))
+
+        return (
+            polars.Series(
+                [None if first is None else self._mmap[first:last] for first, last in offsets.iter_rows()],
+                dtype=polars.Binary,
+            )
+            .cast(polars.String)
+            .str.replace_all(r"\s", "")
+            .str.to_uppercase()
+        )
+
+
+@functools.cache
+def load_reference(path: pathlib.Path) -> Reference:
+    """Get reference of a fasta, memory map is open once by process."""
+    return Reference(path)
+
+
+def split_multiallelic(lf: polars.LazyFrame, numbers: dict[str, str]) -> polars.LazyFrame:
+    """Split record with many alternative alleles in one record by allele, like `bcftools norm -m -any`.
+
+    Lists of Number=A, Number=R and Number=G (diploid) fields keep value of record allele, genotypes keep record allele
+    as 1 and other alternative allele became 0. Record with one alternative allele aren't change.
+
+    Args:
+        lf: Decoded vcf records, with alt column
+        numbers: Number of each INFO and FORMAT column, see `vkd.reader.field_numbers`
+
+    Return:
+        Records with one alternative allele.
+    """
+    schema = lf.collect_schema()
+    alleles = polars.col("alt").str.count_matches(",", literal=True) + 1
+    lf = lf.with_columns(
+        polars.col("alt").str.split(","),
+        _allele=polars.int_ranges(1, alleles + 1),
+        _multiallelic=alleles > 1,
+    ).explode("alt", "_allele")
+
+    allele = polars.col("_allele")
+    indices = {
+        "A": polars.concat_list(allele - 1),
+        "R": polars.concat_list(polars.lit(0, polars.Int64), allele),
+        "G": polars.concat_list(
+            polars.lit(0, polars.Int64),
+            allele * (allele + 1) // 2,
+            allele * (allele + 1) // 2 + allele,
+        ),
+    }
+
+    expressions = []
+    for column, dtype in schema.items():
+        number = numbers.get(column, numbers.get(f"format_{column.partition('format_')[2]}"))
+        if column.endswith("format_gt"):
+            expr = _split_genotype(polars.col(column), dtype)
+        elif number in indices and isinstance(dtype, polars.List):
+            expr = polars.col(column).list.gather(indices[number], null_on_oob=True)
+        else:
+            continue
+        expressions.append(polars.when(polars.col("_multiallelic")).then(expr).otherwise(polars.col(column)))
+
+    return lf.with_columns(expressions).drop("_allele", "_multiallelic")
+
+
+def _split_genotype(gt: polars.Expr, dtype: polars.DataType) -> polars.Expr:
+    """Build expression that keep `_allele` as allele 1 of genotype, other alternative allele became 0.
+
+    Genotype is a string, `1/2`, or a list of allele index in long sample layout.
+    """
+    if isinstance(dtype, polars.List):
+        return (
+            (gt - polars.col("_allele").cast(dtype.inner))
+            .list.eval(
+                polars.when(polars.element() == 0).then(1).when(polars.element().is_not_null()).then(0),
+            )
+            .cast(dtype)
+        )
+
+    allele = gt.str.extract_all(r"[0-9]+|\.").cast(polars.List(polars.Int64), strict=False) - polars.col("_allele")
+
+    return allele.list.eval(
+        polars.when(polars.element() == 0)
+        .then(polars.lit("1"))
+        .when(polars.element().is_not_null())
+        .then(polars.lit("0"))
+        .otherwise(polars.lit(".")),
+    ).list.join(gt.str.extract("([/|])", 1).fill_null("/"))
+
+
+def left_align(df: polars.DataFrame, reference: Reference) -> polars.DataFrame:
+    """Trim bases share by ref and alt and shift indel to their leftmost position, like `bcftools norm -f`.
+
+    Each step is run on whole columns of records that still need it, indel shift one base by iteration. Records could
+    be unsorted after alignment. Records with symbolic allele, or on a contig absent of reference, aren't change.
+
+    Args:
+        df: Records with chr, position, ref and alt columns, one alternative allele by record
+        reference: Reference genome
+
+    Return:
+        Records with aligned position, ref and alt.
+    """
+    ref, alt = polars.col("ref"), polars.col("alt")
+    ref_len, alt_len = ref.str.len_bytes(), alt.str.len_bytes()
+
+    work = (
+        df.select("chr", "position", "ref", "alt")
+        .with_row_index("_row")
+        .filter(
+            ref.str.contains(NUCLEOTIDES_RE)
+            & alt.str.contains(NUCLEOTIDES_RE)
+            & (ref != alt)
+            & ((ref_len > 1) | (alt_len > 1)),
+        )
+        .with_columns(ref.str.to_uppercase(), alt.str.to_uppercase())
+    )
+    if work.is_empty():
+        return df
+
+    # trim common suffix, until an allele is empty, then common prefix, until an allele is a single base
+    work = _trim(work, (ref_len >= 1) & (alt_len >= 1) & (ref.str.slice(-1) == alt.str.slice(-1)), suffix=True)
+    work = _trim(work, (ref_len > 1) & (alt_len > 1) & (ref.str.slice(0, 1) == alt.str.slice(0, 1)), suffix=False)
+
+    # indel are describe by position of base before inserted or deleted sequence
+    empty = (ref_len == 0) | (alt_len == 0)
+    anchored = (ref_len != alt_len) & ((ref_len == 1) | (alt_len == 1)) & (ref.str.slice(0, 1) == alt.str.slice(0, 1))
+    indels = work.filter((empty & (polars.col("position") > 1)) | anchored).select(
+        "_row",
+        "chr",
+        polars.when(empty).then(polars.col("position") - 1).otherwise(polars.col("position")).alias("position"),
+        polars.when(empty)
+        .then(polars.concat_str(ref, alt))
+        .when(ref_len > alt_len)
+        .then(ref.str.slice(1))
+        .otherwise(alt.str.slice(1))
+        .alias("sequence"),
+        (ref_len > alt_len).alias("deletion"),
+    )
+
+    aligned = [work.filter(~empty & ~anchored)]
+    while not indels.is_empty():
+        shifted, indels = _shift(indels, reference)
+        aligned.append(
+            shifted.select(
+                "_row",
+                "chr",
+                "position",
+                polars.concat_str("anchor", polars.when("deletion").then("sequence").otherwise(polars.lit(""))).alias(
+                    "ref",
+                ),
+                polars.concat_str("anchor", polars.when("deletion").then(polars.lit("")).otherwise("sequence")).alias(
+                    "alt",
+                ),
+            ),
+        )
+
+    updates = polars.concat(aligned).drop("chr")
+
+    return df.with_row_index("_row").update(updates, on="_row").drop("_row")
+
+
+def repeat_start(reference: Reference, chromosome: str, position: int) -> int:
+    """Get first position of the tandem repeat, of period at most ALIGN_WINDOW, that end at position.
+
+    An indel of at most ALIGN_WINDOW bases at or after position, could be left-aligned along this repeat but not before
+    its first position minus ALIGN_WINDOW.
+
+    Args:
+        reference: Reference genome
+        chromosome: Normalized contig name
+        position: 1-based position of last base of repeat
+
+    Return:
+        1-based position, position if contig isn't in reference.
+    """
+    size = 4 * ALIGN_WINDOW
+    while True:
+        begin = max(0, position - size)
+        sequence = reference.sequences(
+            polars.Series([chromosome]),
+            polars.Series([begin]),
+            polars.Series([position]),
+        )[0]
+        if not sequence:
+            return position
+
+        extent = max(_periodic_suffix(sequence, period) for period in range(1, ALIGN_WINDOW + 1))
+        if extent < len(sequence) or begin == 0:
+            return position - extent + 1
+
+        # repeat could continue before window
+        size *= 2
+
+
+def _periodic_suffix(sequence: str, period: int) -> int:
+    """Get length of longest suffix of sequence with this period."""
+    i = len(sequence) - 1 - period
+    while i >= 0 and sequence[i] == sequence[i + period]:
+        i -= 1
+
+    return min(len(sequence), len(sequence) - 1 - i)
+
+
+def _trim(work: polars.DataFrame, common: polars.Expr, *, suffix: bool) -> polars.DataFrame:
+    """Remove last, or first, base of ref and alt while common is true, one base by iteration."""
+    while work.select(common.any()).item():
+        if suffix:
+            trimmed = [
+                polars.col(allele).str.slice(0, polars.col(allele).str.len_bytes() - 1) for allele in ("ref", "alt")
+            ]
+        else:
+            trimmed = [polars.col("ref").str.slice(1), polars.col("alt").str.slice(1), polars.col("position") + 1]
+        work = work.with_columns(polars.when(common).then(expr).otherwise(expr.meta.output_name()) for expr in trimmed)
+
+    return work
+
+
+def _shift(
+    indels: polars.DataFrame,
+    reference: Reference,
+) -> tuple[polars.DataFrame, polars.DataFrame]:
+    """Shift indel to the left in one window of reference bases ending at their anchor.
+
+    Return:
+        Indel aligned, with anchor base, and indel that reach begin of window and need next window.
+    """
+    position = polars.col("position")
+    sequence = polars.col("sequence")
+
+    indels = indels.with_columns(
+        window=reference.sequences(
+            indels.get_column("chr"),
+            indels.get_column("position") - ALIGN_WINDOW,
+            indels.get_column("position"),
+        ),
+        shift=polars.lit(0, polars.Int64),
+    )
+    remain = polars.col("window").str.len_bytes() - 1 - polars.col("shift")
+    anchor = polars.col("window").str.slice(remain, 1)
+
+    done = []
+    while not indels.is_empty():
+        # indel move left by one base if its last base is equal to base before it
+        movable = ((anchor == sequence.str.slice(-1)) & (remain >= 1)).fill_null(value=False)
+        done.append(indels.filter(~movable))
+        indels = indels.filter(movable).with_columns(
+            polars.concat_str(anchor, sequence.str.slice(0, sequence.str.len_bytes() - 1)).alias("sequence"),
+            position - 1,
+            polars.col("shift") + 1,
+        )
+
+    indels = polars.concat(done).with_columns(anchor=anchor)
+    # window without base before anchor, contig begin isn't reach
+    exhausted = (polars.col("anchor") == sequence.str.slice(-1)) & (remain == 0) & (position > 1)
+
+    return (
+        indels.filter(~exhausted & polars.col("anchor").is_not_null() & (polars.col("anchor") != "")).drop(
+            "window",
+            "shift",
+        ),
+        indels.filter(exhausted).drop("window", "shift", "anchor"),
+    )
+
+
+def normalize(
+    lf: polars.LazyFrame,
+    numbers: dict[str, str],
+    *,
+    split: bool = False,
+    reference: pathlib.Path | None = None,
+) -> polars.LazyFrame:
+    """Split multi-allelic records and left-align indels, records without alt column aren't normalized.
+
+    Args:
+        lf: Decoded vcf records
+        numbers: Number of each INFO and FORMAT column, see `vkd.reader.field_numbers`
+        split: Split multi-allelic records
+        reference: Path to reference fasta, indel are left-align if set, multi-allelic records are split before
+
+    Return:
+        Normalized records, alignment is run by batch in polars streaming engine.
+    """
+    schema = lf.collect_schema()
+    if not {"chr", "position", "ref", "alt"} <= set(schema):
+        return lf
+
+    if split or reference is not None:
+        lf = split_multiallelic(lf, numbers)
+
+    if reference is not None:
+        lf = lf.map_batches(
+            functools.partial(left_align, reference=load_reference(reference)),
+            schema=lf.collect_schema(),
+            predicate_pushdown=False,
+            streamable=True,
+        )
+
+    return lf
@@ -3,97 +3,739 @@
 # std import
 from __future__ import annotations
 
+import atexit
 import collections
+import collections.abc
+import contextlib
+import contextvars
+import functools
+import hashlib
+import itertools
+import json
+import os
+import pathlib
 import re
+import shutil
+import tempfile
 import typing
 
 # 3rd party import
 import polars
+import polars.selectors
 import xopen
 
 # project import
+from vkd import bgzf, contig, normalize
+from vkd._internal import debug, profile
 
-
-if typing.TYPE_CHECKING:
-    # std import
-    import pathlib
+InfoMode = typing.Literal["tokenize", "regex"]
+Region = tuple[str, int, int]
+SampleLayout = typing.Literal["wide", "long"]
 
 
+@profile.traced
 def vcf2lazyframe(
     path: pathlib.Path,
     *,
     with_genotype: bool = True,
+    info_mode: InfoMode = "regex",
+    threads: int | None = None,
+    regions: list[Region] | None = None,
+    columns: list[str] | None = None,
+    info_fields: list[str] | None = None,
+    format_fields: list[str] | None = None,
+    sample_layout: SampleLayout = "wide",
+    cache: bool = False,
+    cache_dir: pathlib.Path | None = None,
+    split_multiallelic: bool = False,
+    reference: pathlib.Path | None = None,
 ) -> polars.LazyFrame | None:
-    """Parse vcf information of input and generate a polars.LazyFrame."""
-    new_columns = [
-        "chr",
-        "position",
-        "_id",
-        "ref",
-        "alt",
-        "qual",
-        "filter",
-        "_info",
-    ]
+    """Parse vcf information of input and generate a polars.LazyFrame.
 
-    if with_genotype:
-        new_columns.extend(["_format", "genotype"])
+    If a parquet cache of vcf exist it's read in place of vcf. Contig alias are rename in normalized name, see
+    `vkd.contig.CONTIG_ALIASES`, regions could use alias or normalized name.
 
-    try:
-        lf = polars.scan_csv(
+    Args:
+        path: Path to vcf file
+        with_genotype: Parse FORMAT and genotype column
+        info_mode: How INFO column is decoded, `tokenize` split each INFO string once per row, `regex` run one extraction per header field
+        threads: Number of thread used to decompress BGZF file, default polars thread pool size
+        regions: Keep only record overlapping regions (name, begin, end) 1-based inclusive, if file is BGZF with a tabix or csi index only block overlapping regions are read
+        columns: Keep only this columns, `info_*` and `format_*` columns not selected aren't parsed
+        info_fields: Id of INFO field parsed, default all or only field selected in columns
+        format_fields: Id of FORMAT field parsed, default all or only field selected in columns
+        sample_layout: How sample of multi-sample vcf are store, `wide` one set of `{sample}_format_*` columns by sample (single sample vcf keep `format_*`), `long` one row by sample with a `sample` column and genotype encoded as allele index
+        cache: If parquet cache didn't exist, parse all vcf and write it
+        cache_dir: Directory where parquet cache are store, default VKD_CACHE_DIR environment variable or vcf directory
+        split_multiallelic: Split multi-allelic records in one record by alternative allele, see `vkd.normalize`
+        reference: Path to an indexed fasta, indels are trimmed and left-aligned on it, imply split_multiallelic
+
+    Return:
+        A polars.LazyFrame or None if file, or regions, contains no record.
+    """
+    lf = _read_vcf(
+        path,
+        with_genotype=with_genotype,
+        info_mode=info_mode,
+        threads=threads,
+        regions=regions,
+        columns=columns,
+        info_fields=info_fields,
+        format_fields=format_fields,
+        sample_layout=sample_layout,
+        cache=cache,
+        cache_dir=cache_dir,
+    )
+    if lf is None or not (split_multiallelic or reference is not None):
+        return lf
+
+    return normalize.normalize(lf, field_numbers(path), split=split_multiallelic, reference=reference)
+
+
+def _read_vcf(
+    path: pathlib.Path,
+    *,
+    with_genotype: bool,
+    info_mode: InfoMode,
+    threads: int | None,
+    regions: list[Region] | None,
+    columns: list[str] | None,
+    info_fields: list[str] | None,
+    format_fields: list[str] | None,
+    sample_layout: SampleLayout,
+    cache: bool,
+    cache_dir: pathlib.Path | None,
+) -> polars.LazyFrame | None:
+    """Read vcf from its parquet cache or parse it, see vcf2lazyframe for arguments."""
+    cache_path = parquet_cache_path(path, with_genotype=with_genotype, sample_layout=sample_layout, cache_dir=cache_dir)
+
+    if not cache_path.is_file():
+        if not cache:
+            return _parse_vcf(
+                path,
+                with_genotype=with_genotype,
+                info_mode=info_mode,
+                threads=threads,
+                regions=regions,
+                columns=columns,
+                info_fields=info_fields,
+                format_fields=format_fields,
+                sample_layout=sample_layout,
+            )
+
+        if not vcf2parquet(
             path,
-            comment_prefix="#",
-            has_header=False,
-            new_columns=new_columns,
-            null_values=["."],
-            schema_overrides={"chr": polars.String},
-            separator="\t",
+            cache_path,
+            with_genotype=with_genotype,
+            info_mode=info_mode,
+            threads=threads,
+            sample_layout=sample_layout,
+        ):
+            return None
+
+    lf = polars.scan_parquet(cache_path)
+
+    if regions is not None:
+        lf = lf.filter(region_filter(regions))
+
+    if columns is not None:
+        return lf.select(columns)
+
+    info_columns = _selected_columns(columns, info_fields, "info_", str)
+    format_columns = _selected_columns(columns, format_fields, "format_", str.lower)
+
+    return lf.drop(
+        [
+            column
+            for column in lf.collect_schema().names()
+            if (info_columns is not None and column.startswith("info_") and column not in info_columns)
+            or (format_columns is not None and "format_" in column and column not in format_columns)
+        ],
+    )
+
+
+@profile.traced
+def vcf2parquet(
+    path: pathlib.Path,
+    output_path: pathlib.Path,
+    *,
+    with_genotype: bool = True,
+    info_mode: InfoMode = "regex",
+    threads: int | None = None,
+    sample_layout: SampleLayout = "wide",
+) -> bool:
+    """Parse all vcf information and write it in a parquet file.
+
+    Args:
+        path: Path to vcf file
+        output_path: Path where parquet is write
+        with_genotype: Parse FORMAT and genotype column
+        info_mode: How INFO column is decoded
+        threads: Number of thread used to decompress BGZF file, default polars thread pool size
+        sample_layout: How sample of multi-sample vcf are store
+
+    Return:
+        False if file contains no record, and parquet isn't write.
+    """
+    with spool_scope():
+        lf = _parse_vcf(
+            path,
+            with_genotype=with_genotype,
+            info_mode=info_mode,
+            threads=threads,
+            sample_layout=sample_layout,
         )
+        if lf is None:
+            return False
+
+        # write in a temporary file to never expose a partial parquet
+        tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
+        try:
+            lf.sink_parquet(tmp_path)
+            tmp_path.replace(output_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    return True
+
+
+CACHE_HASH_SIZE: int = 1 << 20
+"""Number of bytes read at begin and end of file to compute content hash of parquet cache key."""
+
+CACHE_FORMAT: int = 2
+"""Version of parquet cache content, increase it when parsing change to invalidate previous cache."""
+
+
+def parquet_cache_path(
+    path: pathlib.Path,
+    *,
+    with_genotype: bool = True,
+    sample_layout: SampleLayout = "wide",
+    cache_dir: pathlib.Path | None = None,
+) -> pathlib.Path:
+    """Get path of parquet cache associate to a vcf.
+
+    Name of cache depend on vcf digest, see `file_digest`, cache format and parsing option.
+
+    Args:
+        path: Path to vcf file
+        with_genotype: Parse FORMAT and genotype column
+        sample_layout: How sample of multi-sample vcf are store
+        cache_dir: Directory where parquet cache are store, default VKD_CACHE_DIR environment variable or vcf directory
+
+    Return:
+        Path of parquet cache, file may not exist.
+    """
+    if cache_dir is None:
+        cache_dir = pathlib.Path(os.environ["VKD_CACHE_DIR"]) if "VKD_CACHE_DIR" in os.environ else path.parent
+
+    digest = file_digest(path, [CACHE_FORMAT, with_genotype, sample_layout])
+
+    return cache_dir / f"{path.name}.{digest}.parquet"
+
+
+def file_digest(path: pathlib.Path, options: list[typing.Any]) -> str:
+    """Compute a key that change when file, vkd version or options change.
+
+    Key depend on file path, size, modification time, a hash of first and last CACHE_HASH_SIZE bytes, vkd version and
+    options.
+
+    Args:
+        path: Path to file
+        options: Json serializable values that change content derived from file
+
+    Return:
+        Hexadecimal digest.
+    """
+    stat = path.stat()
+    key = hashlib.blake2b(digest_size=16)
+    key.update(
+        json.dumps([str(path.resolve()), stat.st_size, stat.st_mtime_ns, debug._get_version(), *options]).encode(),
+    )
+    with open(path, "rb") as fh:
+        key.update(fh.read(CACHE_HASH_SIZE))
+        if stat.st_size > CACHE_HASH_SIZE:
+            fh.seek(max(CACHE_HASH_SIZE, stat.st_size - CACHE_HASH_SIZE))
+            key.update(fh.read())
+
+    return key.hexdigest()
+
+
+def _parse_vcf(
+    path: pathlib.Path,
+    *,
+    with_genotype: bool = True,
+    info_mode: InfoMode = "regex",
+    threads: int | None = None,
+    regions: list[Region] | None = None,
+    columns: list[str] | None = None,
+    info_fields: list[str] | None = None,
+    format_fields: list[str] | None = None,
+    sample_layout: SampleLayout = "wide",
+) -> polars.LazyFrame | None:
+    """Parse vcf information of input and generate a polars.LazyFrame, see vcf2lazyframe for arguments."""
+    samples = _read_samples(path) if with_genotype else []
+
+    threads = polars.thread_pool_size() if threads is None else threads
+
+    source = path
+    if bgzf.is_bgzf(path):
+        # uncompressed records are spool on disk, only a window of blocks is in memory before polars read them
+        with profile.stage("decompress", input_path=path):
+            if regions is not None and (index_path := bgzf.find_index(path)) is not None:
+                index = bgzf.read_index(index_path)
+                # region could use an alias of index contig name
+                names = {contig.normalize(name): name for name in index.names}
+                chunks = bgzf.merge_chunks(
+                    [
+                        chunk
+                        for name, begin, end in regions
+                        for chunk in index.chunks(names.get(contig.normalize(name), name), begin - 1, end)
+                    ],
+                )
+                source = _spool(path, bgzf.iter_chunks(path, chunks, threads))
+            else:
+                source = _spool(path, bgzf.iter_decompress(path, threads))
+
+    try:
+        lf = _scan_records(source, samples)
     except polars.exceptions.NoDataError:
         return None
 
-    formats = dict(_lazyframe2format_pos(lf)) if with_genotype else {}
+    if (rename := contig.rename_expr("chr", contig.declared(path))) is not None:
+        lf = lf.with_columns(rename)
+
+    if regions is not None:
+        lf = lf.filter(region_filter(regions))
+
+    parse_genotype, bad_column_parsing = _record_decoding(
+        path,
+        samples,
+        info_mode=info_mode,
+        columns=columns,
+        info_fields=info_fields,
+        format_fields=format_fields,
+    )
+
+    return _decode_records(
+        lf,
+        samples,
+        parse_genotype,
+        bad_column_parsing,
+        columns=columns,
+        sample_layout=sample_layout,
+    )
+
+
+_spool_scope: contextvars.ContextVar[pathlib.Path | None] = contextvars.ContextVar("spool_scope", default=None)
+"""Spool directory of current spool_scope, None outside of a scope."""
+
+
+@contextlib.contextmanager
+def spool_scope() -> collections.abc.Iterator[None]:
+    """Remove uncompressed vcf spooled by LazyFrame build in context when context exit.
+
+    A LazyFrame of a BGZF vcf read a spool file, it must be collected or sink in context. Outside of a scope spool
+    live until process exit.
+
+    Return:
+        A context manager.
+    """
+    directory = pathlib.Path(tempfile.mkdtemp(prefix="vkd_spool_"))
+    token = _spool_scope.set(directory)
+    try:
+        yield
+    finally:
+        _spool_scope.reset(token)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@functools.cache
+def _spool_dir() -> pathlib.Path:
+    """Create directory of uncompressed vcf read outside of a spool_scope, in TMPDIR, remove at process exit."""
+    directory = pathlib.Path(tempfile.mkdtemp(prefix="vkd_spool_"))
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+
+    return directory
+
+
+def _spool(path: pathlib.Path, blocks: collections.abc.Iterable[bytes]) -> pathlib.Path:
+    """Write uncompressed blocks of a vcf in a file of spool directory, file live until end of its spool_scope."""
+    directory = _spool_scope.get()
+    fd, spool_path = tempfile.mkstemp(
+        prefix=f"{path.name}.",
+        suffix=".vcf",
+        dir=_spool_dir() if directory is None else directory,
+    )
+    with os.fdopen(fd, "wb") as fh:
+        for block in blocks:
+            fh.write(block)
+
+    return pathlib.Path(spool_path)
+
+
+def iter_vcf_batches(
+    path: pathlib.Path,
+    batch_size: int = 100_000,
+    *,
+    with_genotype: bool = True,
+    info_mode: InfoMode = "regex",
+    regions: list[Region] | None = None,
+    columns: list[str] | None = None,
+    info_fields: list[str] | None = None,
+    format_fields: list[str] | None = None,
+    sample_layout: SampleLayout = "wide",
+    split_multiallelic: bool = False,
+    reference: pathlib.Path | None = None,
+) -> collections.abc.Iterator[polars.DataFrame]:
+    """Parse vcf by batch of records, memory usage is bounded by batch size.
+
+    Each batch is decoded like vcf2lazyframe and all batches have same schema, use `polars.DataFrame.to_arrow` to get arrow record batches.
+
+    Args:
+        path: Path to vcf file
+        batch_size: Number of vcf record by batch, in long sample layout a batch contains batch_size times number of sample rows
+        with_genotype: Parse FORMAT and genotype column
+        info_mode: How INFO column is decoded
+        regions: Keep only record overlapping regions (name, begin, end) 1-based inclusive, batch could be empty
+        columns: Keep only this columns, `info_*` and `format_*` columns not selected aren't parsed
+        info_fields: Id of INFO field parsed, default all or only field selected in columns
+        format_fields: Id of FORMAT field parsed, default all or only field selected in columns
+        sample_layout: How sample of multi-sample vcf are store
+        split_multiallelic: Split multi-allelic records in one record by alternative allele
+        reference: Path to an indexed fasta, indels are trimmed and left-aligned on it, imply split_multiallelic,
+            records that a next indel could precede are keep until next batch, batches stay sorted
+
+    Return:
+        An iterator of polars.DataFrame.
+    """
+    normalized = split_multiallelic or reference is not None
+    numbers = field_numbers(path) if normalized else {}
+    samples = _read_samples(path) if with_genotype else []
+    parse_genotype, bad_column_parsing = _record_decoding(
+        path,
+        samples,
+        info_mode=info_mode,
+        columns=columns,
+        info_fields=info_fields,
+        format_fields=format_fields,
+    )
+    rename = contig.rename_expr("chr", contig.declared(path))
+    pending: polars.DataFrame | None = None
+    max_shift = 0
+    aligner = None if reference is None else normalize.load_reference(reference)
+
+    with xopen.xopen(path, "rb") as fh:
+        records = (line for line in fh if not line.startswith(b"#"))
+        while batch := list(itertools.islice(records, batch_size)):
+            lf = _scan_records(b"".join(batch), samples)
+            if rename is not None:
+                lf = lf.with_columns(rename)
+            if regions is not None:
+                lf = lf.filter(region_filter(regions))
+            lf = _decode_records(
+                lf,
+                samples,
+                parse_genotype,
+                bad_column_parsing,
+                columns=columns,
+                sample_layout=sample_layout,
+            )
+            if not normalized or not {"chr", "position", "ref", "alt"} <= set(lf.collect_schema()):
+                yield lf.collect()
+                continue
+
+            batch = normalize.normalize(
+                lf.with_columns(_origin=polars.col("position")),
+                numbers,
+                split=split_multiallelic,
+                reference=reference,
+            ).collect()
+            released, pending, max_shift = _release_aligned(batch, pending, max_shift, aligner)
+            yield released
+
+    if pending is not None:
+        yield pending.drop("_origin")
+
+
+def _release_aligned(
+    batch: polars.DataFrame,
+    pending: polars.DataFrame | None,
+    max_shift: int,
+    reference: normalize.Reference | None = None,
+) -> tuple[polars.DataFrame, polars.DataFrame | None, int]:
+    """Sort aligned records and release those that next records can't precede.
+
+    Next records start at or after last original position, `_origin`, of batch. Alignment move an indel of at most
+    ALIGN_WINDOW bases along tandem repeat that end at this position, see `vkd.normalize.repeat_start`, longer indel
+    are expect to move by at most largest shift seen. Records of last chromosome after this bound are pending until
+    next batch.
+
+    Return:
+        Records released, without `_origin`, records pending and largest shift seen.
+    """
+    if pending is not None:
+        batch = polars.concat([pending, batch])
+    if batch.is_empty():
+        return batch.drop("_origin"), None, max_shift
+
+    batch = (
+        batch.with_columns(_run=(polars.col("chr") != polars.col("chr").shift()).fill_null(value=True).cum_sum())
+        .sort("_run", "position", maintain_order=True)
+        .drop("_run")
+    )
+    max_shift = max(max_shift, batch.select((polars.col("_origin") - polars.col("position")).max()).item() or 0)
+
+    last_chromosome = batch.get_column("chr")[-1]
+    previous = batch.select((polars.col("chr") != last_chromosome).arg_true().max()).item()
+    first = 0 if previous is None else previous + 1
+    origin = typing.cast("int", batch.get_column("_origin")[first:].max())
+    bound = origin - normalize.ALIGN_WINDOW - max_shift
+    if reference is not None:
+        bound = min(bound, normalize.repeat_start(reference, last_chromosome, origin) - normalize.ALIGN_WINDOW - 1)
+
+    # released rows are a prefix, previous chromosome runs and begin of last run
+    released = first + batch.slice(first).select((polars.col("position") < bound).sum()).item()
+
+    return batch.slice(0, released).drop("_origin"), batch.slice(released), max_shift
+
+
+RECORD_SCHEMA: dict[str, polars.DataType] = {
+    "chr": polars.String(),
+    "position": polars.Int64(),
+    "_id": polars.String(),
+    "ref": polars.String(),
+    "alt": polars.String(),
+    "qual": polars.Float64(),
+    "filter": polars.String(),
+    "_info": polars.String(),
+}
+"""Type of fixed vcf columns, FORMAT and samples columns are read as string."""
 
-    bad_column_parsing = _parse_vcf_header(path, formats)
+
+def _scan_records(source: pathlib.Path | bytes, samples: list[str]) -> polars.LazyFrame:
+    """Scan vcf records without decoding, columns type didn't depend on content."""
+    schema = RECORD_SCHEMA.copy()
+    if samples:
+        schema["_format"] = polars.String()
+        schema.update({f"_sample_{i}": polars.String() for i in range(len(samples))})
+
+    return polars.scan_csv(
+        source,
+        comment_prefix="#",
+        has_header=False,
+        new_columns=list(schema),
+        schema_overrides=schema,
+        null_values=["."],
+        separator="\t",
+    )
+
+
+def _record_decoding(
+    path: pathlib.Path,
+    samples: list[str],
+    *,
+    info_mode: InfoMode,
+    columns: list[str] | None,
+    info_fields: list[str] | None,
+    format_fields: list[str] | None,
+) -> tuple[bool, dict[str, list[polars.Expr]]]:
+    """Read vcf header to build INFO and FORMAT decoding expressions, and check if genotype must be parsed."""
+    info_columns = _selected_columns(columns, info_fields, "info_", str)
+    format_columns = _selected_columns(columns, format_fields, "format_", str.lower)
+    parse_genotype = bool(samples) and format_columns != set()
+
+    with profile.stage("format discovery", input_path=path):
+        formats, complete = _sample_format_pos(path) if parse_genotype else (None, True)
+
+    with profile.stage("header parse", input_path=path):
+        return parse_genotype, _parse_vcf_header(
+            path,
+            formats,
+            info_mode,
+            info_columns,
+            format_columns,
+            formats_complete=complete,
+        )
+
+
+def _decode_records(
+    lf: polars.LazyFrame,
+    samples: list[str],
+    parse_genotype: bool,  # noqa: FBT001 private helper
+    bad_column_parsing: dict[str, list[polars.Expr]],
+    *,
+    columns: list[str] | None,
+    sample_layout: SampleLayout,
+) -> polars.LazyFrame:
+    """Decode INFO, FORMAT and samples columns of records scan by _scan_records."""
+    sample_columns = [f"_sample_{i}" for i in range(len(samples))]
+
+    if bad_column_parsing["info_fields"]:
+        lf = lf.with_columns(
+            bad_column_parsing["info_fields"],
+        )
 
     lf = lf.with_columns(
         bad_column_parsing["info"],
     )
 
-    if with_genotype:
-        lf = polars.concat(
-            [
-                lf.filter(polars.col("_format") == format_str).with_columns(
-                    bad_column_parsing[format_str],
-                )
-                for format_str in formats
-            ],
+    if parse_genotype and sample_layout == "long":
+        lf = lf.unpivot(
+            on=sample_columns,
+            index=polars.selectors.exclude(sample_columns),
+            variable_name="sample",
+            value_name="_genotype",
+        ).with_columns(
+            sample=polars.col("sample").replace_strict(
+                dict(zip(sample_columns, samples)),
+                return_dtype=polars.Enum(samples),
+            ),
         )
+        lf = _decode_genotype(lf, "_genotype", bad_column_parsing["format"], "")
+        if "format_gt" in lf.collect_schema():
+            lf = lf.with_columns(_encode_gt(polars.col("format_gt")))
+    elif parse_genotype:
+        for column, sample in zip(sample_columns, samples):
+            lf = _decode_genotype(lf, column, bad_column_parsing["format"], "" if len(samples) == 1 else f"{sample}_")
+
+    if columns is not None:
+        return lf.select(columns)
+
+    return lf.drop(
+        "_id",
+        "_info",
+        "_info_fields",
+        "_format",
+        "_genotype",
+        "_genotype_fields",
+        *sample_columns,
+        strict=False,
+    )
+
+
+def region_filter(regions: list[Region]) -> polars.Expr:
+    """Build expression that select record overlapping regions, region name could be a contig alias."""
+    return polars.any_horizontal(
+        (polars.col("chr") == contig.normalize(name))
+        & (polars.col("position") <= end)
+        & (polars.col("position") + polars.col("ref").str.len_bytes() > begin)
+        for name, begin, end in regions
+    )
+
 
-    lf = lf.drop("_id", "_info")
-    if with_genotype:
-        lf = lf.drop("_format", "genotype")
+def _read_samples(path: pathlib.Path) -> list[str]:
+    """Get name of sample store in vcf."""
+    with xopen.xopen(path) as fh:
+        for line in fh:
+            if line.startswith("#CHROM"):
+                return line.rstrip("\n").split("\t")[9:]
+            if not line.startswith("#"):
+                break
 
-    return lf
+    return []
 
 
-def _lazyframe2format_pos(
+def _decode_genotype(
     lf: polars.LazyFrame,
-) -> typing.Iterator[tuple[str, dict[str, int]]]:
-    """Create a dictionary of format element associate with position in format string."""
-    for format_str in lf.select("_format").unique().collect().get_column("_format").to_list():
-        yield (format_str, {k: v for v, k in enumerate(format_str.split(":"))})
+    column: str,
+    expressions: list[polars.Expr],
+    prefix: str,
+) -> polars.LazyFrame:
+    """Split a sample column once and apply format expressions, output column are prefixed."""
+    return lf.with_columns(
+        _genotype_fields=polars.col(column).str.split(":"),
+    ).with_columns(
+        [expr.name.prefix(prefix) for expr in expressions],
+    )
 
 
+def _encode_gt(gt: polars.Expr) -> list[polars.Expr]:
+    """Replace genotype string by list of allele index, missing allele are null, and a phased flag."""
+    return [
+        gt.str.replace_all("|", "/", literal=True)
+        .str.split("/")
+        .cast(polars.List(polars.Int8), strict=False)
+        .alias("format_gt"),
+        gt.str.contains("|", literal=True).alias("format_phased"),
+    ]
+
+
+def _selected_columns(
+    columns: list[str] | None,
+    fields: list[str] | None,
+    prefix: str,
+    field2column: typing.Callable[[str], str],
+) -> set[str] | None:
+    """Get name of column that should be parsed for a category of field, None if all column should be parsed."""
+    if columns is None and fields is None:
+        return None
+
+    # column of multi-sample vcf could be prefixed by sample name
+    selected = {prefix + column.split(prefix, 1)[1] for column in columns or [] if prefix in column}
+    selected.update(f"{prefix}{field2column(field)}" for field in fields or [])
+
+    return selected
+
+
+FORMAT_SAMPLE_SIZE: int = 10_000
+"""Number of record read to discover format string present in vcf."""
+
+
+def _sample_format_pos(
+    path: pathlib.Path,
+    sample_size: int | None = None,
+) -> tuple[dict[str, dict[str, int]], bool]:
+    """Create a dictionary of format element associate with position in format string.
+
+    Only first `sample_size` records are read, if file contains more records format string could be incomplete.
+
+    Args:
+        path: Path to vcf file
+        sample_size: Maximal number of record read, default FORMAT_SAMPLE_SIZE
+
+    Return:
+        Format string associate to position of each element, and False if all records aren't read.
+    """
+    sample_size = FORMAT_SAMPLE_SIZE if sample_size is None else sample_size
+    format2pos: dict[str, dict[str, int]] = {}
+
+    with xopen.xopen(path) as fh:
+        nb_record = 0
+        for line in fh:
+            if line.startswith("#"):
+                continue
+            if nb_record == sample_size:
+                return format2pos, False
+
+            nb_record += 1
+            format_str = line.split("\t", 9)[8]
+            if format_str not in format2pos:
+                format2pos[format_str] = {k: v for v, k in enumerate(format_str.split(":"))}
+
+    return format2pos, True
+
+
+@profile.traced
 def _parse_vcf_header(
     path: pathlib.Path,
-    formats: dict[str, dict[str, int]],
+    formats: dict[str, dict[str, int]] | None,
+    info_mode: InfoMode = "regex",
+    info_columns: set[str] | None = None,
+    format_columns: set[str] | None = None,
+    *,
+    formats_complete: bool = True,
 ) -> dict[str, list[polars.Expr]]:
     """Read a vcf header to generate a list of polars expression to extract info and genotype field.
 
     Args:
         path: Path to vcf file
-        formats: All format string present in vcf file
+        formats: Format string present in vcf file, if None position of format field is search in each record
+        info_mode: How INFO column is decoded
+        info_columns: Name of info column generate, default all
+        format_columns: Name of format column generate, default all
+        formats_complete: False if formats come from a sample of records, position of field in other format string
+            is search in their records
 
     Return:
         Set of expression associate to set of data should be parsed.
@@ -105,31 +747,84 @@ def _parse_vcf_header(
             if line.startswith("#CHR"):
                 break
             if line.startswith("##INFO="):
-                if (expr := _parse_info_line(line)) is not None:
+                if (expr := _parse_info_line(line, info_mode)) is not None and (
+                    info_columns is None or expr.meta.output_name() in info_columns
+                ):
                     category2expression["info"].append(expr)
-            elif line.startswith("##FORMAT="):
-                for format_str, format_pos in formats.items():
-                    if (expr := _parse_format_line(line, format_pos)) is not None:
-                        category2expression[format_str].append(expr)
+            elif (
+                line.startswith("##FORMAT=")
+                and (expr := _parse_format_line(line, formats, complete=formats_complete)) is not None
+                and (format_columns is None or expr.meta.output_name() in format_columns)
+            ):
+                category2expression["format"].append(expr)
+
+    if info_mode == "tokenize" and category2expression["info"]:
+        category2expression["info_fields"].append(
+            _tokenize_info(
+                [expr.meta.output_name().removeprefix("info_") for expr in category2expression["info"]],
+            ),
+        )
 
     return category2expression
 
 
+def _tokenize_info(names: list[str]) -> polars.Expr:
+    """Build expression that split INFO column once per row in a struct with one string field by name.
+
+    INFO string is rewrite as a json object, `KEY=VALUE;FLAG` became `{"KEY":"VALUE","FLAG":""}`, and decode in one pass.
+    """
+    tokens = (
+        polars.col("_info")
+        .str.replace_all("\\", "\\\\", literal=True)
+        .str.replace_all('"', '\\"', literal=True)
+        .str.split(";")
+        .list.eval(
+            polars.when(polars.element().str.contains("=", literal=True))
+            .then(polars.element().str.replace("=", '":"', literal=True))
+            .otherwise(polars.element() + '":"'),
+        )
+    )
+
+    return (
+        polars.concat_str(polars.lit('{"'), tokens.list.join('","'), polars.lit('"}'))
+        .str.json_decode(polars.Struct(dict.fromkeys(names, polars.String)))
+        .alias("_info_fields")
+    )
+
+
 INFO_RE: typing.Pattern = re.compile(
     r"ID=(?P<id>([A-Za-z_][0-9A-Za-z_.]*|1000G)),Number=(?P<number>[ARG0-9\.]+),Type=(?P<type>Integer|Float|String|Character)",
 )
 
 
-def _parse_info_line(line: str) -> polars.Expr | None:
+def field_numbers(path: pathlib.Path) -> dict[str, str]:
+    """Get Number of each INFO and FORMAT field declared in vcf header, by column name (`info_AF`, `format_ad`)."""
+    numbers = {}
+    with xopen.xopen(path) as fh:
+        for line in fh:
+            if not line.startswith("##"):
+                break
+            if line.startswith("##INFO=") and (search := INFO_RE.search(line)):
+                numbers[f"info_{search['id']}"] = search["number"]
+            elif line.startswith("##FORMAT=") and (search := FORMAT_RE.search(line)):
+                numbers[f"format_{search['id'].lower()}"] = search["number"]
+
+    return numbers
+
+
+def _parse_info_line(line: str, info_mode: InfoMode = "regex") -> polars.Expr | None:
     """Parse vcf header info line to generate polars.Expr."""
     if search := INFO_RE.search(line):
         name = search["id"]
         number = search["number"]
         format_type = search["type"]
 
-        regex = rf"{name}=([^;]+);?"
+        if info_mode == "tokenize":
+            local_expr = polars.col("_info_fields").struct.field(name)
+        else:
+            regex = rf"(?:^|;){name}=([^;]+)"
 
-        local_expr = polars.col("_info").str.extract(regex, 1)
+            local_expr = polars.col("_info").str.extract(regex, 1)
 
         if number == "1":
             if format_type == "Integer":
@@ -161,25 +856,50 @@ FORMAT_RE: typing.Pattern = re.compile(
 )
 
 
-def _parse_format_line(line: str, format_pos: dict[str, int]) -> polars.Expr | None:
-    """Parse vcf header info line to generate polars.Expr."""
+def _parse_format_line(
+    line: str,
+    formats: dict[str, dict[str, int]] | None,
+    *,
+    complete: bool = True,
+) -> polars.Expr | None:
+    """Parse vcf header format line to generate polars.Expr.
+
+    Position of field in genotype is lookup by format string of each row, all format string are parsed in one pass.
+    If formats isn't complete, position is search only in rows with a format string missing from formats.
+    """
     if search := FORMAT_RE.search(line):
         name = search["id"]
         number = search["number"]
         format_type = search["type"]
 
-        if name in format_pos:
-            local_expr = polars.col("genotype").str.split(":").list.get(format_pos[name], null_on_oob=True)
+        format2pos = {
+            format_str: format_pos[name] for format_str, format_pos in (formats or {}).items() if name in format_pos
+        }
+        if formats is None:
+            local_expr = polars.col("_genotype_fields").list.get(_format_field_pos(name), null_on_oob=True)
+        elif not complete:
+            unknown = polars.when(~polars.col("_format").is_in(list(formats))).then(polars.col("_format"))
+            local_expr = polars.col("_genotype_fields").list.get(
+                polars.col("_format").replace_strict(
+                    format2pos,
+                    default=_format_field_pos(name, unknown),
+                    return_dtype=polars.Int64,
+                ),
+                null_on_oob=True,
+            )
+        elif format2pos:
+            local_expr = polars.col("_genotype_fields").list.get(
+                polars.col("_format").replace_strict(format2pos, default=None, return_dtype=polars.Int64),
+                null_on_oob=True,
+            )
         else:
-            local_expr = polars.lit("").str.split(":").list.get(0, null_on_oob=True)
+            local_expr = polars.lit(None, dtype=polars.String)
 
         if number == "1":
             if format_type == "Integer":
-                local_expr = local_expr.str.to_integer(base=10, strict=False).cast(
-                    polars.UInt32,
-                )
+                local_expr = local_expr.cast(polars.UInt32, strict=False)
             elif format_type == "Float":
-                local_expr = local_expr.str.to_decimal(scale=40).cast(polars.Float32)
+                local_expr = local_expr.cast(polars.Float32, strict=False)
             elif format_type in {"String", "Character"}:
                 pass  # Nothing to do for string and character
             else:
@@ -187,13 +907,9 @@ def _parse_format_line(line: str, format_pos: dict[str, int]) -> polars.Expr | N
         else:
             local_expr = local_expr.str.split(",")
             if format_type == "Integer":
-                local_expr = local_expr.list.eval(
-                    polars.element().str.to_integer(base=10, strict=False).cast(polars.UInt32),
-                )
+                local_expr = local_expr.cast(polars.List(polars.UInt32), strict=False)
             elif format_type == "Float":
-                local_expr = local_expr.list.eval(
-                    polars.element().str.to_decimal(scale=40).cast(polars.Float32),
-                )
+                local_expr = local_expr.cast(polars.List(polars.Float32), strict=False)
             elif format_type in {"String", "Character"}:
                 pass  # Nothing to do for string and character
             else:
@@ -204,32 +920,161 @@ def _parse_format_line(line: str, format_pos: dict[str, int]) -> polars.Expr | N
     return None
 
 
-def parse_info_ann(lf: polars.LazyFrame, prefix: str) -> polars.LazyFrame:
-    """Extract information if info_ANN column."""
-    lf = lf.explode("info_ANN")
+def _format_field_pos(name: str, format_str: polars.Expr | None = None) -> polars.Expr:
+    """Build expression that found position of a field in format string of each row, null format string are skipped.
 
-    lf = lf.with_columns(
-        ann=polars.col("info_ANN").str.split("|").cast(polars.List(polars.Utf8())),
-    ).drop("info_ANN")
+    Args:
+        name: Format field
+        format_str: Format string of each row, default `_format` column
+    """
+    format_str = polars.col("_format") if format_str is None else format_str
+    offset = polars.concat_str(polars.lit(":"), format_str, polars.lit(":")).str.find(f":{name}:", literal=True)
 
-    lf = lf.with_columns(
-        [
-            polars.col("ann").list.get(1).alias(f"{prefix}_effect"),
-            polars.col("ann").list.get(2).alias(f"{prefix}_impact"),
-            polars.col("ann").list.get(3).alias(f"{prefix}_gene"),
-            polars.col("ann").list.get(4).alias(f"{prefix}_geneid"),
-            polars.col("ann").list.get(5).alias(f"{prefix}_feature"),
-            polars.col("ann").list.get(6).alias(f"{prefix}_feature_id"),
-            polars.col("ann").list.get(7).alias(f"{prefix}_bio_type"),
-            polars.col("ann").list.get(8).alias(f"{prefix}_rank"),
-            polars.col("ann").list.get(9).alias(f"{prefix}_hgvs_c"),
-            polars.col("ann").list.get(10).alias(f"{prefix}_hgvs_p"),
-            polars.col("ann").list.get(11).alias(f"{prefix}_cdna_pos"),
-            polars.col("ann").list.get(12).alias(f"{prefix}_cdna_len"),
-            polars.col("ann").list.get(13).alias(f"{prefix}_cds_pos"),
-            polars.col("ann").list.get(14).alias(f"{prefix}_cds_len"),
-            polars.col("ann").list.get(15).alias(f"{prefix}_aa_pos"),
-        ],
+    return (
+        polars.when(offset.is_not_null())
+        .then(format_str.str.slice(0, offset).str.count_matches(":", literal=True))
+        .cast(polars.Int64)
     )
 
-    return lf.drop("ann")
+
+SNPEFF_FIELDS: list[str] = [
+    "Allele",
+    "Annotation",
+    "Annotation_Impact",
+    "Gene_Name",
+    "Gene_ID",
+    "Feature_Type",
+    "Feature_ID",
+    "Transcript_BioType",
+    "Rank",
+    "HGVS.c",
+    "HGVS.p",
+    "cDNA.pos / cDNA.length",
+    "CDS.pos / CDS.length",
+    "AA.pos / AA.length",
+    "Distance",
+    "ERRORS / WARNINGS / INFO",
+]
+"""Default annotation layout, field of snpEff ANN."""
+
+ANNOTATION_ALIASES: dict[str, str] = {
+    "annotation": "effect",
+    "consequence": "effect",
+    "annotation_impact": "impact",
+    "gene_name": "gene",
+    "symbol": "gene",
+    "gene_id": "geneid",
+    "gene": "geneid",
+    "feature_type": "feature",
+    "feature": "feature_id",
+    "transcript_biotype": "bio_type",
+    "biotype": "bio_type",
+    "cdna_pos_cdna_length": "cdna_pos",
+    "cds_pos_cds_length": "cds_pos",
+    "aa_pos_aa_length": "aa_pos",
+}
+"""Rename of snpEff and VEP annotation field, to get same name whatever the annotator and keep column names of stores
+write before annotation layout was read in header."""
+
+IMPACT_RANK: dict[str, int] = {"HIGH": 0, "MODERATE": 1, "LOW": 2, "MODIFIER": 3}
+"""Severity order of annotation impact, lower is more severe."""
+
+ANNOTATION_FORMAT_RE: typing.Pattern = re.compile(r"Format: ?(?P<format>[^\"']+)|'(?P<quoted>[^']+)'")
+
+
+def annotation_fields(path: pathlib.Path, info_id: str = "ANN") -> list[str] | None:
+    """Read annotation layout declared in description of an INFO header line.
+
+    snpEff declare field between quote `'Allele | Annotation | ...'`, VEP after `Format: Allele|Consequence|...`.
+
+    Args:
+        path: Path to vcf file
+        info_id: Id of annotation INFO field, ANN for snpEff, CSQ for VEP
+
+    Return:
+        Name of each annotation field, None if INFO field isn't declared or without layout.
+    """
+    with xopen.xopen(path) as fh:
+        for line in fh:
+            if not line.startswith("##"):
+                break
+            if line.startswith(f"##INFO=<ID={info_id},") and (search := ANNOTATION_FORMAT_RE.search(line)):
+                return [field.strip() for field in (search["format"] or search["quoted"]).split("|")]
+
+    return None
+
+
+def annotation_struct(column: str, fields: list[str]) -> polars.Expr:
+    """Split each annotation of a list of annotation string in a struct.
+
+    Field name are normalized, lower case, non alphanumeric character replaced by `_` and ANNOTATION_ALIASES applied.
+
+    Args:
+        column: Name of a list of annotation string column
+        fields: Name of each annotation field, in order
+
+    Return:
+        Expression of a list of struct with one string field by annotation field.
+    """
+    names = _annotation_names(fields)
+
+    return polars.col(column).list.eval(
+        polars.element().str.split_exact("|", len(names) - 1).struct.rename_fields(names),
+    )
+
+
+def _annotation_names(fields: list[str]) -> list[str]:
+    """Normalize name of annotation field."""
+    names = []
+    for field in fields:
+        name = re.sub(r"[^0-9a-z]+", "_", field.lower()).strip("_")
+        names.append(ANNOTATION_ALIASES.get(name, name))
+
+    return names
+
+
+@profile.traced
+def parse_info_ann(
+    lf: polars.LazyFrame,
+    prefix: str,
+    fields: list[str] | None = None,
+    *,
+    column: str = "info_ANN",
+    most_severe: bool = False,
+) -> polars.LazyFrame:
+    """Extract information of annotation column in `{prefix}_{field}` columns.
+
+    Args:
+        lf: A LazyFrame with a list of annotation string column
+        prefix: Prefix of generated column
+        fields: Name of each annotation field, default SNPEFF_FIELDS
+        column: Name of annotation column
+        most_severe: Keep only annotation with most severe impact (first one if layout has no impact), one row by variant, otherwise one row by annotation
+
+    Return:
+        LazyFrame where annotation column is replaced by annotation field columns.
+    """
+    fields = SNPEFF_FIELDS if fields is None else fields
+    annotations = annotation_struct(column, fields)
+
+    if most_severe and "impact" not in _annotation_names(fields):
+        lf = lf.with_columns(annotations.list.first())
+    elif most_severe:
+        lf = lf.with_columns(
+            annotations.list.eval(
+                polars.element().get(
+                    polars.element()
+                    .struct.field("impact")
+                    .replace_strict(IMPACT_RANK, default=len(IMPACT_RANK))
+                    .arg_min(),
+                ),
+            )
+            .list.first()
+            .alias(column),
+        )
+    else:
+        lf = lf.with_columns(annotations).explode(column)
+
+    return lf.with_columns(
+        polars.col(column).struct.unnest().name.prefix(f"{prefix}_"),
+    ).drop(column)
@@ -4,6 +4,7 @@
 from __future__ import annotations
 
 import os
+import pathlib
 import typing
 
 # 3rd party import
@@ -13,15 +14,9 @@ import streamlit
 import tomllib
 
 # project import
-
-
-if typing.TYPE_CHECKING:
-    # std import
-    import pathlib
-
-    # 3rd party import
-
-    # project import
+import vkd.join
+import vkd.writer
+from vkd._internal import profile
 
 
 def main(enable_pages: list[str]) -> None:
@@ -53,20 +48,107 @@ def read_config(config_path: pathlib.Path) -> dict[str, typing.Any]:
     return config
 
 
-def read_parquet(input_directory: pathlib.Path, chr_name: str, config: dict[str, typing.Any]) -> polars.LazyFrame:
-    """Read a parquet file in polars.LazyFrame and apply change."""
-    lf = polars.scan_parquet(input_directory / f"{chr_name}.parquet")
+def _chr_paths(input_directory: pathlib.Path, chr_name: str) -> list[pathlib.Path]:
+    """Get path of a `<chr>.parquet` file and parquet of a `<chr>` directory."""
+    paths = [path] if (path := input_directory / f"{chr_name}.parquet").is_file() else []
+    if (input_directory / chr_name).is_dir():
+        paths.extend(sorted((input_directory / chr_name).glob("*.parquet")))
+
+    return paths
+
+
+def scan_chr(input_directory: pathlib.Path, chr_name: str, region: tuple[int, int] | None = None) -> polars.LazyFrame:
+    """Scan all parquet of a chromosome, a `<chr>.parquet` file and/or a `<chr>` directory, in one polars.LazyFrame.
+
+    Parquet schema can be different, missing columns are fill by null and columns are cast to supertype. With region,
+    (start, end) 1-based inclusive, filter is apply on each scan, row groups of position sorted parquet outside of
+    region aren't read.
+    """
+    scans = [polars.scan_parquet(path) for path in _chr_paths(input_directory, chr_name)]
+    if region is not None:
+        scans = [scan.filter(polars.col("position").is_between(*region)) for scan in scans]
+
+    return polars.concat(scans, how="diagonal_relaxed")
+
+
+@profile.traced
+def read_parquet(
+    input_directory: pathlib.Path,
+    chr_name: str,
+    config: dict[str, typing.Any],
+    region: tuple[int, int] | None = None,
+) -> polars.LazyFrame:
+    """Read a parquet file and a directory of parquet by dataset in polars.LazyFrame and apply change.
+
+    See scan_chr for region and schema of parquet.
+    """
+    lf = scan_chr(input_directory, chr_name, region)
+
+    # deduplicate on compact variant key in place of chr, position, ref and alt
+    key_columns = [col for col in vkd.join.VARIANT_KEY_COLUMNS if col in lf.collect_schema()]
+    if len(key_columns) == len(vkd.join.VARIANT_KEY_COLUMNS):
+        subset = [col for col in config["select_column"] if col not in vkd.join.KEY_COLUMNS]
+    else:
+        subset = config["select_column"]
+        key_columns = []
+
+    lf = lf.select(*config["select_column"], *key_columns)
+    lf = lf.unique(subset=[*subset, *key_columns]).drop(key_columns)
+
+    return lf.rename({key: name for key, name in config["alias"].items() if key in config["alias"]})
+
 
-    lf = lf.select(config["select_column"])
-    lf = lf.rename({key: name for key, name in config["alias"].items() if key in config["alias"]})
+def position_range(input_directory: pathlib.Path, chr_name: str) -> tuple[int, int] | None:
+    """Get minimal and maximal position of a chromosome, from manifest or by reading only position column.
 
-    return lf.unique()
+    Return None if chromosome has no position, position column is read again only when a parquet change.
+    """
+    if (manifest := vkd.writer.read_manifest(input_directory)) is not None:
+        bounds = [partition["position"] for partition in manifest["partitions"] if partition["chr"] == chr_name]
+        starts = [start for start, _ in bounds if start is not None]
+        ends = [end for _, end in bounds if end is not None]
+        return (min(starts), max(ends)) if starts and ends else None
+
+    paths = _chr_paths(input_directory, chr_name)
+    return _scan_position_range([str(path) for path in paths], [path.stat().st_mtime_ns for path in paths])
+
+
+@streamlit.cache_data
+@profile.traced
+def _scan_position_range(paths: list[str], mtimes: list[int]) -> tuple[int, int] | None:  # noqa: ARG001 cache key
+    """Read minimal and maximal position of parquet files, mtimes invalidate cache when a file is rewrite."""
+    if not paths:
+        return None
+
+    start, end = (
+        polars.concat([polars.scan_parquet(path).select("position") for path in paths])
+        .select(polars.min("position"), polars.max("position"))
+        .collect()
+        .row(0)
+    )
+
+    return None if start is None or end is None else (start, end)
 
 
 def _column_start_by(schema: polars.Schema, start: str) -> list[str]:
     return [name for name in schema.names() if name.startswith(start)]
 
 
+def chr_dataset_name(input_directory: pathlib.Path, chr_name: str) -> list[str] | None:
+    """Get dataset of a chromosome from manifest, None if store has no manifest."""
+    if (manifest := vkd.writer.read_manifest(input_directory)) is None:
+        return None
+
+    return sorted(
+        {
+            dataset
+            for partition in manifest["partitions"]
+            if partition["chr"] == chr_name
+            for dataset in partition["datasets"]
+        },
+    )
+
+
 def extract_dataset_name(_lf: polars.LazyFrame, config: dict[str, typing.Any]) -> list[str]:
     """Extract list of dataset in LazyFrame."""
     return (
@@ -80,11 +162,24 @@ def extract_dataset_name(_lf: polars.LazyFrame, config: dict[str, typing.Any]) -
 
 
 def scan_chr_list(input_directory: pathlib.Path) -> typing.Iterator[str]:
-    """Extract chromosome from input directory."""
+    """Extract chromosome from manifest or input directory, a `<chr>.parquet` file and/or a `<chr>` directory of parquet."""
+    if (manifest := vkd.writer.read_manifest(input_directory)) is not None:
+        yield from manifest["chromosomes"]
+        return
+
+    chromosomes = set()
     with os.scandir(input_directory) as dir_scan:
         for entry in dir_scan:
             if entry.is_file() and entry.name.endswith(".parquet") and entry.stat().st_size != 0:
-                yield entry.name.split(".")[0]
+                chromosomes.add(entry.name.split(".")[0])
+            elif (
+                entry.is_dir()
+                and not entry.name.startswith(".")
+                and any(path.suffix == ".parquet" for path in pathlib.Path(entry.path).iterdir())
+            ):
+                chromosomes.add(entry.name)
+
+    yield from sorted(chromosomes)
 
 
 def numeric_column(_lf: polars.LazyFrame) -> list[str]:
@@ -92,6 +187,14 @@ def numeric_column(_lf: polars.LazyFrame) -> list[str]:
     return [name for name, col_type in dict(_lf.collect_schema()).items() if col_type.is_numeric()]
 
 
+def manifest_numeric_column(input_directory: pathlib.Path, config: dict[str, typing.Any]) -> list[str] | None:
+    """Get plotable numeric value of selected columns from manifest, with their alias, None if store has no manifest."""
+    if (manifest := vkd.writer.read_manifest(input_directory)) is None:
+        return None
+
+    return [config["alias"][name] for name in config["select_column"] if name in manifest["ranges"]]
+
+
 def collect_and_sample(
     _lf: polars.LazyFrame,
     fraction: int,
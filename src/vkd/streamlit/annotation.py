@@ -12,6 +12,7 @@ import streamlit
 
 # project import
 import vkd.streamlit
+from vkd._internal import profile
 
 if typing.TYPE_CHECKING:
     # std import
@@ -22,16 +23,21 @@ if typing.TYPE_CHECKING:
     # project import
 
 
+@profile.traced
 def annotation(input_directory: pathlib.Path, config_path: pathlib.Path) -> None:
     """Show information related to variant status and annotation."""
     config = vkd.streamlit.read_config(config_path)
 
-    chromosome_selector = streamlit.sidebar.selectbox("chromsome", vkd.streamlit.chr_list(input_directory))
+    chromosome_selector = streamlit.sidebar.selectbox("chromsome", vkd.streamlit.scan_chr_list(input_directory))
 
-    lf = polars.scan_parquet(input_directory / f"{chromosome_selector}.parquet")
+    lf = vkd.streamlit.scan_chr(input_directory, chromosome_selector)
     schema = lf.collect_schema()
 
-    dataset_name_selector = streamlit.sidebar.selectbox("dataset", vkd.streamlit.dataset_name(lf))
+    dataset_name_selector = streamlit.sidebar.selectbox(
+        "dataset",
+        vkd.streamlit.chr_dataset_name(input_directory, chromosome_selector)
+        or lf.select("dataset").unique().sort("dataset").collect().get_column("dataset").to_list(),
+    )
     lf = lf.filter(polars.col("dataset") == dataset_name_selector)
 
     annotator_selector = streamlit.sidebar.selectbox("annotator", _variant_annotator(schema))
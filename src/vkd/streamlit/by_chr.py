@@ -11,6 +11,7 @@ import streamlit
 
 # project import
 import vkd.streamlit
+from vkd._internal import profile
 
 if typing.TYPE_CHECKING:
     # std import
@@ -21,6 +22,7 @@ if typing.TYPE_CHECKING:
     # project import
 
 
+@profile.traced
 def by_chr(input_directory: pathlib.Path, config_path: pathlib.Path) -> None:
     """Principal function of by_chr page."""
     print("by_chr")
@@ -31,11 +33,23 @@ def by_chr(input_directory: pathlib.Path, config_path: pathlib.Path) -> None:
         vkd.streamlit.scan_chr_list(input_directory),
     )
 
-    lf = vkd.streamlit.read_parquet(input_directory, chr_name_selector, config)
+    # slider need two distinct bounds, a chromosome without position range is read whole
+    bounds = vkd.streamlit.position_range(input_directory, chr_name_selector)
+    region_selector = None
+    if bounds is not None and bounds[0] < bounds[1]:
+        region_selector = streamlit.sidebar.slider(
+            "Position",
+            min_value=bounds[0],
+            max_value=bounds[1],
+            value=bounds,
+        )
+
+    lf = vkd.streamlit.read_parquet(input_directory, chr_name_selector, config, region_selector)
 
     dataset_name_selector = streamlit.sidebar.selectbox(
         "Dataset name",
-        vkd.streamlit.extract_dataset_name(lf, config),
+        vkd.streamlit.chr_dataset_name(input_directory, chr_name_selector)
+        or vkd.streamlit.extract_dataset_name(lf, config),
     )
 
     subsample_selector = streamlit.sidebar.slider(
@@ -74,12 +88,13 @@ def by_chr(input_directory: pathlib.Path, config_path: pathlib.Path) -> None:
     streamlit.title("Violin Plot of a specific column")
     column_selector = streamlit.selectbox(
         "Column to show",
-        vkd.streamlit.numeric_column(lf),
+        vkd.streamlit.manifest_numeric_column(input_directory, config) or vkd.streamlit.numeric_column(lf),
     )
     streamlit.altair_chart(vkd.streamlit.violin_plot(df, config, column_selector))
 
 
 @streamlit.cache_data
+@profile.traced
 def filter_and_collect(_lf: polars.LazyFrame, cols_values: list[(str, typing.Any)], fraction: int) -> polars.DataFrame:
     """Filter on column and collect lazyframe."""
     return vkd.streamlit.collect_and_sample(
@@ -89,6 +104,7 @@ def filter_and_collect(_lf: polars.LazyFrame, cols_values: list[(str, typing.Any
 
 
 @streamlit.cache_data
+@profile.traced
 def variant_length_histo(df: polars.DataFrame, keep_col: list[str]) -> polars.DataFrame:
     """Compute and collect variant length."""
     return (
@@ -11,6 +11,7 @@ import streamlit
 
 # project import
 import vkd.streamlit
+from vkd._internal import profile
 
 if typing.TYPE_CHECKING:
     # std import
@@ -21,6 +22,7 @@ if typing.TYPE_CHECKING:
     # project import
 
 
+@profile.traced
 def generic(input_directory: pathlib.Path, config_path: pathlib.Path) -> None:
     """Principal function of generic page.
 
@@ -50,6 +52,7 @@ def generic(input_directory: pathlib.Path, config_path: pathlib.Path) -> None:
 
 
 @streamlit.cache_data
+@profile.traced
 def __counts(_lf: polars.LazyFrame, columns: list[str]) -> polars.DataFrame:
     """Run a group by and count element."""
     return _lf.group_by(columns).len().collect()
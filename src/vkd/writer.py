@@ -1 +1,232 @@
-"""vkd writer definition."""
+"""vkd writer definition, dtypes, parquet layout and manifest of merge output."""
+
+# std import
+from __future__ import annotations
+
+import json
+import os
+import typing
+
+# 3rd party import
+import polars
+
+# project import
+from vkd import reader
+
+if typing.TYPE_CHECKING:
+    # std import
+    import pathlib
+
+Compression = typing.Literal["zstd", "lz4", "snappy", "gzip", "brotli", "uncompressed"]
+
+COMPRESSION: Compression = "zstd"
+"""Default parquet codec, smallest output of zstd, lz4 and snappy on merge output."""
+
+COMPRESSION_LEVEL: int = 3
+"""Default zstd level, the codec default."""
+
+ROW_GROUP_SIZE: int = 262_144
+"""Default number of rows of parquet row group, smaller row groups compress worse and dashboard scans read whole files."""
+
+CATEGORICAL_COLUMNS: list[str] = ["chr", "dataset", "format_bd", "filter", "format_gt"]
+"""Low cardinality string columns store as Categorical, with `*_effect` annotation columns."""
+
+LABEL_COLUMNS: list[str] = ["format_bd", "filter"]
+"""String columns whose values are list in manifest, with `*_impact` annotation columns."""
+
+MANIFEST_NAME: str = "manifest.json"
+"""Name of manifest of a partitioned store."""
+
+MANIFEST_FORMAT: int = 1
+"""Version of manifest content, increase it when layout change, manifest of other format are rebuild."""
+
+IMPACT: polars.Enum = polars.Enum(list(reader.IMPACT_RANK))
+"""Dtype of `*_impact` annotation columns, categories are sorted by severity."""
+
+
+def compact_dtypes(schema: polars.Schema) -> dict[str, polars.DataType]:
+    """Get compact dtype of low cardinality string columns of a schema.
+
+    Args:
+        schema: Schema of merge output
+
+    Return:
+        Dtype of each column to cast, `*_impact` are Enum sorted by severity, other are Categorical.
+    """
+    dtypes: dict[str, polars.DataType] = {}
+    for name, dtype in schema.items():
+        if dtype != polars.String:
+            continue
+        if name.endswith("_impact"):
+            dtypes[name] = IMPACT
+        elif name in CATEGORICAL_COLUMNS or name.endswith("_effect"):
+            dtypes[name] = polars.Categorical()
+
+    return dtypes
+
+
+def compact(lf: polars.LazyFrame) -> polars.LazyFrame:
+    """Cast low cardinality string columns to Categorical or Enum, see compact_dtypes.
+
+    Args:
+        lf: Merge output
+
+    Return:
+        A polars.LazyFrame with same columns, an impact value not in `vkd.reader.IMPACT_RANK` raise at collect.
+    """
+    return lf.cast(compact_dtypes(lf.collect_schema()))
+
+
+def parquet_options(
+    compression: Compression = COMPRESSION,
+    compression_level: int | None = None,
+    row_group_size: int = ROW_GROUP_SIZE,
+) -> dict[str, typing.Any]:
+    """Build keyword arguments of polars sink_parquet and write_parquet.
+
+    Args:
+        compression: Parquet codec
+        compression_level: Level of zstd, gzip or brotli codec, default COMPRESSION_LEVEL for zstd, codec default
+            otherwise
+        row_group_size: Number of rows of row group
+
+    Return:
+        Keyword arguments, statistics are always write to let filter skip row groups.
+    """
+    if compression not in {"zstd", "gzip", "brotli"}:
+        compression_level = None
+    elif compression_level is None and compression == "zstd":
+        compression_level = COMPRESSION_LEVEL
+
+    return {
+        "compression": compression,
+        "compression_level": compression_level,
+        "row_group_size": row_group_size,
+        "statistics": True,
+    }
+
+
+def read_manifest(store: pathlib.Path) -> dict[str, typing.Any] | None:
+    """Read manifest of a partitioned store.
+
+    Args:
+        store: Directory of a merge write with --partition
+
+    Return:
+        Manifest content, see write_manifest, None if store has no manifest or manifest has another format.
+    """
+    try:
+        with open(store / MANIFEST_NAME) as fh:
+            manifest = json.load(fh)
+    except FileNotFoundError:
+        return None
+
+    return manifest if manifest.get("format") == MANIFEST_FORMAT else None
+
+
+def write_manifest(store: pathlib.Path) -> dict[str, typing.Any]:
+    """Summarize each parquet of a partitioned store in its manifest.
+
+    Manifest contains chromosomes, datasets, merged schema, value range of numeric columns, values of label columns
+    and one entry by partition with its rows, datasets, position range, value ranges and labels. Partition of
+    previous manifest, with same size and modification time, aren't read again.
+
+    Args:
+        store: Directory of a merge write with --partition
+
+    Return:
+        Manifest content.
+    """
+    previous = read_manifest(store)
+    known = {} if previous is None else {partition["path"]: partition for partition in previous["partitions"]}
+
+    partitions = []
+    schemas = []
+    for path in sorted((*store.glob("*.parquet"), *store.glob("*/*.parquet"))):
+        relative = path.relative_to(store)
+        stat = path.stat()
+        if relative.parts[0].startswith(".") or stat.st_size == 0:
+            continue
+
+        partition = known.get(relative.as_posix())
+        if partition is None or (partition["size"], partition["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+            partition = {
+                "path": relative.as_posix(),
+                "chr": relative.parts[0].removesuffix(".parquet"),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                **_summarize(polars.scan_parquet(path)),
+            }
+        partitions.append(partition)
+        schemas.append(polars.LazyFrame(schema=polars.read_parquet_schema(path)))
+
+    manifest: dict[str, typing.Any] = {
+        "format": MANIFEST_FORMAT,
+        "chromosomes": sorted({partition["chr"] for partition in partitions}),
+        "datasets": sorted({dataset for partition in partitions for dataset in partition["datasets"]}),
+        "schema": {}
+        if not schemas
+        else {
+            name: str(dtype) for name, dtype in polars.concat(schemas, how="diagonal_relaxed").collect_schema().items()
+        },
+        "ranges": _merge_ranges([partition["ranges"] for partition in partitions]),
+        "labels": {
+            column: sorted({value for partition in partitions for value in partition["labels"].get(column, [])})
+            for column in sorted({column for partition in partitions for column in partition["labels"]})
+        },
+        "partitions": partitions,
+    }
+
+    # write in a temporary file to never expose a partial manifest
+    tmp_path = store / f".{MANIFEST_NAME}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as fh:
+        json.dump(manifest, fh, indent=1)
+    tmp_path.replace(store / MANIFEST_NAME)
+
+    return manifest
+
+
+def _summarize(lf: polars.LazyFrame) -> dict[str, typing.Any]:
+    """Get rows, datasets, position range, numeric column ranges and label values of a parquet, in one scan."""
+    schema = lf.collect_schema()
+    numeric = [name for name, dtype in schema.items() if dtype.is_numeric()]
+    labels = [name for name in schema.names() if name in LABEL_COLUMNS or name.endswith("_impact")]
+
+    row = (
+        lf.select(
+            polars.len().alias("_rows"),
+            polars.col("dataset").unique().drop_nulls().sort().implode().alias("_datasets"),
+            *(polars.col(name).min().alias(f"_min_{name}") for name in numeric),
+            *(polars.col(name).max().alias(f"_max_{name}") for name in numeric),
+            *(
+                polars.col(name).cast(polars.String).unique().drop_nulls().sort().implode().alias(name)
+                for name in labels
+            ),
+        )
+        .collect()
+        .row(0, named=True)
+    )
+
+    ranges = {name: [row[f"_min_{name}"], row[f"_max_{name}"]] for name in numeric}
+
+    return {
+        "rows": row["_rows"],
+        "datasets": row["_datasets"],
+        "position": ranges.get("position", [None, None]),
+        "ranges": ranges,
+        "labels": {name: row[name] for name in labels},
+    }
+
+
+def _merge_ranges(ranges: list[dict[str, list[typing.Any]]]) -> dict[str, list[typing.Any]]:
+    """Merge value ranges of partitions, None bound of an all null column are ignored."""
+    merged: dict[str, list[typing.Any]] = {}
+    for partition in ranges:
+        for name, (low, high) in partition.items():
+            current = merged.setdefault(name, [None, None])
+            if low is not None:
+                current[0] = low if current[0] is None else min(current[0], low)
+            if high is not None:
+                current[1] = high if current[1] is None else max(current[1], high)
+
+    return merged
@@ -1 +1,70 @@
 """Configuration for the pytest test suite."""
+
+from __future__ import annotations
+
+import gzip
+import typing
+
+import pytest
+
+from tests import FIXTURES_DIR
+
+if typing.TYPE_CHECKING:
+    import pathlib
+
+
+@pytest.fixture
+def merge_inputs(tmp_path: pathlib.Path) -> dict[str, pathlib.Path]:
+    """Write a labeled query, a clinvar vcf and snpeff and vep annotations that match fixture variants.
+
+    Parameters:
+        tmp_path: Pytest fixture to get a temporary directory.
+    """
+    query_path = FIXTURES_DIR / "variants.vcf.gz"
+    lines = gzip.decompress(query_path.read_bytes()).decode().splitlines()
+    header = [line for line in lines if line.startswith("##")]
+    records = [line.split("\t") for line in lines if not line.startswith("#")]
+
+    label_path = tmp_path / "label.vcf"
+    with open(label_path, "w") as fh:
+        print(*header, sep="\n", file=fh)
+        print('##FORMAT=<ID=BD,Number=1,Type=String,Description="Benchmark decision">', file=fh)
+        print("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tsample", file=fh)
+        for i, record in enumerate(records):
+            print(*record[:8], "GT:BD", f"0/1:{'TP' if i % 3 else 'FP'}", sep="\t", file=fh)
+
+    clinvar_path = tmp_path / "clinvar.vcf"
+    with open(clinvar_path, "w") as fh:
+        print("##fileformat=VCFv4.1", file=fh)
+        print('##INFO=<ID=CLNSIG,Number=.,Type=String,Description="Clinical significance">', file=fh)
+        print('##INFO=<ID=ALLELEID,Number=1,Type=Integer,Description="Allele id">', file=fh)
+        print("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO", file=fh)
+        for i, record in enumerate(records[::10]):
+            print(
+                record[0].removeprefix("chr"),
+                *record[1:5],
+                ".",
+                ".",
+                f"ALLELEID={i};CLNSIG=Benign",
+                sep="\t",
+                file=fh,
+            )
+
+    annotations = {}
+    for annotator, info_id, layout in (
+        ("snpeff", "ANN", "Functional annotations: 'Allele | Annotation | Annotation_Impact | Gene_Name | Gene_ID'"),
+        ("vep", "CSQ", "Consequence annotations from Ensembl VEP. Format: Allele|Consequence|IMPACT|SYMBOL|Feature"),
+    ):
+        annotations[annotator] = tmp_path / f"{annotator}.vcf"
+        with open(annotations[annotator], "w") as fh:
+            print(*header, sep="\n", file=fh)
+            print(f'##INFO=<ID={info_id},Number=.,Type=String,Description="{layout}">', file=fh)
+            print("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO", file=fh)
+            for i, record in enumerate(records[::4]):
+                alt = record[4].split(",")[0]
+                info = f"{alt}|intron_variant|MODIFIER|GENE{i}|ID{i}"
+                if i % 2:
+                    info += f",{alt}|stop_gained|HIGH|GENE{i}|ID{i}"
+                print(*record[:7], f"{info_id}={info}", sep="\t", file=fh)
+
+    return {"query": query_path, "label": label_path, "clinvar": clinvar_path, **annotations}
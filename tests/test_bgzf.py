@@ -0,0 +1,125 @@
+"""Tests for the BGZF reader."""
+
+from __future__ import annotations
+
+import gzip
+import shutil
+import typing
+
+import polars
+import pytest
+
+from tests import FIXTURES_DIR
+from vkd import bgzf, reader
+
+if typing.TYPE_CHECKING:
+    import pathlib
+
+
+VCF_PATH = FIXTURES_DIR / "variants.vcf.gz"
+
+
+def test_is_bgzf(tmp_path: pathlib.Path) -> None:
+    """Only BGZF file are detected.
+
+    Parameters:
+        tmp_path: Pytest fixture to get a temporary directory.
+    """
+    gzip_path = tmp_path / "variants.vcf.gz"
+    gzip_path.write_bytes(gzip.compress(gzip.decompress(VCF_PATH.read_bytes())))
+
+    assert bgzf.is_bgzf(VCF_PATH)
+    assert not bgzf.is_bgzf(gzip_path)
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+def test_decompress(threads: int, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Parallel decompression produce same content as gzip.
+
+    Parameters:
+        threads: Number of worker.
+        monkeypatch: Pytest fixture to modify module attribute.
+    """
+    monkeypatch.setattr(bgzf, "BLOCK_BY_TASK", 2)
+
+    assert bgzf.decompress(VCF_PATH, threads) == gzip.decompress(VCF_PATH.read_bytes())
+
+
+def test_gzi(tmp_path: pathlib.Path) -> None:
+    """Block offsets read in gzi index match block header.
+
+    Parameters:
+        tmp_path: Pytest fixture to get a temporary directory.
+    """
+    path = tmp_path / "variants.vcf.gz"
+    shutil.copy(VCF_PATH, path)
+    offsets = bgzf.block_offsets(path)
+
+    shutil.copy(VCF_PATH.with_name(f"{VCF_PATH.name}.gzi"), tmp_path)
+
+    assert len(offsets) > 2
+    assert bgzf.block_offsets(path) == offsets
+
+
+def test_vcf2lazyframe_bgzf() -> None:
+    """Read a BGZF vcf produce same result as polars gzip reader."""
+    lf = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(VCF_PATH, threads=4))
+    raw = polars.read_csv(VCF_PATH, comment_prefix="#", has_header=False, separator="\t")
+
+    assert lf.select(polars.len()).collect().item() == raw.height
+    assert lf.collect().get_column("position").to_list() == raw.get_column("column_2").to_list()
+
+
+@pytest.mark.parametrize("suffix", [".tbi", ".csi"])
+def test_read_chunks(suffix: str) -> None:
+    """Chunks found in index contains all record of region.
+
+    Parameters:
+        suffix: Index file extension.
+    """
+    index = bgzf.read_index(VCF_PATH.with_name(f"{VCF_PATH.name}{suffix}"))
+    assert index.names == ["chr1", "chr2", "chr20"]
+
+    records = [
+        line.split("\t")
+        for line in gzip.decompress(VCF_PATH.read_bytes()).decode().splitlines()
+        if not line.startswith("#")
+    ]
+    expected = [record for record in records if record[0] == "chr2" and 500_000 < int(record[1]) <= 900_000]
+
+    content = bgzf.read_chunks(VCF_PATH, index.chunks("chr2", 500_000, 900_000), threads=2).decode()
+    found = [line.split("\t") for line in content.splitlines()]
+
+    assert len(found) < len(records)
+    assert all(record in found for record in expected)
+    assert index.chunks("chr3", 0, 100) == []
+
+
+def test_iter_chunks(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Large chunks are decompressed by bounded run of blocks, content didn't depend on run size.
+
+    Parameters:
+        monkeypatch: Pytest fixture to modify module attribute.
+    """
+    index = bgzf.read_index(VCF_PATH.with_name(f"{VCF_PATH.name}.tbi"))
+    chunks = index.chunks("chr1", 0, 1 << 29) + index.chunks("chr20", 100_000, 900_000)
+    expected = bgzf.read_chunks(VCF_PATH, chunks, threads=1)
+
+    monkeypatch.setattr(bgzf, "BLOCK_BY_TASK", 1)
+    monkeypatch.setattr(bgzf, "TASK_BY_THREAD", 1)
+    runs = list(bgzf.iter_chunks(VCF_PATH, chunks, threads=2))
+
+    assert len(runs) > len(chunks)
+    assert b"".join(runs) == expected
+
+
+def test_spool_scope() -> None:
+    """Uncompressed vcf spooled in a scope are removed when scope exit."""
+    with reader.spool_scope():
+        lf = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(VCF_PATH))
+        directory = typing.cast("pathlib.Path", reader._spool_scope.get())
+        assert len(list(directory.iterdir())) == 1
+        assert lf.collect().height > 0
+
+    assert not directory.exists()
+    assert reader._spool_scope.get() is None
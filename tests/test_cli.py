@@ -2,10 +2,17 @@
 
 from __future__ import annotations
 
+import json
+import pathlib
+import subprocess
+import sys
+import typing
+
+import polars
 import pytest
 
-from vkd import main
-from vkd._internal import debug
+from vkd import main, reader, writer
+from vkd._internal import cli, commands, debug, resources
 
 
 def test_main() -> None:
@@ -50,3 +57,546 @@ def test_show_debug_info(capsys: pytest.CaptureFixture) -> None:
     assert "system" in captured
     assert "environment" in captured
     assert "packages" in captured
+    assert "resources" in captured
+
+
+def test_threads() -> None:
+    """Polars thread pool of vkd process is sized by --threads."""
+    process = subprocess.run(
+        [sys.executable, "-m", "vkd", "--threads", "3", "--debug-info"],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    assert "`polars thread pool`: `3`" in process.stdout
+
+
+def test_configure(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Jobs are reduce to keep total number of threads under --threads, by default all available cpu.
+
+    Parameters:
+        monkeypatch: Pytest fixture to restore environment variable.
+    """
+    monkeypatch.setenv(resources.POLARS_THREADS_VARIABLE, "1")
+
+    assert resources.configure(4, 2) == (4, 2)
+    assert resources.job_threads(4, 2) == 2
+    assert resources.configure(2, 8) == (2, 2)
+    assert resources.job_threads(3, 2) == 1
+    assert resources.configure(None)[0] == resources.available_cpus()
+    assert cli.get_parser().get_default("threads") is None
+
+
+def test_choices() -> None:
+    """Parser choices match reader literal types, reader isn't imported by parser."""
+    assert set(cli.INFO_MODES) == set(typing.get_args(reader.InfoMode))
+    assert set(cli.SAMPLE_LAYOUTS) == set(typing.get_args(reader.SampleLayout))
+    assert set(cli.COMPRESSIONS) == set(typing.get_args(writer.Compression))
+
+
+@pytest.mark.parametrize(
+    ("value", "region"),
+    [
+        ("chr20", ("chr20", 1, sys.maxsize)),
+        ("chr20:1,000-2,000", ("chr20", 1000, 2000)),
+        ("chr20:1000", ("chr20", 1000, sys.maxsize)),
+    ],
+)
+def test_region(value: str, region: tuple[str, int, int]) -> None:
+    """Parse region argument.
+
+    Parameters:
+        value: Region string.
+        region: Expected region.
+    """
+    assert cli._region(value) == region
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_merge(
+    merge_inputs: dict[str, pathlib.Path],
+    tmp_path: pathlib.Path,
+    jobs: int,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Merge query, label and clinvar in one parquet, dataset are build in worker process if jobs > 1.
+
+    Parameters:
+        merge_inputs: Path of merge input files.
+        tmp_path: Pytest fixture to get a temporary directory.
+        jobs: Number of worker process.
+        monkeypatch: Pytest fixture to check uncompressed vcf are spooled only in a scope.
+    """
+
+    def process_spool() -> pathlib.Path:
+        raise AssertionError("vcf spooled until process exit")
+
+    monkeypatch.setattr(reader, "_spool_dir", process_spool)
+    output_path = tmp_path / "merge.parquet"
+    assert (
+        main(
+            [
+                "merge",
+                "-n",
+                "dataset",
+                "-q",
+                str(merge_inputs["query"]),
+                "-Q",
+                str(merge_inputs["label"]),
+                "-c",
+                str(merge_inputs["clinvar"]),
+                "--clinvar-field",
+                "CLNSIG",
+                "-o",
+                str(output_path),
+                "--jobs",
+                str(jobs),
+            ],
+        )
+        == 0
+    )
+
+    assert [path.name for path in tmp_path.iterdir() if path.name.startswith(".vkd")] == []
+    df = polars.read_parquet(output_path)
+    assert df.height == 4500
+    assert df.get_column("format_bd").null_count() == 0
+    assert df.get_column("clinvar_CLNSIG").drop_nulls().len() == 450
+    assert "clinvar_ALLELEID" not in df.columns
+    assert df.get_column("dataset").unique().to_list() == ["dataset"]
+
+
+def test_merge_layout(merge_inputs: dict[str, pathlib.Path], tmp_path: pathlib.Path) -> None:
+    """Merge output codec is configurable and low cardinality columns could be write as Categorical.
+
+    Parameters:
+        merge_inputs: Path of merge input files.
+        tmp_path: Pytest fixture to get a temporary directory.
+    """
+    args = ["merge", "-n", "dataset", "-q", str(merge_inputs["query"]), "-Q", str(merge_inputs["label"])]
+    assert main([*args, "-o", str(tmp_path / "zstd.parquet")]) == 0
+    assert main([*args, "-o", str(tmp_path / "raw.parquet"), "--compression", "uncompressed"]) == 0
+    assert main([*args, "-o", str(tmp_path / "compact.parquet"), "--compact-dtypes", "--row-group-size", "1000"]) == 0
+
+    assert (tmp_path / "zstd.parquet").stat().st_size < (tmp_path / "raw.parquet").stat().st_size
+    schema = polars.read_parquet_schema(tmp_path / "compact.parquet")
+    assert {name for name, dtype in schema.items() if dtype == polars.Categorical} == {
+        "chr",
+        "dataset",
+        "filter",
+        "format_bd",
+        "format_gt",
+    }
+    assert polars.read_parquet(tmp_path / "compact.parquet").equals(
+        polars.read_parquet(tmp_path / "zstd.parquet").cast(writer.compact_dtypes(schema)),
+    )
+
+    impact = writer.compact(polars.LazyFrame({"vep_impact": ["LOW", "HIGH"], "vep_effect": ["a", "b"]})).collect()
+    assert impact.schema == {"vep_impact": writer.IMPACT, "vep_effect": polars.Categorical()}
+    assert impact.sort("vep_impact").get_column("vep_impact").to_list() == ["HIGH", "LOW"]
+
+
+@pytest.mark.parametrize(
+    ("unsorted", "annotators"),
+    [(False, []), (True, []), (False, ["snpeff"]), (False, ["snpeff", "vep"])],
+)
+def test_merge_sorted(
+    merge_inputs: dict[str, pathlib.Path],
+    tmp_path: pathlib.Path,
+    unsorted: bool,
+    annotators: list[str],
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    """Sorted merge join produce same result as hash join, and fall back to hash join on unsorted input.
+
+    Parameters:
+        merge_inputs: Path of merge input files.
+        tmp_path: Pytest fixture to get a temporary directory.
+        unsorted: Shuffle labeled query.
+        annotators: Annotation joined to dataset.
+        caplog: Pytest fixture to capture log.
+    """
+    if unsorted:
+        lines = merge_inputs["label"].read_text().splitlines()
+        header = [line for line in lines if line.startswith("#")]
+        records = [line for line in lines if not line.startswith("#")]
+        merge_inputs["label"].write_text("\n".join([*header, *records[::-1]]) + "\n")
+
+    args = [
+        "merge",
+        "-n",
+        "dataset",
+        "-q",
+        str(merge_inputs["query"]),
+        "-Q",
+        str(merge_inputs["label"]),
+        "-c",
+        str(merge_inputs["clinvar"]),
+    ]
+    for annotator in annotators:
+        args += [f"--{annotator}-path", str(merge_inputs[annotator])]
+    assert main([*args, "-o", str(tmp_path / "hash.parquet")]) == 0
+    assert main([*args, "-o", str(tmp_path / "sorted.parquet"), "--join", "sorted"]) == 0
+    assert ("fall back to hash join" in caplog.text) == unsorted
+
+    expected = polars.read_parquet(tmp_path / "hash.parquet")
+    result = polars.read_parquet(tmp_path / "sorted.parquet")
+    assert result.columns == expected.columns
+    assert result.sort(result.columns, nulls_last=True).equals(expected.sort(expected.columns, nulls_last=True))
+    assert all(result.get_column(f"{annotator}_gene").drop_nulls().len() > 0 for annotator in annotators)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_merge_profile(merge_inputs: dict[str, pathlib.Path], tmp_path: pathlib.Path, jobs: int) -> None:
+    """Profile report contains each stage of merge and plan of each dataset, stages of worker process included.
+
+    Parameters:
+        merge_inputs: Path of merge input files.
+        tmp_path: Pytest fixture to get a temporary directory.
+        jobs: Number of worker process.
+    """
+    args = ["--threads", str(jobs), "merge", "-n", "dataset", "-q", str(merge_inputs["query"])]
+    args += ["-Q", str(merge_inputs["label"]), "-c", str(merge_inputs["clinvar"]), "--jobs", str(jobs)]
+    assert main([*args, "-o", str(tmp_path / "merge.parquet")]) == 0
+    assert main([*args, "-o", str(tmp_path / "profile.parquet"), "--profile", str(tmp_path / "profile.json")]) == 0
+
+    assert polars.read_parquet(tmp_path / "profile.parquet").equals(polars.read_parquet(tmp_path / "merge.parquet"))
+
+    report = json.loads((tmp_path / "profile.json").read_text())
+    assert "resources" in report["environment"]
+    assert [plan["dataset"] for plan in report["plans"]] == ["dataset"]
+    assert "JOIN" in report["plans"][0]["plan"]
+
+    stages = {stage["name"]: stage for stage in report["stages"]}
+    assert {"decompress", "header parse", "sink", "merge"} <= set(stages)
+    assert stages["sink"]["rows_out"] == 4500
+    # plan is profiled while it is sink, no stage is run separately
+    nodes = [node["node"] for stage in report["stages"] if stage["name"] == "sink" for node in stage["nodes"]]
+    assert any(node.startswith("join") for node in nodes)
+    assert any("sink_parquet" in node for node in nodes)
+    assert all(stage["wall_time"] >= 0 and stage["peak_rss"] > 0 for stage in report["stages"])
+    assert len({stage["pid"] for stage in report["stages"]}) == jobs
+
+
+def test_merge_trace(merge_inputs: dict[str, pathlib.Path], tmp_path: pathlib.Path) -> None:
+    """Trace contains spans of reader functions and merge stages of each process, functions are unchanged without trace.
+
+    Parameters:
+        merge_inputs: Path of merge input files.
+        tmp_path: Pytest fixture to get a temporary directory.
+    """
+    assert not hasattr(reader.vcf2lazyframe, "__wrapped__")
+
+    trace_path = tmp_path / "trace.json"
+    args = ["--threads", "2", "--trace", str(trace_path), "merge", "-n", "dataset", "-q", str(merge_inputs["query"])]
+    args += ["-Q", str(merge_inputs["label"]), "-c", str(merge_inputs["clinvar"]), "--jobs", "2"]
+    args += ["-o", str(tmp_path / "merge.parquet")]
+    subprocess.run([sys.executable, "-m", "vkd", *args], check=True)  # noqa: S603 arguments are build by test
+
+    events = json.loads(f"{trace_path.read_text().rstrip().removesuffix(',')}]")
+    spans = [event for event in events if event["ph"] == "X"]
+    assert {"vcf2lazyframe", "_parse_vcf_header", "decompress", "sink", "merge"} <= {span["name"] for span in spans}
+    assert len({event["pid"] for event in events if event["ph"] == "M"}) == 2
+
+    merge_span = next(span for span in spans if span["name"] == "merge")
+    assert all(
+        merge_span["ts"] <= span["ts"] and span["ts"] + span["dur"] <= merge_span["ts"] + merge_span["dur"]
+        for span in spans
+        if span["pid"] == merge_span["pid"] and span["name"] == "sink"
+    )
+
+
+@pytest.mark.parametrize(("value", "size"), [("4G", 4 << 30), ("100mib", 100 << 20), ("512k", 512 << 10), ("10", 10)])
+def test_memory_size(value: str, size: int) -> None:
+    """Parse memory size argument.
+
+    Parameters:
+        value: Memory size string.
+        size: Expected number of bytes.
+    """
+    assert cli._memory_size(value) == size
+
+
+def test_merge_memory_limit(
+    merge_inputs: dict[str, pathlib.Path],
+    tmp_path: pathlib.Path,
+    capfd: pytest.CaptureFixture[str],
+) -> None:
+    """Merge under a memory limit produce same result as default merge, and fail clearly on unsorted input.
+
+    Parameters:
+        merge_inputs: Path of merge input files.
+        tmp_path: Pytest fixture to get a temporary directory.
+        capfd: Pytest fixture to capture output of child process.
+    """
+    args = ["merge", "-n", "dataset", "-q", str(merge_inputs["query"]), "-Q", str(merge_inputs["label"])]
+    assert main([*args, "-o", str(tmp_path / "default.parquet")]) == 0
+    assert main([*args, "-o", str(tmp_path / "limited.parquet"), "--memory-limit", "4G"]) == 0
+
+    expected = polars.read_parquet(tmp_path / "default.parquet")
+    result = polars.read_parquet(tmp_path / "limited.parquet")
+    assert result.sort(result.columns).equals(expected.sort(expected.columns).select(result.columns))
+
+    # annotations are read and joined by batch
+    annotated_args = [*args, "-s", str(merge_inputs["snpeff"]), "--vep-path", str(merge_inputs["vep"])]
+    assert main([*annotated_args, "-o", str(tmp_path / "annotated.parquet")]) == 0
+    assert main([*annotated_args, "-o", str(tmp_path / "annotated_limited.parquet"), "--memory-limit", "4G"]) == 0
+
+    annotated = polars.read_parquet(tmp_path / "annotated.parquet")
+    limited = polars.read_parquet(tmp_path / "annotated_limited.parquet")
+    assert {"snpeff_gene", "vep_gene"} <= set(limited.columns)
+    assert limited.sort(limited.columns, nulls_last=True).equals(
+        annotated.sort(annotated.columns, nulls_last=True).select(limited.columns),
+    )
+
+    # each chromosome is sink once and split by dataset
+    two = [
+        "merge",
+        "-n",
+        "first",
+        "second",
+        "-q",
+        *[str(merge_inputs["query"])] * 2,
+        "-Q",
+        *[str(merge_inputs["label"])] * 2,
+    ]
+    store = tmp_path / "store"
+    assert main([*two, "-o", str(store), "--partition", "--partition-dataset", "--memory-limit", "4G"]) == 0
+    assert sorted(path.name for path in (store / "chr1").iterdir()) == ["first.parquet", "second.parquet"]
+    assert polars.read_parquet(store / "*" / "first.parquet").height == expected.height
+
+    lines = merge_inputs["label"].read_text().splitlines()
+    records = [line for line in lines if not line.startswith("#")]
+    merge_inputs["label"].write_text("\n".join([*(line for line in lines if line.startswith("#")), *records[::-1]]))
+
+    assert main([*args, "-o", str(tmp_path / "unsorted.parquet"), "--memory-limit", "4G"]) == 1
+    assert "--memory-limit require coordinate sorted input" in capfd.readouterr().err
+
+
+def test_in_memory_nodes(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Nodes that fall back to in-memory engine are found, an unknown graph format raise.
+
+    Parameters:
+        tmp_path: Pytest fixture to get a temporary directory.
+        monkeypatch: Pytest fixture to replace polars graph.
+    """
+    polars.DataFrame({"chr": ["chr1", "chr2"], "position": [1, 2]}).write_parquet(tmp_path / "data.parquet")
+    lf = polars.scan_parquet(tmp_path / "data.parquet")
+
+    assert commands._in_memory_nodes(lf.sort("position")) == []
+    assert commands._in_memory_nodes(lf.map_batches(lambda df: df, streamable=False)) != []
+
+    monkeypatch.setattr(polars.LazyFrame, "show_graph", lambda *_args, **_kwargs: "digraph polars {}")
+    with pytest.raises(commands.StreamingError, match="graph format isn't recognized"):
+        commands._in_memory_nodes(lf)
+
+
+@pytest.mark.parametrize("partition_dataset", [False, True])
+def test_merge_partition(
+    merge_inputs: dict[str, pathlib.Path],
+    tmp_path: pathlib.Path,
+    partition_dataset: bool,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Merge write one parquet by chromosome, and by dataset, input without index are read once.
+
+    Parameters:
+        merge_inputs: Path of merge input files.
+        tmp_path: Pytest fixture to get a temporary directory.
+        partition_dataset: Split chromosome by dataset.
+        monkeypatch: Pytest fixture to count vcf read.
+    """
+    reads: list[pathlib.Path] = []
+    vcf2lazyframe = reader.vcf2lazyframe
+    monkeypatch.setattr(
+        reader,
+        "vcf2lazyframe",
+        lambda path, **kwargs: reads.append(path) or vcf2lazyframe(path, **kwargs),
+    )
+
+    output_path = tmp_path / "merge"
+    args = [
+        "--threads",
+        "2",
+        "merge",
+        "-n",
+        "first",
+        "second",
+        "-q",
+        str(merge_inputs["query"]),
+        str(merge_inputs["query"]),
+        "-Q",
+        str(merge_inputs["label"]),
+        str(merge_inputs["label"]),
+        "-c",
+        str(merge_inputs["clinvar"]),
+        "-o",
+        str(output_path),
+        "--partition",
+    ]
+    assert main([*args, "--partition-dataset"] if partition_dataset else args) == 0
+
+    assert reads.count(merge_inputs["label"]) == 2
+    assert reads.count(merge_inputs["clinvar"]) == 1
+    if partition_dataset:
+        assert sorted(path.name for path in (output_path / "chr2").iterdir()) == ["first.parquet", "second.parquet"]
+    assert sorted(path.stem for path in output_path.iterdir() if path.name != writer.MANIFEST_NAME) == [
+        "chr1",
+        "chr2",
+        "chr20",
+    ]
+
+    paths = list(output_path.glob("*/*.parquet" if partition_dataset else "*.parquet"))
+    assert all(polars.read_parquet(path).get_column("position").is_sorted() for path in paths)
+
+    manifest = json.loads((output_path / writer.MANIFEST_NAME).read_text())
+    assert manifest["chromosomes"] == ["chr1", "chr2", "chr20"]
+    assert manifest["datasets"] == ["first", "second"]
+    assert sum(partition["rows"] for partition in manifest["partitions"]) == 9000
+    assert manifest["labels"]["format_bd"] == ["FP", "TP"]
+    assert "format_dp" in manifest["ranges"]
+
+    df = polars.read_parquet(output_path / "**/*.parquet" if partition_dataset else output_path / "*.parquet")
+    assert df.height == 9000
+    assert df.get_column("format_bd").null_count() == 0
+    assert df.get_column("clinvar_CLNSIG").drop_nulls().len() == 900
+
+
+def test_merge_append(
+    merge_inputs: dict[str, pathlib.Path],
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Append a dataset to a partitioned store without rewrite existing file, a failed append can be retried.
+
+    Parameters:
+        merge_inputs: Path of merge input files.
+        tmp_path: Pytest fixture to get a temporary directory.
+        monkeypatch: Pytest fixture to make merge of a chromosome fail.
+    """
+    store = tmp_path / "store"
+    common = ["-Q", str(merge_inputs["label"]), "-c", str(merge_inputs["clinvar"])]
+    first_args = ["merge", "-n", "first", "-q", str(merge_inputs["query"]), *common, "-o", str(store)]
+    assert main([*first_args, "--partition", "--partition-dataset"]) == 0
+    before = {path: path.read_bytes() for path in store.glob("*/*.parquet")}
+
+    # labeled query has only GT and BD format field
+    append = ["merge", "-n", "second", "-q", str(merge_inputs["label"]), *common, "--append", str(store)]
+
+    merge_chromosome = commands._merge_chromosome
+
+    def failing_chromosome(*args: typing.Any, **kwargs: typing.Any) -> None:
+        merge_chromosome(*args, **kwargs)
+        if args[2] == "chr20":
+            raise RuntimeError(args[2])
+
+    with monkeypatch.context() as patch:
+        patch.setattr(commands, "_merge_chromosome", failing_chromosome)
+        with pytest.raises(RuntimeError, match="chr20"):
+            main(append)
+    assert sorted(store.glob("*/*.parquet")) == sorted(before)
+
+    assert main(append) == 0
+    assert main(append) == 1
+
+    assert all(path.read_bytes() == content for path, content in before.items())
+    first = polars.read_parquet_schema(store / "chr1" / "first.parquet")
+    second = polars.read_parquet_schema(store / "chr1" / "second.parquet")
+    assert set(first) <= set(second)
+    assert second["format_dp"] == first["format_dp"]
+
+    df = polars.concat(
+        [polars.read_parquet(path) for path in store.glob("*/*.parquet")],
+        how="diagonal_relaxed",
+    )
+    assert df.group_by("dataset").len().sort("dataset").get_column("len").to_list() == [4500, 4500]
+
+    manifest = writer.read_manifest(store)
+    assert manifest is not None
+    assert manifest["datasets"] == ["first", "second"]
+    assert sum(partition["rows"] for partition in manifest["partitions"]) == 9000
+    assert manifest == writer.write_manifest(store)
+
+
+def test_merge_normalize(tmp_path: pathlib.Path) -> None:
+    """Variants write differently in query and labeled query are join after split and left-alignment.
+
+    Parameters:
+        tmp_path: Pytest fixture to get a temporary directory.
+    """
+    reference_path = tmp_path / "reference.fa"
+    reference_path.write_text(">chr1\nACGTCACACAGGTTTTTAAAA\n")
+    (tmp_path / "reference.fa.fai").write_text("chr1\t21\t6\t21\t22\n")
+
+    header = '##fileformat=VCFv4.2\n##contig=<ID=chr1>\n##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">\n'
+    columns = "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tsample\n"
+    query_path = tmp_path / "query.vcf"
+    query_path.write_text(header + columns + "chr1\t8\t.\tACA\tA,ACACA\t.\t.\t.\tGT\t1/2\n")
+    label_path = tmp_path / "label.vcf"
+    label_path.write_text(
+        header
+        + '##FORMAT=<ID=BD,Number=1,Type=String,Description="Benchmark decision">\n'
+        + columns
+        + "chr1\t4\t.\tT\tTCA\t.\t.\t.\tGT:BD\t0/1:TP\nchr1\t4\t.\tTCA\tT\t.\t.\t.\tGT:BD\t1/0:FP\n",
+    )
+
+    args = ["merge", "-n", "dataset", "-q", str(query_path), "-Q", str(label_path)]
+    assert main([*args, "-o", str(tmp_path / "raw.parquet")]) == 0
+    assert polars.read_parquet(tmp_path / "raw.parquet").get_column("format_bd").to_list() == [None]
+
+    for join_algorithm in ("hash", "sorted"):
+        output_path = tmp_path / f"{join_algorithm}.parquet"
+        assert main([*args, "-o", str(output_path), "--reference", str(reference_path), "--join", join_algorithm]) == 0
+        df = polars.read_parquet(output_path).sort("alt")
+        assert df.select("position", "ref", "alt", "format_gt", "format_bd").rows() == [
+            (4, "TCA", "T", "1/0", "FP"),
+            (4, "T", "TCA", "0/1", "TP"),
+        ]
+
+
+def test_index_clinvar(
+    merge_inputs: dict[str, pathlib.Path],
+    tmp_path: pathlib.Path,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Merge with a clinvar index produce same result as merge with clinvar vcf.
+
+    Parameters:
+        merge_inputs: Path of merge input files.
+        tmp_path: Pytest fixture to get a temporary directory.
+        capsys: Pytest fixture to capture output.
+    """
+    clinvar = ["-c", str(merge_inputs["clinvar"]), "--clinvar-field", "CLNSIG", "--cache-dir", str(tmp_path)]
+    args = ["merge", "-n", "dataset", "-q", str(merge_inputs["query"]), "-Q", str(merge_inputs["label"]), *clinvar]
+    assert main([*args, "-o", str(tmp_path / "vcf.parquet")]) == 0
+
+    assert main(["index-clinvar", *clinvar]) == 0
+    index_path = pathlib.Path(capsys.readouterr().out.strip())
+    index = polars.read_parquet(index_path)
+    assert index.columns == ["chr", "position", "ref", "variant_key", "variant_alleles", "clinvar_CLNSIG"]
+    assert index.get_column("chr").str.starts_with("chr").all()
+    assert index.select("chr", "position").equals(index.select("chr", "position").sort("chr", "position"))
+
+    expected = polars.read_parquet(tmp_path / "vcf.parquet")
+    for extra in ([], ["--join", "sorted"], ["--memory-limit", "4G"]):
+        assert main([*args, "-o", str(tmp_path / "index.parquet"), *extra]) == 0
+        result = polars.read_parquet(tmp_path / "index.parquet")
+        assert result.sort(result.columns).equals(expected.sort(expected.columns).select(result.columns))
+
+
+def test_convert(
+    merge_inputs: dict[str, pathlib.Path],
+    tmp_path: pathlib.Path,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Convert vcf in parquet cache.
+
+    Parameters:
+        merge_inputs: Path to merge input vcf.
+        tmp_path: Pytest fixture to get a temporary directory.
+        capsys: Pytest fixture to capture output.
+    """
+    assert main(["convert", "-i", str(merge_inputs["query"]), "--cache-dir", str(tmp_path)]) == 0
+    cache_path = pathlib.Path(capsys.readouterr().out.strip())
+
+    assert cache_path.parent == tmp_path
+    assert polars.read_parquet(cache_path).height == 4500
@@ -0,0 +1,146 @@
+"""Tests for the sorted merge join."""
+
+from __future__ import annotations
+
+import hashlib
+import typing
+
+import polars
+import pytest
+
+from tests import FIXTURES_DIR
+from vkd import join, reader
+
+if typing.TYPE_CHECKING:
+    import pathlib
+
+
+VCF_PATH = FIXTURES_DIR / "variants.vcf.gz"
+
+
+def test_chromosome_order(tmp_path: pathlib.Path) -> None:
+    """Chromosome order is read in index or in contig header.
+
+    Parameters:
+        tmp_path: Pytest fixture to get a temporary directory.
+    """
+    assert join.chromosome_order(VCF_PATH) == ["chr1", "chr2", "chr20"]
+
+    path = tmp_path / "variants.vcf"
+    path.write_text("##fileformat=VCFv4.2\n##contig=<ID=chr2,length=10>\n##contig=<ID=chr1>\n#CHROM\n")
+    assert join.chromosome_order(path) == ["chr2", "chr1"]
+
+    path.write_text("##fileformat=VCFv4.2\n##contig=<ID=1>\n##contig=<ID=MT>\n##contig=<ID=HLA-A>\n#CHROM\n")
+    assert join.chromosome_order(path) == ["chr1", "chrM", "HLA-A"]
+
+    path.write_text("##fileformat=VCFv4.2\n#CHROM\n")
+    assert join.chromosome_order(path) is None
+
+
+@pytest.mark.parametrize(("left_size", "right_size"), [(700, 333), (100, 4_000)])
+def test_sorted_join(left_size: int, right_size: int) -> None:
+    """Sorted merge join produce same result as hash join whatever batch size.
+
+    Parameters:
+        left_size: Number of record in left batch.
+        right_size: Number of record in right batch.
+    """
+    right = (
+        batch.with_columns(value=polars.col("position") * 2).filter(polars.col("position") % 3 != 0)
+        for batch in reader.iter_vcf_batches(VCF_PATH, right_size, columns=join.KEY_COLUMNS)
+    )
+    joined = polars.concat(
+        join.sorted_join(
+            reader.iter_vcf_batches(VCF_PATH, left_size, columns=[*join.KEY_COLUMNS, "info_DP"]),
+            right,
+            ["chr1", "chr2", "chr20"],
+        ),
+    )
+
+    left = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(VCF_PATH, columns=[*join.KEY_COLUMNS, "info_DP"]))
+    expected = left.join(
+        left.select(join.KEY_COLUMNS)
+        .unique()
+        .with_columns(value=polars.col("position") * 2)
+        .filter(polars.col("position") % 3 != 0),
+        on=join.KEY_COLUMNS,
+        how="left",
+        maintain_order="left",
+    ).collect()
+
+    assert joined.equals(expected)
+
+
+def test_unsorted() -> None:
+    """Unsorted input or unknown chromosome raise UnsortedError."""
+    batches = list(reader.iter_vcf_batches(VCF_PATH, 1_000, columns=join.KEY_COLUMNS))
+
+    with pytest.raises(join.UnsortedError, match="right"):
+        list(join.sorted_join(batches, reversed(batches), ["chr1", "chr2", "chr20"]))
+
+    with pytest.raises(join.UnsortedError, match="chr20"):
+        list(join.sorted_join(batches, batches, ["chr1", "chr2"]))
+
+
+def test_variant_key_hash_only_inexact(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Exact variant never reach python hash, hash of other variant are scatter back on their rows.
+
+    Parameters:
+        monkeypatch: Pytest fixture to record identity hashed.
+    """
+    hash_identity = join._hash_identity
+    hashed = []
+
+    def record(value: str) -> int:
+        hashed.append(value)
+        return hash_identity(value)
+
+    df = polars.DataFrame(
+        {
+            "chr": ["chr1", "chrUn_x", "chr1", "chr2", "chrUn_y"],
+            "position": [100, 10, 101, 7, 12],
+            "ref": ["A", "A", "C", "NNN", "G"],
+            "alt": ["G", "T", "T", "A", "C"],
+        },
+    )
+    expected = df.with_columns(join.variant_key())
+
+    monkeypatch.setattr(join, "_hash_identity", record)
+    keys = df.with_columns(join.variant_key())
+
+    assert hashed == ["chrUn_x:10:A>T", "chr2:7:NNN>A", "chrUn_y:12:G>C"]
+    assert keys.equals(expected)
+    assert (keys.get_column("variant_key") // (1 << 63)).to_list() == [0, 1, 0, 1, 1]
+
+
+def test_variant_key() -> None:
+    """Variant key is exact for short alleles, follow coordinate order and identify variant like the four columns."""
+    df = polars.DataFrame(
+        {
+            "chr": ["chr1", "1", "chr1", "chr2", "chrUn_x", "chr2", "chr2"],
+            "position": [100, 100, 100, 7, 10, 1 << 28, 8],
+            "ref": ["A", "A", "A", "A", "A", "A", "ACGTACGTACGT"],
+            "alt": ["G", "G", "GT", "C", "T", "G", "A"],
+        },
+    ).with_columns(join.variant_key())
+
+    assert df.get_column("variant_alleles").to_list() == [
+        "",
+        "",
+        "",
+        "",
+        "chrUn_x:10:A>T",
+        f"chr2:{1 << 28}:A>G",
+        "chr2:8:ACGTACGTACGT>A",
+    ]
+    # hash didn't depend on polars version, keys write in a store stay valid
+    assert df.get_column("variant_key")[4] == (1 << 63) + (10 << 28) + int.from_bytes(
+        hashlib.blake2b(b"chrUn_x:10:A>T", digest_size=8).digest(),
+    ) % (1 << 28)
+    assert df.get_column("variant_key").to_list()[:2] == [(1 << 56) + (100 << 28) + int("103", 5)] * 2
+    assert df.get_column("variant_key")[:4].is_sorted()
+    assert (df.get_column("variant_key")[4:] // (1 << 63)).to_list() == [1, 1, 1]
+
+    variants = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(VCF_PATH, columns=join.KEY_COLUMNS)).collect()
+    keys = variants.with_columns(join.variant_key())
+    assert keys.select(join.VARIANT_KEY_COLUMNS).n_unique() == variants.n_unique()
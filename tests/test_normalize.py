@@ -0,0 +1,192 @@
+"""Tests for the variant normalization."""
+
+from __future__ import annotations
+
+import typing
+
+import polars
+import pytest
+
+from vkd import join, normalize, reader
+
+if typing.TYPE_CHECKING:
+    import pathlib
+
+
+SEQUENCE = "ACGTCACACAGGTTTTTA" + "G" + "C" * 100 + "T"
+
+
+@pytest.fixture
+def reference_path(tmp_path: pathlib.Path) -> pathlib.Path:
+    """Write a reference fasta with a wrap sequence and its fasta index.
+
+    Parameters:
+        tmp_path: Pytest fixture to get a temporary directory.
+    """
+    path = tmp_path / "reference.fa"
+    lines = [SEQUENCE[i : i + 7] for i in range(0, len(SEQUENCE), 7)]
+    path.write_text(">1 description\n" + "\n".join(lines) + "\n>2\nACGT\n")
+    (tmp_path / "reference.fa.fai").write_text(
+        f"1\t{len(SEQUENCE)}\t15\t7\t8\n2\t4\t{15 + len(SEQUENCE) + len(lines) + 3}\t4\t5\n",
+    )
+
+    return path
+
+
+def test_reference(reference_path: pathlib.Path) -> None:
+    """Sequences are read across line, clamp to contig and null on unknown contig.
+
+    Parameters:
+        reference_path: Path to reference fasta.
+    """
+    reference = normalize.Reference(reference_path)
+
+    assert reference.sequences(
+        polars.Series(["chr1", "chr1", "chr2", "chrX"]),
+        polars.Series([0, 5, -3, 0]),
+        polars.Series([18, 12, 10, 3]),
+    ).to_list() == ["ACGTCACACAGGTTTTTA", "ACACAGG", "ACGT", None]
+
+    (reference_path.parent / "reference.fa.fai").unlink()
+    with pytest.raises(FileNotFoundError, match="samtools faidx"):
+        normalize.Reference(reference_path)
+
+
+@pytest.mark.parametrize(
+    ("variant", "expected"),
+    [
+        (("chr1", 8, "ACA", "A"), ("chr1", 4, "TCA", "T")),
+        (("chr1", 17, "T", "TT"), ("chr1", 12, "G", "GT")),
+        (("chr1", 10, "AG", "G"), ("chr1", 9, "CA", "C")),
+        (("chr1", 5, "CA", "CT"), ("chr1", 6, "A", "T")),
+        (("chr1", 3, "G", "T"), ("chr1", 3, "G", "T")),
+        (("chr1", 118, "CC", "C"), ("chr1", 19, "GC", "G")),
+        (("chr1", 3, "G", "<DEL>"), ("chr1", 3, "G", "<DEL>")),
+        (("chrX", 5, "CA", "C"), ("chrX", 5, "CA", "C")),
+    ],
+)
+def test_left_align(
+    reference_path: pathlib.Path,
+    variant: tuple[str, int, str, str],
+    expected: tuple[str, int, str, str],
+) -> None:
+    """Indel are trimmed and shift to their leftmost position, even beyond one reference window.
+
+    Parameters:
+        reference_path: Path to reference fasta.
+        variant: chr, position, ref and alt of variant.
+        expected: Aligned variant.
+    """
+    df = polars.DataFrame([variant], schema=["chr", "position", "ref", "alt"], orient="row")
+
+    aligned = normalize.left_align(df, normalize.Reference(reference_path))
+
+    assert aligned.row(0) == expected
+
+
+VCF = """##fileformat=VCFv4.2
+##INFO=<ID=AF,Number=A,Type=Float,Description="Allele frequency">
+##INFO=<ID=DP,Number=1,Type=Integer,Description="Depth">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+##FORMAT=<ID=AD,Number=R,Type=Integer,Description="Allele depth">
+##FORMAT=<ID=PL,Number=G,Type=Integer,Description="Genotype likelihoods">
+#CHROM	POS	ID	REF	ALT	QUAL	FILTER	INFO	FORMAT	sample
+1	8	.	ACA	A,ACACA	.	.	AF=0.1,0.2;DP=3	GT:AD:PL	1/2:1,2,3:0,1,2,3,4,5
+1	17	.	T	TT	.	.	AF=0.5;DP=4	GT:AD:PL	0|1:1,2:0,1,2
+"""
+
+
+@pytest.mark.parametrize("sample_layout", ["wide", "long"])
+def test_split_multiallelic(
+    reference_path: pathlib.Path,
+    tmp_path: pathlib.Path,
+    sample_layout: reader.SampleLayout,
+) -> None:
+    """Multi-allelic records are split, Number=A/R/G lists and genotype keep value of each allele.
+
+    Parameters:
+        reference_path: Path to reference fasta.
+        tmp_path: Pytest fixture to get a temporary directory.
+        sample_layout: How sample are store.
+    """
+    path = tmp_path / "variants.vcf"
+    path.write_text(VCF)
+
+    df = typing.cast(
+        "polars.LazyFrame",
+        reader.vcf2lazyframe(path, sample_layout=sample_layout, split_multiallelic=True),
+    ).collect()
+    assert df.get_column("alt").to_list() == ["A", "ACACA", "TT"]
+    assert df.get_column("info_AF").to_list() == [[0.1], [0.2], [0.5]]
+    assert df.get_column("info_DP").to_list() == [3, 3, 4]
+    assert df.get_column("format_ad").to_list() == [[1, 2], [1, 3], [1, 2]]
+    assert df.get_column("format_pl").to_list() == [[0, 1, 2], [0, 3, 5], [0, 1, 2]]
+    gt = [[1, 0], [0, 1], [0, 1]] if sample_layout == "long" else ["1/0", "0/1", "0|1"]
+    assert df.get_column("format_gt").to_list() == gt
+
+    aligned = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(path, reference=reference_path)).collect()
+    assert aligned.select("position", "ref", "alt").rows() == [(4, "TCA", "T"), (4, "T", "TCA"), (12, "G", "GT")]
+
+    batches = reader.iter_vcf_batches(path, batch_size=1, reference=reference_path)
+    assert polars.concat(batches).equals(aligned)
+
+
+def test_aligned_batches(reference_path: pathlib.Path, tmp_path: pathlib.Path) -> None:
+    """An indel aligned before end of previous batch is release in order, batches can be sorted join.
+
+    Parameters:
+        reference_path: Path to reference fasta.
+        tmp_path: Pytest fixture to get a temporary directory.
+    """
+    path = tmp_path / "variants.vcf"
+    path.write_text(
+        "\n".join(VCF.splitlines()[:4])
+        + "\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+        + "1\t6\t.\tA\tG\t.\t.\t.\n1\t8\t.\tACA\tA\t.\t.\t.\n2\t2\t.\tC\tT\t.\t.\t.\n",
+    )
+
+    batches = list(reader.iter_vcf_batches(path, batch_size=1, with_genotype=False, reference=reference_path))
+
+    assert polars.concat(batches).select("chr", "position").rows() == [("chr1", 4), ("chr1", 6), ("chr2", 2)]
+    assert "_origin" not in batches[0].columns
+    joined = join.sorted_join(
+        (batch.with_columns(join.variant_key()) for batch in batches),
+        (batch.with_columns(join.variant_key()).drop("ref", "alt") for batch in batches),
+        ["chr1", "chr2"],
+        join.VARIANT_KEY_COLUMNS,
+    )
+    assert sum(batch.height for batch in joined) == 3
+
+
+def test_aligned_batches_repeat(tmp_path: pathlib.Path) -> None:
+    """An indel at end of a long homopolymer aligned before previous batches is release in order.
+
+    Parameters:
+        tmp_path: Pytest fixture to get a temporary directory.
+    """
+    sequence = "G" * 40 + "A" * 200 + "C" * 60
+    reference_path = tmp_path / "repeat.fa"
+    reference_path.write_text(f">1\n{sequence}\n")
+    (tmp_path / "repeat.fa.fai").write_text(f"1\t{len(sequence)}\t3\t{len(sequence)}\t{len(sequence) + 1}\n")
+
+    path = tmp_path / "variants.vcf"
+    path.write_text(
+        "##fileformat=VCFv4.2\n##contig=<ID=1>\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+        "1\t100\t.\tA\tT\t.\t.\t.\n1\t200\t.\tA\tC\t.\t.\t.\n1\t239\t.\tAA\tA\t.\t.\t.\n1\t280\t.\tC\tG\t.\t.\t.\n",
+    )
+
+    reference = normalize.Reference(reference_path)
+    assert normalize.repeat_start(reference, "chr1", 200) == 41
+    assert normalize.repeat_start(reference, "chr1", 30) == 1
+    assert normalize.repeat_start(reference, "chrX", 30) == 30
+
+    batches = list(reader.iter_vcf_batches(path, batch_size=2, with_genotype=False, reference=reference_path))
+
+    assert polars.concat(batches).get_column("position").to_list() == [40, 100, 200, 280]
+    joined = join.sorted_join(
+        (batch.with_columns(join.variant_key()) for batch in batches),
+        (batch.with_columns(join.variant_key()).drop("ref", "alt") for batch in batches),
+        ["chr1"],
+        join.VARIANT_KEY_COLUMNS,
+    )
+    assert sum(batch.height for batch in joined) == 4
@@ -0,0 +1,321 @@
+"""Tests for the reader."""
+
+from __future__ import annotations
+
+import typing
+
+import polars
+import pytest
+
+from tests import FIXTURES_DIR
+from vkd import clinvar, reader
+
+if typing.TYPE_CHECKING:
+    import pathlib
+
+
+VCF = """##fileformat=VCFv4.2
+##INFO=<ID=DP,Number=1,Type=Integer,Description="Depth">
+##INFO=<ID=AF,Number=A,Type=Float,Description="Allele frequency">
+##INFO=<ID=MAF,Number=1,Type=Float,Description="Minor allele frequency">
+##INFO=<ID=DB,Number=0,Type=Flag,Description="dbSNP membership">
+##INFO=<ID=NAME,Number=1,Type=String,Description="Name">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Depth">
+##FORMAT=<ID=GQ,Number=1,Type=Float,Description="Genotype quality">
+##FORMAT=<ID=AD,Number=R,Type=Integer,Description="Allele depth">
+##FORMAT=<ID=BD,Number=1,Type=String,Description="Benchmark decision">
+#CHROM	POS	ID	REF	ALT	QUAL	FILTER	INFO	FORMAT	sample
+chr1	10	.	A	G	50	PASS	DP=10;MAF=0.2;AF=0.5;DB;NAME=x	GT:DP:GQ:AD:BD	0/1:10:30.5:5,5:TP
+chr1	20	.	AT	A,T	.	PASS	DP=3;AF=0.1,0.2	GT:AD:DP	1/2:1,1,1:3
+chr2	5	.	C	T	10	.	.	GT	./.
+"""
+
+
+@pytest.fixture
+def vcf_path(tmp_path: pathlib.Path) -> pathlib.Path:
+    """Write a small vcf in a temporary directory.
+
+    Parameters:
+        tmp_path: Pytest fixture to get a temporary directory.
+    """
+    path = tmp_path / "variants.vcf"
+    path.write_text(VCF)
+    return path
+
+
+def test_info_mode(vcf_path: pathlib.Path) -> None:
+    """Regex and tokenize INFO decoding produce same columns.
+
+    Parameters:
+        vcf_path: Path to a small vcf.
+    """
+    regex = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(vcf_path, with_genotype=False)).collect()
+    tokenize = typing.cast(
+        "polars.LazyFrame",
+        reader.vcf2lazyframe(vcf_path, with_genotype=False, info_mode="tokenize"),
+    ).collect()
+
+    assert regex.equals(tokenize)
+    assert tokenize.get_column("info_DP").to_list() == [10, 3, None]
+    assert tokenize.get_column("info_AF").to_list() == [[0.5], [0.1, 0.2], None]
+    assert tokenize.get_column("info_MAF").to_list() == [0.2, None, None]
+    assert tokenize.get_column("info_NAME").to_list() == ["x", None, None]
+
+
+def test_format(vcf_path: pathlib.Path) -> None:
+    """Each format field is extracted and typed whatever the format string, in input order.
+
+    Parameters:
+        vcf_path: Path to a small vcf.
+    """
+    df = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(vcf_path)).collect()
+
+    assert df.get_column("format_gt").to_list() == ["0/1", "1/2", "./."]
+    assert df.get_column("format_dp").to_list() == [10, 3, None]
+    assert df.get_column("format_gq").to_list() == [30.5, None, None]
+    assert df.get_column("format_ad").to_list() == [[5, 5], [1, 1, 1], None]
+    assert df.get_column("format_bd").to_list() == ["TP", None, None]
+
+
+def test_format_sample(vcf_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Format fields are found in records after the sample used to discover format string, sampled ones are kept.
+
+    Parameters:
+        vcf_path: Path to a small vcf.
+        monkeypatch: Pytest fixture to modify module attribute.
+    """
+    assert reader._sample_format_pos(vcf_path)[1]
+    exhaustive = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(vcf_path)).collect()
+
+    monkeypatch.setattr(reader, "FORMAT_SAMPLE_SIZE", 1)
+    assert reader._sample_format_pos(vcf_path) == (
+        {"GT:DP:GQ:AD:BD": {"GT": 0, "DP": 1, "GQ": 2, "AD": 3, "BD": 4}},
+        False,
+    )
+    sampled = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(vcf_path)).collect()
+
+    assert exhaustive.equals(sampled)
+
+
+def test_regions() -> None:
+    """Reading regions with index produce same record as a filter on all record."""
+    path = FIXTURES_DIR / "variants.vcf.gz"
+    regions = [("chr1", 1, 100_000), ("chr20", 1_000, 500_000), ("chr1", 50_000, 200_000)]
+
+    full = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(path)).collect()
+    subset = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(path, regions=regions)).collect()
+
+    expected = full.filter(
+        ((polars.col("chr") == "chr1") & (polars.col("position") <= 200_000))
+        | ((polars.col("chr") == "chr20") & polars.col("position").is_between(1_000, 500_000)),
+    )
+    assert subset.height > 0
+    assert subset.equals(expected)
+    assert reader.vcf2lazyframe(path, regions=[("chr3", 1, 100)]) is None
+    assert (
+        typing.cast("polars.LazyFrame", reader.vcf2lazyframe(path, regions=[("1", 1, 100_000)]))
+        .collect()
+        .equals(
+            full.filter((polars.col("chr") == "chr1") & (polars.col("position") <= 100_000)),
+        )
+    )
+
+
+def test_contig_alias(tmp_path: pathlib.Path) -> None:
+    """Contig alias are rename in normalized name, other contig keep their name.
+
+    Parameters:
+        tmp_path: Pytest fixture to get a temporary directory.
+    """
+    path = tmp_path / "alias.vcf"
+    path.write_text(
+        "##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+        + "".join(f"{name}\t10\t.\tA\tG\t.\t.\t.\n" for name in ["1", "chr2", "X", "MT", "chrMT", "HLA-A"]),
+    )
+    expected = ["chr1", "chr2", "chrX", "chrM", "chrM", "HLA-A"]
+
+    lf = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(path, with_genotype=False))
+    assert lf.collect().get_column("chr").to_list() == expected
+    batches = reader.iter_vcf_batches(path, batch_size=2, with_genotype=False)
+    assert [name for batch in batches for name in batch.get_column("chr")] == expected
+
+    subset = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(path, with_genotype=False, regions=[("M", 1, 20)]))
+    assert subset.collect().height == 2
+
+
+MULTI_SAMPLE_VCF = """##fileformat=VCFv4.2
+##INFO=<ID=DP,Number=1,Type=Integer,Description="Depth">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Depth">
+##FORMAT=<ID=AD,Number=R,Type=Integer,Description="Allele depth">
+#CHROM	POS	ID	REF	ALT	QUAL	FILTER	INFO	FORMAT	mother	father	child
+chr1	10	.	A	G	50	PASS	DP=10	GT:DP:AD	0/1:10:5,5	1|1:8:0,8	./.
+chr1	20	.	AT	A,T	.	PASS	DP=3	GT:AD	1/2:1,1,1	0/0:3,0,0	0|2:1,0,1
+"""
+
+
+def test_multi_sample(tmp_path: pathlib.Path) -> None:
+    """Multi-sample vcf are read in wide or long layout.
+
+    Parameters:
+        tmp_path: Pytest fixture to get a temporary directory.
+    """
+    path = tmp_path / "cohort.vcf"
+    path.write_text(MULTI_SAMPLE_VCF)
+
+    wide = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(path)).collect()
+    assert wide.height == 2
+    assert wide.get_column("father_format_dp").to_list() == [8, None]
+    assert wide.get_column("child_format_ad").to_list() == [None, [1, 0, 1]]
+
+    selected = typing.cast(
+        "polars.LazyFrame",
+        reader.vcf2lazyframe(path, columns=["position", "mother_format_gt"]),
+    ).collect()
+    assert selected.get_column("mother_format_gt").to_list() == ["0/1", "1/2"]
+
+    long = (
+        typing.cast("polars.LazyFrame", reader.vcf2lazyframe(path, sample_layout="long"))
+        .collect()
+        .sort("position", "sample")
+    )
+    assert long.height == 6
+    assert long.schema["sample"] == polars.Enum(["mother", "father", "child"])
+    assert long.get_column("format_gt").to_list() == [[0, 1], [1, 1], [None, None], [1, 2], [0, 0], [0, 2]]
+    assert long.get_column("format_phased").to_list() == [False, True, False, False, False, True]
+    assert long.get_column("info_DP").to_list() == [10, 10, 10, 3, 3, 3]
+
+
+def test_cache(vcf_path: pathlib.Path, tmp_path: pathlib.Path) -> None:
+    """Reading parquet cache produce same result as vcf parsing.
+
+    Parameters:
+        vcf_path: Path to a small vcf.
+        tmp_path: Pytest fixture to get a temporary directory.
+    """
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    cache_path = reader.parquet_cache_path(vcf_path, cache_dir=cache_dir)
+    columns = ["chr", "position", "info_DP", "format_ad"]
+
+    direct = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(vcf_path, cache_dir=cache_dir)).collect()
+    assert not cache_path.exists()
+
+    cached = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(vcf_path, cache=True, cache_dir=cache_dir))
+    assert cache_path.is_file()
+    assert cached.collect().equals(direct)
+
+    subset = typing.cast(
+        "polars.LazyFrame",
+        reader.vcf2lazyframe(vcf_path, regions=[("chr1", 15, 30)], columns=columns, cache_dir=cache_dir),
+    ).collect()
+    assert subset.equals(direct.filter(polars.col("position") == 20).select(columns))
+
+    vcf_path.write_text(VCF.replace("DP=10;", "DP=11;"))
+    assert reader.parquet_cache_path(vcf_path, cache_dir=cache_dir) != cache_path
+
+
+def test_failed_write(vcf_path: pathlib.Path, tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A failed write of parquet cache or clinvar index leave no temporary file.
+
+    Parameters:
+        vcf_path: Path to a small vcf.
+        tmp_path: Pytest fixture to get a temporary directory.
+        monkeypatch: Pytest fixture to make parquet write fail.
+    """
+
+    def partial_sink(_lf: polars.LazyFrame, path: pathlib.Path, **_kwargs: typing.Any) -> None:
+        path.write_bytes(b"PAR1")
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(polars.LazyFrame, "sink_parquet", partial_sink)
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+
+    with pytest.raises(OSError, match="No space"):
+        reader.vcf2parquet(vcf_path, output_dir / "variants.parquet")
+    with pytest.raises(OSError, match="No space"):
+        clinvar.build_index(vcf_path, output_dir / "clinvar.parquet")
+
+    assert list(output_dir.iterdir()) == []
+
+
+@pytest.mark.parametrize("sample_layout", ["wide", "long"])
+def test_iter_vcf_batches(sample_layout: reader.SampleLayout) -> None:
+    """Concatenation of batches is equal to vcf2lazyframe result.
+
+    Parameters:
+        sample_layout: How sample are store.
+    """
+    path = FIXTURES_DIR / "variants.vcf.gz"
+    batches = list(reader.iter_vcf_batches(path, batch_size=1_000, sample_layout=sample_layout))
+    expected = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(path, sample_layout=sample_layout)).collect()
+
+    assert [batch.height for batch in batches] == [1_000] * 4 + [500]
+    assert all(batch.schema == expected.schema for batch in batches)
+    assert polars.concat(batches).equals(expected)
+
+
+ANNOTATION_VCF = """##fileformat=VCFv4.2
+##INFO=<ID=ANN,Number=.,Type=String,Description="Functional annotations: 'Allele | Annotation | Annotation_Impact | Gene_Name | Gene_ID'">
+##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence annotations from Ensembl VEP. Format: Allele|Consequence|IMPACT|SYMBOL|Feature">
+#CHROM	POS	ID	REF	ALT	QUAL	FILTER	INFO
+chr1	10	.	A	G	50	PASS	ANN=G|intron_variant|MODIFIER|BRCA2|ENSG1,G|stop_gained|HIGH|BRCA2|ENSG1;CSQ=G|missense_variant|MODERATE|BRCA2|ENST1
+chr1	20	.	A	T	50	PASS	.
+"""
+
+
+@pytest.mark.parametrize(
+    ("info_id", "fields"),
+    [
+        ("ANN", ["Allele", "Annotation", "Annotation_Impact", "Gene_Name", "Gene_ID"]),
+        ("CSQ", ["Allele", "Consequence", "IMPACT", "SYMBOL", "Feature"]),
+    ],
+)
+def test_parse_info_ann(info_id: str, fields: list[str], tmp_path: pathlib.Path) -> None:
+    """Annotation layout is read in header and annotator field names are normalized.
+
+    Parameters:
+        info_id: Id of annotation INFO field.
+        fields: Expected annotation layout.
+        tmp_path: Pytest fixture to get a temporary directory.
+    """
+    path = tmp_path / "annotation.vcf"
+    path.write_text(ANNOTATION_VCF)
+
+    assert reader.annotation_fields(path, info_id) == fields
+    assert reader.annotation_fields(path, "LOF") is None
+    # snpEff column names of existing stores are kept, VEP fields get same names
+    assert reader._annotation_names(reader.SNPEFF_FIELDS)[1:11] == [
+        "effect",
+        "impact",
+        "gene",
+        "geneid",
+        "feature",
+        "feature_id",
+        "bio_type",
+        "rank",
+        "hgvs_c",
+        "hgvs_p",
+    ]
+    assert reader._annotation_names(["SYMBOL", "Gene", "Feature_type", "Feature", "BIOTYPE"]) == [
+        "gene",
+        "geneid",
+        "feature",
+        "feature_id",
+        "bio_type",
+    ]
+
+    lf = typing.cast("polars.LazyFrame", reader.vcf2lazyframe(path, columns=["position", f"info_{info_id}"]))
+
+    exploded = reader.parse_info_ann(lf, "annot", fields, column=f"info_{info_id}").collect()
+    assert exploded.height == (3 if info_id == "ANN" else 2)
+    assert exploded.get_column("annot_gene").to_list()[0] == "BRCA2"
+
+    severe = reader.parse_info_ann(lf, "annot", fields, column=f"info_{info_id}", most_severe=True).collect()
+    assert severe.height == 2
+    assert severe.get_column("annot_effect").to_list() == [
+        "stop_gained" if info_id == "ANN" else "missense_variant",
+        None,
+    ]